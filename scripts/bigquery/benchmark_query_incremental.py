@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+⏱️ BENCHMARK - FILTRO INCREMENTAL POR ESTAÇÃO NO NIMBUS
+
+Compara, no NIMBUS, as duas formas de filtrar "só o que cada estação ainda não
+sincronizou" nas queries de query_dados_incrementais():
+
+    legado: (estacao_id = X AND "horaLeitura" > 'ts') OR ... OR estacao_id NOT IN (...)
+            montado como texto na query
+    unnest: JOIN unnest(%(wm_estacoes)s::int[], %(wm_marcas)s::timestamptz[]) com
+            "horaLeitura" > wm.ultimo_dia (range por estação) + ramo para estações
+            sem watermark, com parâmetros vinculados
+
+Os watermarks são derivados do próprio NIMBUS (última leitura de cada estação
+menos --atraso-horas), simulando um sync atrasado sem consultar o BigQuery.
+Entram TODAS as estações com leitura, inclusive as paradas há muito tempo
+(watermark antigo); --estacoes-novas N tira N estações dos watermarks para
+exercitar o ramo de estações ainda não sincronizadas (histórico completo).
+
+Para cada query (pluviométricos e meteorológicos) e cada variante roda
+EXPLAIN (ANALYZE, BUFFERS) --repeticoes vezes e mostra mediana de execução e
+planejamento e os nós de scan em estacoes_leitura. Os planos completos vão para
+resultados/benchmark_query_incremental_<data>.txt.
+
+⚠️ EXPLAIN ANALYZE EXECUTA as queries: rode fora do horário de pico do NIMBUS.
+
+Exemplo:
+    python scripts/bigquery/benchmark_query_incremental.py --atraso-horas 2 --repeticoes 5
+"""
+
+import argparse
+import json
+import statistics
+import sys
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+import psycopg2
+
+# Configurar encoding UTF-8 para Windows (resolve problema com emojis)
+if sys.platform == 'win32':
+    import io
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
+    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8', errors='replace')
+
+# Os scripts de sincronização carregam o .env e a configuração do NIMBUS
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+import sincronizar_pluviometricos_nimbus_bigquery as sync_pluviometricos
+import sincronizar_meteorologicos_nimbus_bigquery as sync_meteorologicos
+from extracao_nimbus import filtro_incremental_estacoes
+
+ATRASO_HORAS_PADRAO = 1
+DIAS_PARADA_PADRAO = 30
+ESTACOES_NOVAS_PADRAO = 0
+REPETICOES_PADRAO = 3
+TIMEOUT_SEGUNDOS_PADRAO = 600
+PASTA_RESULTADOS = sync_pluviometricos.project_root / 'resultados'
+
+QUERIES = [
+    ('pluviometricos', 'el', sync_pluviometricos.query_dados_incrementais),
+    ('meteorologicos', 'l', sync_meteorologicos.query_dados_incrementais),
+]
+
+def obter_watermarks(conn, atraso_horas, estacoes_novas=0):
+    """Última leitura de cada estação menos atraso_horas, para todas as estações com leitura.
+
+    As estacoes_novas de maior id ficam de fora (simulam estações ainda sem
+    watermark no BigQuery).
+
+    Returns:
+        dict: {estacao_id: datetime UTC}
+    """
+    with conn.cursor() as cur:
+        # Uma busca no índice por estação em vez de GROUP BY na tabela inteira
+        cur.execute("""
+            SELECT e.id, ultima."horaLeitura" - make_interval(hours => %(atraso)s)
+            FROM public.estacoes_estacao e
+            CROSS JOIN LATERAL (
+                SELECT l."horaLeitura"
+                FROM public.estacoes_leitura l
+                WHERE l.estacao_id = e.id
+                ORDER BY l."horaLeitura" DESC
+                LIMIT 1
+            ) ultima
+            ORDER BY e.id
+        """, {'atraso': atraso_horas})
+        linhas = cur.fetchall()
+    if estacoes_novas:
+        linhas = linhas[:-estacoes_novas]
+    return {estacao_id: marca.astimezone(timezone.utc) for estacao_id, marca in linhas}
+
+def filtro_legado(alias, watermarks):
+    """WHERE por estação como era montado antes (OR por estação + NOT IN, literal)."""
+    condicoes = [
+        f"({alias}.estacao_id = {estacao_id} AND {alias}.\"horaLeitura\" > "
+        f"'{marca.strftime('%Y-%m-%d %H:%M:%S+00:00')}'::timestamptz)"
+        for estacao_id, marca in watermarks.items()
+    ]
+    condicoes.append(f"{alias}.estacao_id NOT IN ({','.join(map(str, watermarks))})")
+    return "(" + " OR ".join(condicoes) + ")"
+
+def montar_variantes(conn, alias, funcao_query, watermarks):
+    """SQL final (parâmetros já aplicados) das variantes unnest e legado."""
+    inicio = min(watermarks.values())
+    query, parametros = funcao_query(inicio, watermarks)
+    join, condicao, _ = filtro_incremental_estacoes(alias, inicio, watermarks, fuso_naive=timezone.utc)
+
+    query_legado = query.replace(join, '').replace(condicao, filtro_legado(alias, watermarks))
+    with conn.cursor() as cur:
+        query_unnest = cur.mogrify(query, parametros).decode()
+    return {
+        'unnest': query_unnest.strip().rstrip(';'),
+        'legado': query_legado.strip().rstrip(';'),
+    }
+
+def _nos_scan(plano, encontrados=None):
+    """Nós de scan sobre estacoes_leitura no plano JSON (tipo + índice)."""
+    if encontrados is None:
+        encontrados = []
+    if plano.get('Relation Name') == 'estacoes_leitura':
+        descricao = plano['Node Type']
+        if plano.get('Index Name'):
+            descricao += f" ({plano['Index Name']})"
+        encontrados.append(f"{descricao}: {plano.get('Actual Rows', 0):,} linhas")
+    for filho in plano.get('Plans', []):
+        _nos_scan(filho, encontrados)
+    return encontrados
+
+def medir(conn, sql, repeticoes):
+    """Roda EXPLAIN ANALYZE repeticoes vezes.
+
+    Returns:
+        dict: execucao_ms/planejamento_ms (medianas), nos (scans) e plano (texto)
+    """
+    execucoes, planejamentos = [], []
+    plano_json = None
+    with conn.cursor() as cur:
+        for _ in range(repeticoes):
+            cur.execute(f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {sql}")
+            resultado = cur.fetchone()[0]
+            if isinstance(resultado, str):
+                resultado = json.loads(resultado)
+            plano_json = resultado[0]
+            execucoes.append(plano_json['Execution Time'])
+            planejamentos.append(plano_json['Planning Time'])
+
+        cur.execute(f"EXPLAIN (ANALYZE, BUFFERS) {sql}")
+        plano_texto = '\n'.join(linha[0] for linha in cur.fetchall())
+
+    return {
+        'execucao_ms': statistics.median(execucoes),
+        'planejamento_ms': statistics.median(planejamentos),
+        'nos': _nos_scan(plano_json['Plan']),
+        'plano': plano_texto,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark do filtro incremental por estação no NIMBUS')
+    parser.add_argument('--atraso-horas', type=int, default=ATRASO_HORAS_PADRAO,
+                        help=f'Watermark = última leitura da estação menos N horas (padrão: {ATRASO_HORAS_PADRAO})')
+    parser.add_argument('--dias-parada', type=int, default=DIAS_PARADA_PADRAO,
+                        help=f'Só para o relatório: estação sem leitura há N dias conta como parada (padrão: {DIAS_PARADA_PADRAO})')
+    parser.add_argument('--estacoes-novas', type=int, default=ESTACOES_NOVAS_PADRAO,
+                        help=f'Estações tiradas dos watermarks para simular estações novas (padrão: {ESTACOES_NOVAS_PADRAO})')
+    parser.add_argument('--repeticoes', type=int, default=REPETICOES_PADRAO,
+                        help=f'EXPLAIN ANALYZE por variante (padrão: {REPETICOES_PADRAO})')
+    parser.add_argument('--timeout-segundos', type=int, default=TIMEOUT_SEGUNDOS_PADRAO,
+                        help=f'statement_timeout por execução (padrão: {TIMEOUT_SEGUNDOS_PADRAO})')
+    args = parser.parse_args()
+
+    print("=" * 78)
+    print("⏱️  BENCHMARK FILTRO INCREMENTAL - NIMBUS")
+    print("=" * 78)
+    print("⚠️  EXPLAIN ANALYZE executa as queries no NIMBUS")
+
+    conn = psycopg2.connect(**sync_pluviometricos.ORIGEM,
+                            options=f'-c statement_timeout={args.timeout_segundos * 1000}')
+    try:
+        conn.set_session(readonly=True)
+
+        watermarks = obter_watermarks(conn, args.atraso_horas, args.estacoes_novas)
+        if not watermarks:
+            print("❌ Nenhuma estação com leitura no NIMBUS")
+            return
+        limite_parada = datetime.now(timezone.utc) - timedelta(days=args.dias_parada)
+        paradas = sum(1 for marca in watermarks.values() if marca < limite_parada)
+        resumo = (f"{len(watermarks)} estações ({paradas} paradas há mais de {args.dias_parada} dias, "
+                  f"menor watermark {min(watermarks.values()):%Y-%m-%d}) | "
+                  f"{args.estacoes_novas} sem watermark | atraso {args.atraso_horas}h")
+        print(f"📍 {resumo} | {args.repeticoes} repetições")
+
+        resultados = []
+        for nome, alias, funcao_query in QUERIES:
+            for variante, sql in montar_variantes(conn, alias, funcao_query, watermarks).items():
+                print(f"   ▶️ {nome} / {variante}...")
+                try:
+                    medicao = medir(conn, sql, args.repeticoes)
+                except psycopg2.extensions.QueryCanceledError:
+                    conn.rollback()
+                    print(f"      ⏳ Cancelada após {args.timeout_segundos}s")
+                    medicao = None
+                resultados.append((nome, variante, medicao))
+        conn.rollback()
+    finally:
+        conn.close()
+
+    print()
+    print("=" * 78)
+    print(f"{'Query':<18}{'Variante':<10}{'Execução ms':>14}{'Planej. ms':>12}")
+    print("=" * 78)
+    for nome, variante, medicao in resultados:
+        if medicao is None:
+            print(f"{nome:<18}{variante:<10}{'timeout':>14}{'-':>12}")
+            continue
+        print(f"{nome:<18}{variante:<10}{medicao['execucao_ms']:>14,.1f}{medicao['planejamento_ms']:>12,.1f}")
+        for no in medicao['nos']:
+            print(f"{'':<28}↳ {no}")
+
+    PASTA_RESULTADOS.mkdir(exist_ok=True)
+    arquivo = PASTA_RESULTADOS / f"benchmark_query_incremental_{datetime.now():%Y%m%d%H%M}.txt"
+    with open(arquivo, 'w', encoding='utf-8') as f:
+        f.write(f"{resumo} | repetições: {args.repeticoes}\n")
+        for nome, variante, medicao in resultados:
+            f.write(f"\n{'=' * 78}\n{nome} / {variante}\n{'=' * 78}\n")
+            if medicao is None:
+                f.write(f"Cancelada após {args.timeout_segundos}s\n")
+                continue
+            f.write(f"Execução (mediana): {medicao['execucao_ms']:.1f} ms | "
+                    f"Planejamento (mediana): {medicao['planejamento_ms']:.1f} ms\n\n")
+            f.write(medicao['plano'] + '\n')
+    print(f"\n📝 Planos salvos em {arquivo}")
+
+if __name__ == '__main__':
+    main()
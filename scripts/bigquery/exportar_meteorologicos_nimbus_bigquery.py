@@ -67,6 +67,7 @@ from urllib.parse import quote_plus
 from google.cloud import bigquery
 from google.oauth2 import service_account
 import os
+import sys
 from datetime import datetime
 from dotenv import load_dotenv
 from pathlib import Path
@@ -77,6 +78,10 @@ import time
 project_root = Path(__file__).parent.parent.parent
 load_dotenv(dotenv_path=project_root / '.env')
 
+# Normalização vetorizada de timestamps compartilhada com os demais loaders
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'comum'))
+from normalizacao_tempo import aplicar_colunas_tempo
+
 def obter_variavel(nome, obrigatoria=True, padrao=None):
     """Obtém variável de ambiente."""
     valor = os.getenv(nome)
@@ -548,99 +553,9 @@ def processar_e_carregar_tabela_por_periodo(engine_nimbus, client_bq, dataset_id
             if col in chunk_df.columns:
                 chunk_df = chunk_df.drop(columns=[col])
         
-        # Processar coluna dia_utc (mesmas funções da função original)
-        def processar_dia_timestamp(dt):
-            if pd.isna(dt):
-                return None
-            try:
-                if isinstance(dt, str):
-                    dt_parsed = pd.to_datetime(dt)
-                elif isinstance(dt, pd.Timestamp):
-                    dt_parsed = dt
-                elif hasattr(dt, 'tzinfo') and dt.tzinfo is not None:
-                    dt_parsed = pd.Timestamp(dt)
-                else:
-                    dt_parsed = pd.to_datetime(dt)
-                
-                if isinstance(dt_parsed, pd.Timestamp) and dt_parsed.tz is not None:
-                    dt_utc = dt_parsed.tz_convert('UTC')
-                    return dt_utc.tz_localize(None)
-                elif isinstance(dt_parsed, pd.Timestamp):
-                    from datetime import timezone, timedelta
-                    tz_brasil = timezone(timedelta(hours=-3))
-                    dt_com_tz = dt_parsed.tz_localize(tz_brasil)
-                    dt_utc = dt_com_tz.tz_convert('UTC')
-                    return dt_utc.tz_localize(None)
-                else:
-                    return dt_parsed
-            except Exception as e:
-                return None
-        
-        def formatar_dia_original(dt):
-            if pd.isna(dt):
-                return None
-            try:
-                if isinstance(dt, str):
-                    if len(dt) > 10 and (dt[-5:].startswith('-') or dt[-5:].startswith('+')):
-                        return dt
-                    dt_parsed = pd.to_datetime(dt)
-                elif isinstance(dt, pd.Timestamp):
-                    dt_parsed = dt
-                else:
-                    dt_parsed = pd.to_datetime(dt)
-                
-                offset_str = "-0300"
-                if isinstance(dt_parsed, pd.Timestamp):
-                    if dt_parsed.tz is not None:
-                        offset = dt_parsed.tz.utcoffset(dt_parsed)
-                        if offset:
-                            total_seconds = offset.total_seconds()
-                            hours = int(total_seconds // 3600)
-                            minutes = int((abs(total_seconds) % 3600) // 60)
-                            offset_str = f"{hours:+03d}{minutes:02d}"
-                
-                timestamp_str = dt_parsed.strftime('%Y-%m-%d %H:%M:%S')
-                if isinstance(dt_parsed, pd.Timestamp) and dt_parsed.microsecond:
-                    microsec_str = str(dt_parsed.microsecond)[:3].zfill(3)
-                    timestamp_str += f".{microsec_str}"
-                else:
-                    timestamp_str += ".000"
-                
-                return f"{timestamp_str} {offset_str}"
-            except Exception:
-                return None
-        
-        def extrair_utc_offset(dt):
-            if pd.isna(dt):
-                return None
-            try:
-                if isinstance(dt, str):
-                    if len(dt) > 10 and (dt[-5:].startswith('-') or dt[-5:].startswith('+')):
-                        return dt[-5:]
-                    dt_parsed = pd.to_datetime(dt)
-                elif isinstance(dt, pd.Timestamp):
-                    dt_parsed = dt
-                else:
-                    dt_parsed = pd.to_datetime(dt)
-                
-                offset_str = "-0300"
-                if isinstance(dt_parsed, pd.Timestamp):
-                    if dt_parsed.tz is not None:
-                        offset = dt_parsed.tz.utcoffset(dt_parsed)
-                        if offset:
-                            total_seconds = offset.total_seconds()
-                            hours = int(total_seconds // 3600)
-                            minutes = int((abs(total_seconds) % 3600) // 60)
-                            offset_str = f"{hours:+03d}{minutes:02d}"
-                
-                return offset_str
-            except Exception:
-                return None
-        
-        # Processar colunas
-        chunk_df['dia_original'] = chunk_df['dia_utc'].apply(formatar_dia_original)
-        chunk_df['utc_offset'] = chunk_df['dia_utc'].apply(extrair_utc_offset)
-        chunk_df['dia_utc'] = chunk_df['dia_utc'].apply(processar_dia_timestamp)
+        # dia_utc (TIMESTAMP UTC), dia (DATETIME local SP), dia_original (STRING) e utc_offset (STRING),
+        # calculados de uma vez para a coluna inteira. Valores sem timezone são tratados como -03:00.
+        chunk_df = aplicar_colunas_tempo(chunk_df, 'dia_utc')
         
         if 'estacao_id' in chunk_df.columns:
             chunk_df['estacao_id'] = chunk_df['estacao_id'].astype('Int64')
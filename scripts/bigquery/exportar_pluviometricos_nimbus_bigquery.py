@@ -84,6 +84,10 @@ if sys.platform == 'win32':
 project_root = Path(__file__).parent.parent.parent
 load_dotenv(dotenv_path=project_root / '.env')
 
+# Normalização vetorizada de timestamps compartilhada com os demais loaders
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'comum'))
+from normalizacao_tempo import aplicar_colunas_tempo
+
 def obter_variavel(nome, obrigatoria=True, padrao=None):
     """Obtém variável de ambiente."""
     valor = os.getenv(nome)
@@ -488,64 +492,9 @@ def processar_e_carregar_tabela(engine_nimbus, client_bq, dataset_id, table_id,
             if col in chunk_df.columns:
                 chunk_df = chunk_df.drop(columns=[col])
         
-        # Processar colunas: dia_utc (UTC), dia (horário local SP), dia_original (STRING em SP) e utc_offset (STRING)
-        def converter_para_utc_e_processar(dt):
-            """Retorna (dia_utc, dia_local_sp, dia_original_str, utc_offset_str).
-            
-            - dia_utc: timestamp em UTC (sem timezone) para o BigQuery
-            - dia_local_sp (dia): mesmo instante em horário local de São Paulo (America/Sao_Paulo), sem timezone
-            - dia_original: string com horário local de SP e offset (ex: "1997-01-02 11:08:40.000 -0300")
-            - utc_offset: offset UTC do timezone de SP (ex: "-0300" ou "-0200")
-            """
-            if pd.isna(dt):
-                return (None, None, None, None)
-            try:
-                if isinstance(dt, str):
-                    dt_parsed = pd.to_datetime(dt)
-                elif isinstance(dt, pd.Timestamp):
-                    dt_parsed = dt
-                elif hasattr(dt, 'tzinfo') and dt.tzinfo is not None:
-                    dt_parsed = pd.Timestamp(dt)
-                else:
-                    dt_parsed = pd.to_datetime(dt)
-                
-                if isinstance(dt_parsed, pd.Timestamp) and dt_parsed.tz is not None:
-                    dt_sp = dt_parsed.tz_convert('America/Sao_Paulo')
-                else:
-                    dt_parsed = dt_parsed.tz_localize('UTC')
-                    dt_sp = dt_parsed.tz_convert('America/Sao_Paulo')
-                
-                offset = dt_sp.tz.utcoffset(dt_sp)
-                if offset:
-                    total_seconds = offset.total_seconds()
-                    hours = int(total_seconds // 3600)
-                    minutes = int((abs(total_seconds) % 3600) // 60)
-                    utc_offset_str = f"{hours:+03d}{minutes:02d}"
-                else:
-                    utc_offset_str = "-0300"
-                
-                timestamp_str = dt_sp.strftime('%Y-%m-%d %H:%M:%S')
-                if dt_sp.microsecond:
-                    microsec_str = str(dt_sp.microsecond)[:3].zfill(3)
-                    timestamp_str += f".{microsec_str}"
-                else:
-                    timestamp_str += ".000"
-                dia_original_str = f"{timestamp_str} {utc_offset_str}"
-                
-                # dia_utc em UTC (sem timezone)
-                dt_utc = dt_parsed.tz_convert('UTC').tz_localize(None) if dt_parsed.tz is not None else dt_parsed
-                # dia em horário local de São Paulo, sem timezone
-                dia_local_sp = dt_sp.tz_localize(None)
-                return (dt_utc, dia_local_sp, dia_original_str, utc_offset_str)
-            except Exception as e:
-                print(f"      ⚠️  Erro ao processar timestamp: {e}")
-                return (None, None, None, None)
-        
-        resultados = chunk_df['dia_utc'].apply(converter_para_utc_e_processar)
-        chunk_df['dia_utc'] = resultados.apply(lambda x: x[0])
-        chunk_df['dia'] = resultados.apply(lambda x: x[1])
-        chunk_df['dia_original'] = resultados.apply(lambda x: x[2])
-        chunk_df['utc_offset'] = resultados.apply(lambda x: x[3])
+        # dia_utc (UTC), dia (horário local SP), dia_original (STRING em SP) e utc_offset (STRING),
+        # calculados de uma vez para a coluna inteira. Valores sem timezone são tratados como UTC.
+        chunk_df = aplicar_colunas_tempo(chunk_df, 'dia_utc', fuso_naive='UTC')
         
         if 'estacao_id' in chunk_df.columns:
             chunk_df['estacao_id'] = chunk_df['estacao_id'].astype('Int64')
@@ -571,7 +520,7 @@ def processar_e_carregar_tabela(engine_nimbus, client_bq, dataset_id, table_id,
             print(f"      ⚠️  Removidas {registros_antes_dedup - registros_depois_dedup} duplicatas (dia_utc, estacao_id)")
         
         # IMPORTANTE: NÃO converter novamente para datetime aqui!
-        # A função processar_dia_timestamp() já retorna o tipo correto (datetime sem timezone)
+        # aplicar_colunas_tempo() já retorna o tipo correto (datetime sem timezone)
         # Converter novamente pode causar problemas de precisão (nanossegundos vs microssegundos)
         
         if len(chunk_df) > 0:
@@ -38,6 +38,10 @@ VANTAGENS:
 ✅ Busca APENAS dados novos desde esses timestamps no NIMBUS
 ✅ Exporta para formato Parquet (mesma estrutura do script de exportação)
 ✅ Carrega no BigQuery usando WRITE_APPEND
+   (--carga-unica / BIGQUERY_CARGA_UNICA=true: um único load job atômico por sync)
+   (--merge / BIGQUERY_MERGE=true: staging da execução + MERGE em (dia_utc, estacao_id))
+   (--storage-write[=pending|committed] / BIGQUERY_STORAGE_WRITE: Storage Write API com Arrow,
+    pending por padrão (tudo ou nada); --storage-write-local=PASTA usa o escritor fake local)
 ✅ Processa em lotes para otimizar memória
 ✅ Preserva tipos de dados e timezone corretamente (UTC)
 ✅ Usa EXATAMENTE a mesma lógica do script de exportação
@@ -91,6 +95,16 @@ if sys.platform == 'win32':
 project_root = Path(__file__).parent.parent.parent
 load_dotenv(dotenv_path=project_root / '.env')
 
+# Normalização vetorizada de timestamps compartilhada com os demais loaders
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'comum'))
+from normalizacao_tempo import aplicar_colunas_tempo
+from extracao_nimbus import filtro_incremental_estacoes
+from parquet_unico import concatenar_parquets
+from merge_bigquery import criar_tabela_staging, merge_staging, remover_tabela_staging
+from storage_write_bigquery import (
+    EscritorStorageWrite, EscritorStorageWriteLocal, MODO_COMMITTED, MODO_PENDING, MODOS_STORAGE_WRITE,
+)
+
 def obter_variavel(nome, obrigatoria=True, padrao=None):
     """Obtém variável de ambiente."""
     valor = os.getenv(nome)
@@ -134,6 +148,9 @@ def carregar_configuracoes():
             'dataset_id': obter_variavel('BIGQUERY_DATASET_ID_NIMBUS', obrigatoria=False, padrao='alertadb_cor_raw'),
             'table_id': obter_variavel('BIGQUERY_TABLE_ID_METEOROLOGICOS', obrigatoria=False, padrao='meteorologicos'),
             'credentials_path': str(credentials_path) if credentials_path else None,
+            'carga_unica': obter_variavel('BIGQUERY_CARGA_UNICA', obrigatoria=False, padrao='false').lower() in ('1', 'true', 'sim'),
+            'merge': obter_variavel('BIGQUERY_MERGE', obrigatoria=False, padrao='false').lower() in ('1', 'true', 'sim'),
+            'storage_write': obter_variavel('BIGQUERY_STORAGE_WRITE', obrigatoria=False, padrao='').lower(),
         }
         
         return origem, bigquery_config
@@ -226,62 +243,30 @@ def obter_ultima_sincronizacao_por_estacao(client, dataset_id, table_id):
         return {}
 
 def query_dados_incrementais(ultima_sincronizacao, ultimas_por_estacao=None):
-    """Retorna query para buscar apenas dados novos desde a última sincronização.
+    """Retorna (query, parâmetros) para buscar apenas dados novos desde a última sincronização.
         
     IMPORTANTE: ultima_sincronizacao deve estar em UTC (vem de obter_ultima_sincronizacao_bigquery).
     
-    Se ultimas_por_estacao for fornecido, usa filtro por estação para evitar duplicações.
+    Se ultimas_por_estacao for fornecido, cada estação é filtrada pelo próprio
+    último timestamp (JOIN com unnest de arrays, parâmetros vinculados) para
+    evitar duplicações; estações ainda ausentes do BigQuery trazem o histórico completo.
+    ultima_sincronizacao só é usada quando não há watermarks por estação.
 
     Desempenho no NIMBUS: ajuda muito índice em ``estacoes_leitura`` que cubra
-    ``(estacao_id, "horaLeitura")`` ou ``("horaLeitura")`` e índice em
+    ``(estacao_id, "horaLeitura")`` (range scan por estação) e índice em
     ``estacoes_leiturasensor(leitura_id)``.
     """
-    # Converter timestamp UTC para timestamptz do PostgreSQL
-    if isinstance(ultima_sincronizacao, datetime):
-        # Garantir que está em UTC
-        if ultima_sincronizacao.tzinfo is None:
-            ultima_sincronizacao = ultima_sincronizacao.replace(tzinfo=timezone.utc)
-        elif ultima_sincronizacao.tzinfo != timezone.utc:
-            # Converter para UTC se não estiver
-            ultima_sincronizacao = ultima_sincronizacao.astimezone(timezone.utc)
-        
-        # Formatar para PostgreSQL: usar UTC diretamente no formato ISO 8601
-        # Formato: 'YYYY-MM-DD HH:MM:SS+00:00'
-        timestamp_str = ultima_sincronizacao.strftime('%Y-%m-%d %H:%M:%S+00:00')
-    else:
-        timestamp_str = str(ultima_sincronizacao)
-        if ':' not in timestamp_str or ('+' not in timestamp_str and '-' not in timestamp_str.split()[-1]):
-            timestamp_str += "+00:00"
-    
-    # Se temos últimas sincronizações por estação, usar filtro mais preciso
-    if ultimas_por_estacao and len(ultimas_por_estacao) > 0:
-        # Construir condições por estação
-        condicoes_estacao = []
-        for estacao_id, ultima_estacao in ultimas_por_estacao.items():
-            if isinstance(ultima_estacao, datetime):
-                if ultima_estacao.tzinfo is None:
-                    ultima_estacao = ultima_estacao.replace(tzinfo=timezone.utc)
-                elif ultima_estacao.tzinfo != timezone.utc:
-                    ultima_estacao = ultima_estacao.astimezone(timezone.utc)
-                timestamp_estacao = ultima_estacao.strftime('%Y-%m-%d %H:%M:%S+00:00')
-                condicoes_estacao.append(f"(l.estacao_id = {estacao_id} AND l.\"horaLeitura\" > '{timestamp_estacao}'::timestamptz)")
-        
-        # Adicionar estações que não estão no BigQuery ainda (se houver estações no BigQuery)
-        if len(ultimas_por_estacao) > 0:
-            estacao_ids_str = ','.join(map(str, ultimas_por_estacao.keys()))
-            condicoes_estacao.append(f"l.estacao_id NOT IN ({estacao_ids_str})")
-        
-        where_clause = "(" + " OR ".join(condicoes_estacao) + ")"
-    else:
-        # Usar filtro geral (fallback)
-        where_clause = f"l.\"horaLeitura\" > '{timestamp_str}'::timestamptz"
+    join_watermarks, filtro, parametros = filtro_incremental_estacoes(
+        'l', ultima_sincronizacao, ultimas_por_estacao, fuso_naive=timezone.utc
+    )
 
     # Query otimizada vs. partida em estacoes_leiturasensor:
     # - CTE "leituras_novas" restringe primeiro por hora/estação (melhor uso de índice em leitura).
     # - Agregados com MAX(CASE...) (compatível com PG antigo; sem FILTER).
     # - ponto_orvalho na camada externa (menos trabalho repetido no plano).
     # - Sem ORDER BY: o carregamento no BigQuery não depende da ordem; evita sort caro no NIMBUS.
-    return f"""
+    # - Texto sem '%' literal (ILIKE usa chr(37)): a query leva parâmetros %(nome)s.
+    query = f"""
 WITH leituras_novas AS (
     SELECT
         l.id AS leitura_id,
@@ -289,8 +274,8 @@ WITH leituras_novas AS (
         l.estacao_id,
         e.nome AS nome_estacao
     FROM public.estacoes_leitura l
-    JOIN public.estacoes_estacao e ON e.id = l.estacao_id
-    WHERE {where_clause}
+    JOIN public.estacoes_estacao e ON e.id = l.estacao_id{join_watermarks}
+    WHERE {filtro}
       AND e.id IN (1,11,16,19,20,22,28,32)
 )
 SELECT
@@ -348,6 +333,7 @@ FROM (
         ln.nome_estacao
 ) sub
 """
+    return query, parametros
 
 def obter_schema_meteorologicos():
     """Retorna schema do BigQuery para tabela meteorologicos."""
@@ -367,11 +353,41 @@ def obter_schema_meteorologicos():
         bigquery.SchemaField("ponto_orvalho", "FLOAT64", mode="NULLABLE", description="Ponto de orvalho (°C), calculado por Magnus-Tetens a partir de temperatura e umidade relativa"),
     ]
 
-def sincronizar_incremental():
+def sincronizar_incremental(carga_unica=None, merge=None, storage_write=None, storage_write_local=None):
     """Sincroniza apenas dados novos do NIMBUS para BigQuery.
     
     Usa EXATAMENTE a mesma lógica do script de exportação.
+
+    Args:
+        carga_unica: True junta todos os batches em um Parquet e faz um único
+            load job (tudo ou nada); None usa BIGQUERY_CARGA_UNICA do .env
+        merge: True carrega numa tabela de staging da execução e aplica um
+            MERGE em (dia_utc, estacao_id) na tabela final (retry não duplica);
+            None usa BIGQUERY_MERGE do .env
+        storage_write: 'pending' ou 'committed' grava pela Storage Write API
+            (batches Arrow, sem Parquet nem load job); None usa
+            BIGQUERY_STORAGE_WRITE do .env (vazio = load job)
+        storage_write_local: pasta para o escritor fake local (Parquet por
+            append) no lugar da Storage Write API
     """
+    if carga_unica is None:
+        carga_unica = BIGQUERY_CONFIG['carga_unica']
+    if merge is None:
+        merge = BIGQUERY_CONFIG['merge']
+    if storage_write is None:
+        storage_write = BIGQUERY_CONFIG['storage_write']
+    if storage_write_local and not storage_write:
+        storage_write = MODO_PENDING
+    if storage_write and storage_write not in MODOS_STORAGE_WRITE:
+        print(f"❌ Modo da Storage Write API inválido: {storage_write} (use {' ou '.join(MODOS_STORAGE_WRITE)})")
+        return False
+    if storage_write == MODO_COMMITTED:
+        # A extração não tem ORDER BY: uma falha no meio deixa um subconjunto
+        # arbitrário gravado e o MAX(dia_utc) da próxima execução pula o resto
+        print("⚠️  Storage Write em modo committed: uma falha no meio pode deixar lacunas "
+              "que a próxima execução não recupera (prefira pending)")
+    staging = None
+    escritor = None
     engine_nimbus = None
     client_bq = None
     
@@ -481,7 +497,7 @@ def sincronizar_incremental():
             anos = diferenca_dias / 365.25
             print(f"   ⚠️  ATENÇÃO: Coletando {anos:.1f} anos de dados - isso pode demorar bastante!")
         
-        query = query_dados_incrementais(ultima_sincronizacao_geral, ultimas_por_estacao)
+        query, parametros_query = query_dados_incrementais(ultima_sincronizacao_geral, ultimas_por_estacao)
         
         # Processar e carregar - EXATAMENTE a mesma lógica do script de exportação
         schema = obter_schema_meteorologicos()
@@ -496,24 +512,56 @@ def sincronizar_incremental():
         print(f"   💡 Query usa GROUP BY para agregar dados dos sensores")
         print(f"   💡 Removendo duplicatas por (dia_utc, estacao_id) para garantir unicidade\n")
         
-        temp_dir = tempfile.mkdtemp()
+        if storage_write:
+            if carga_unica or merge:
+                print("   ⚠️  Storage Write API grava direto na tabela: --carga-unica/--merge ignorados")
+                carga_unica = merge = False
+            if storage_write_local:
+                escritor = EscritorStorageWriteLocal(storage_write_local, schema, modo=storage_write)
+                print(f"   💡 Storage Write API FAKE ({storage_write}): Parquet em {storage_write_local}")
+            else:
+                escritor = EscritorStorageWrite(
+                    client_bq.project, dataset_id, table_id, schema,
+                    modo=storage_write, credentials=credentials
+                )
+                print(f"   💡 Storage Write API ({storage_write}): batches Arrow direto na tabela, sem load job")
+            escritor.abrir()
+        
+        temp_dir = tempfile.mkdtemp() if escritor is None else None
         parquet_files = []
         
         chunks_list = []
         batch_size = 2
         batch_file_num = 1
 
+        def _gravar_batch(df_batch, numero):
+            if escritor is not None:
+                # Storage Write API: batch vai direto como RecordBatches Arrow, sem Parquet
+                linhas = escritor.escrever(df_batch)
+                print(f"      📡 Batch {numero} enviado: {linhas:,} registros ({escritor.modo})")
+                return
+            batch_file = Path(temp_dir) / f'{table_id}_batch_{numero:04d}.parquet'
+            df_batch.to_parquet(
+                batch_file, 
+                index=False, 
+                engine='pyarrow', 
+                compression='snappy',
+                coerce_timestamps='us'
+            )
+            parquet_files.append(batch_file)
+            print(f"      💾 Batch {numero} salvo: {batch_file.stat().st_size / (1024*1024):.2f} MB")
+
         # Conexão DBAPI (psycopg2) evita ``sqlalchemy.text()`` + ``read_sql(..., chunksize)``,
         # combinação que dispara ProgrammingError/f405 com SQL agregado complexo.
-        def _iter_sql_chunks(sql_literal: str):
+        def _iter_sql_chunks(sql_literal: str, params=None):
             raw = engine_nimbus.raw_connection()
             try:
-                for ch in pd.read_sql(sql_literal, raw, chunksize=chunksize):
+                for ch in pd.read_sql(sql_literal, raw, params=params, chunksize=chunksize):
                     yield ch
             finally:
                 raw.close()
 
-        for chunk_df in _iter_sql_chunks(query):
+        for chunk_df in _iter_sql_chunks(query, parametros_query):
             print(f"   📦 Processando chunk {chunk_numero} ({len(chunk_df):,} registros)...")
             
             # Renomear colunas
@@ -529,132 +577,9 @@ def sincronizar_incremental():
                 if col in chunk_df.columns:
                     chunk_df = chunk_df.drop(columns=[col])
             
-            # Converter timestamp para horário local de São Paulo (dia) e UTC (dia_utc)
-            def converter_para_dia_local_sp(dt):
-                """Converte timestamp original para horário local de São Paulo (America/Sao_Paulo), sem timezone."""
-                if pd.isna(dt):
-                    return None
-                try:
-                    if isinstance(dt, str):
-                        dt_parsed = pd.to_datetime(dt)
-                    elif isinstance(dt, pd.Timestamp):
-                        dt_parsed = dt
-                    elif hasattr(dt, 'tzinfo') and dt.tzinfo is not None:
-                        dt_parsed = pd.Timestamp(dt)
-                    else:
-                        dt_parsed = pd.to_datetime(dt)
-                    
-                    if isinstance(dt_parsed, pd.Timestamp) and dt_parsed.tz is not None:
-                        dt_sp = dt_parsed.tz_convert('America/Sao_Paulo')
-                    else:
-                        dt_parsed = dt_parsed.tz_localize('UTC')
-                        dt_sp = dt_parsed.tz_convert('America/Sao_Paulo')
-                    
-                    return dt_sp.tz_localize(None)
-                except Exception:
-                    return None
-            
-            # Processar coluna dia_utc: TIMESTAMPTZ do NIMBUS → TIMESTAMP (UTC) do BigQuery
-            def processar_dia_timestamp(dt):
-                """Processa TIMESTAMPTZ do PostgreSQL (NIMBUS) para TIMESTAMP do BigQuery (UTC)."""
-                if pd.isna(dt):
-                    return None
-                try:
-                    if isinstance(dt, str):
-                        dt_parsed = pd.to_datetime(dt)
-                    elif isinstance(dt, pd.Timestamp):
-                        dt_parsed = dt
-                    elif hasattr(dt, 'tzinfo') and dt.tzinfo is not None:
-                        dt_parsed = pd.Timestamp(dt)
-                    else:
-                        dt_parsed = pd.to_datetime(dt)
-                    
-                    if isinstance(dt_parsed, pd.Timestamp) and dt_parsed.tz is not None:
-                        dt_utc = dt_parsed.tz_convert('UTC')
-                        return dt_utc.tz_localize(None)
-                    elif isinstance(dt_parsed, pd.Timestamp):
-                        from datetime import timezone, timedelta
-                        tz_brasil = timezone(timedelta(hours=-3))
-                        dt_com_tz = dt_parsed.tz_localize(tz_brasil)
-                        dt_utc = dt_com_tz.tz_convert('UTC')
-                        return dt_utc.tz_localize(None)
-                    else:
-                        return dt_parsed
-                except Exception as e:
-                    print(f"      ⚠️  Erro ao processar timestamp: {e}")
-                    return None
-            
-            def formatar_dia_original(dt):
-                """Formata datetime no formato exato da NIMBUS: 2009-02-16 02:12:20.000 -0300"""
-                if pd.isna(dt):
-                    return None
-                try:
-                    if isinstance(dt, str):
-                        if len(dt) > 10 and (dt[-5:].startswith('-') or dt[-5:].startswith('+')):
-                            return dt
-                        dt_parsed = pd.to_datetime(dt)
-                    elif isinstance(dt, pd.Timestamp):
-                        dt_parsed = dt
-                    else:
-                        dt_parsed = pd.to_datetime(dt)
-                    
-                    offset_str = "-0300"
-                    if isinstance(dt_parsed, pd.Timestamp):
-                        if dt_parsed.tz is not None:
-                            offset = dt_parsed.tz.utcoffset(dt_parsed)
-                            if offset:
-                                total_seconds = offset.total_seconds()
-                                hours = int(total_seconds // 3600)
-                                minutes = int((abs(total_seconds) % 3600) // 60)
-                                offset_str = f"{hours:+03d}{minutes:02d}"
-                    
-                    timestamp_str = dt_parsed.strftime('%Y-%m-%d %H:%M:%S')
-                    if isinstance(dt_parsed, pd.Timestamp) and dt_parsed.microsecond:
-                        microsec_str = str(dt_parsed.microsecond)[:3].zfill(3)
-                        timestamp_str += f".{microsec_str}"
-                    else:
-                        timestamp_str += ".000"
-                    
-                    return f"{timestamp_str} {offset_str}"
-                except Exception:
-                    return None
-            
-            def extrair_utc_offset(dt):
-                """Extrai o offset UTC do timestamp original (ex: -0300, -0200)."""
-                if pd.isna(dt):
-                    return None
-                try:
-                    if isinstance(dt, str):
-                        if len(dt) > 10 and (dt[-5:].startswith('-') or dt[-5:].startswith('+')):
-                            return dt[-5:]
-                        dt_parsed = pd.to_datetime(dt)
-                    elif isinstance(dt, pd.Timestamp):
-                        dt_parsed = dt
-                    else:
-                        dt_parsed = pd.to_datetime(dt)
-                    
-                    offset_str = "-0300"
-                    if isinstance(dt_parsed, pd.Timestamp):
-                        if dt_parsed.tz is not None:
-                            offset = dt_parsed.tz.utcoffset(dt_parsed)
-                            if offset:
-                                total_seconds = offset.total_seconds()
-                                hours = int(total_seconds // 3600)
-                                minutes = int((abs(total_seconds) % 3600) // 60)
-                                offset_str = f"{hours:+03d}{minutes:02d}"
-                    
-                    return offset_str
-                except Exception:
-                    return None
-            
-            # Processar todas as colunas: dia_utc (TIMESTAMP), dia (DATETIME local SP), dia_original (STRING) e utc_offset (STRING)
-            chunk_df['dia'] = chunk_df['dia_utc'].apply(converter_para_dia_local_sp)
-            chunk_df['dia_original'] = chunk_df['dia_utc'].apply(formatar_dia_original)
-            chunk_df['utc_offset'] = chunk_df['dia_utc'].apply(extrair_utc_offset)
-            chunk_df['dia_utc'] = chunk_df['dia_utc'].apply(processar_dia_timestamp)
-            # Alinhar ao exportar/sync pluviométricos: DATETIME no BQ = datetime64 sem tz (microssegundos)
-            if 'dia' in chunk_df.columns:
-                chunk_df['dia'] = pd.to_datetime(chunk_df['dia']).dt.floor('us')
+            # dia_utc (TIMESTAMP UTC), dia (DATETIME local SP), dia_original (STRING) e utc_offset (STRING),
+            # calculados de uma vez para a coluna inteira. Valores sem timezone são tratados como UTC.
+            chunk_df = aplicar_colunas_tempo(chunk_df, 'dia_utc', fuso_naive='UTC')
 
             if 'estacao_id' in chunk_df.columns:
                 chunk_df['estacao_id'] = chunk_df['estacao_id'].astype('Int64')
@@ -705,16 +630,7 @@ def sincronizar_incremental():
                 for col in df_batch.columns:
                     if col.lower() in colunas_numericas_lower:
                         df_batch[col] = pd.to_numeric(df_batch[col], errors='coerce').astype('float64')
-                batch_file = Path(temp_dir) / f'{table_id}_batch_{batch_file_num:04d}.parquet'
-                df_batch.to_parquet(
-                    batch_file, 
-                    index=False, 
-                    engine='pyarrow', 
-                    compression='snappy',
-                    coerce_timestamps='us'
-                )
-                parquet_files.append(batch_file)
-                print(f"      💾 Batch {batch_file_num} salvo: {batch_file.stat().st_size / (1024*1024):.2f} MB")
+                _gravar_batch(df_batch, batch_file_num)
                 chunks_list.clear()
                 del df_batch
                 gc.collect()
@@ -737,16 +653,7 @@ def sincronizar_incremental():
                 for col in df_batch.columns:
                     if col.lower() in colunas_numericas_lower:
                         df_batch[col] = pd.to_numeric(df_batch[col], errors='coerce').astype('float64')
-                batch_file = Path(temp_dir) / f'{table_id}_batch_{batch_file_num:04d}.parquet'
-                df_batch.to_parquet(
-                    batch_file, 
-                    index=False, 
-                    engine='pyarrow', 
-                    compression='snappy',
-                    coerce_timestamps='us'
-                )
-                parquet_files.append(batch_file)
-                print(f"      💾 Batch {batch_file_num} salvo: {batch_file.stat().st_size / (1024*1024):.2f} MB")
+                _gravar_batch(df_batch, batch_file_num)
                 del df_batch
                 gc.collect()
         
@@ -754,17 +661,44 @@ def sincronizar_incremental():
             print("\n✅ Nenhum dado novo para sincronizar.")
             return True
         
+        if escritor is not None:
+            linhas = escritor.concluir()
+            tempo_query = (datetime.now() - inicio_query).total_seconds()
+            print(f"\n   ✅ Tabela '{table_id}' atualizada via Storage Write API ({escritor.modo}): "
+                  f"{linhas:,} registros em {tempo_query:.1f} segundos")
+            if storage_write_local:
+                return True
+            nova_ultima_sync = obter_ultima_sincronizacao_bigquery(client_bq, dataset_id, table_id)
+            print(f"   🕐 Última sincronização atualizada: {nova_ultima_sync} (UTC)")
+            return True
+        
         total_size = sum(f.stat().st_size for f in parquet_files) / (1024*1024)
         print(f"\n   ✅ {len(parquet_files)} arquivos Parquet criados: {total_size:.2f} MB total")
         
         tempo_query = (datetime.now() - inicio_query).total_seconds()
         print(f"   ✅ Dados processados: {total_registros:,} registros em {tempo_query:.1f} segundos")
         
+        if carga_unica and len(parquet_files) > 1:
+            # Todos os batches como row groups de um Parquet → um load job atômico
+            arquivo_unico = Path(temp_dir) / f'{table_id}_sync.parquet'
+            concatenar_parquets(parquet_files, arquivo_unico)
+            for parquet_file in parquet_files:
+                parquet_file.unlink()
+            print(f"   📦 Carga única: {len(parquet_files)} batches juntados em {arquivo_unico.name} "
+                  f"({arquivo_unico.stat().st_size / (1024*1024):.2f} MB)")
+            parquet_files = [arquivo_unico]
+        
         # Carregar arquivos Parquet no BigQuery
         print(f"\n📤 Carregando {len(parquet_files)} arquivos Parquet no BigQuery...")
         print(f"   Tabela: {client_bq.project}.{dataset_id}.{table_id}")
         
         inicio_carga = datetime.now()
+        destino_carga = table_ref
+        if merge:
+            # Batches vão para a tabela de staging; a final só muda no MERGE
+            staging = criar_tabela_staging(client_bq, dataset_id, table_id, schema)
+            destino_carga = staging.reference
+            print(f"   💡 Modo MERGE: staging {staging.table_id} → MERGE em (dia_utc, estacao_id)")
         
         for i, parquet_file in enumerate(parquet_files, 1):
             print(f"   📤 Carregando arquivo {i}/{len(parquet_files)}: {parquet_file.name}...")
@@ -783,12 +717,19 @@ def sincronizar_incremental():
             with open(parquet_file, 'rb') as source_file:
                 job = client_bq.load_table_from_file(
                     source_file,
-                    table_ref,
+                    destino_carga,
                     job_config=file_job_config
                 )
                 job.result()
                 print(f"      ✅ Arquivo {i}/{len(parquet_files)} carregado com sucesso")
         
+        if merge:
+            print(f"\n🔀 MERGE {staging.table_id} → {table_id}...")
+            resultado_merge = merge_staging(client_bq, staging, client_bq.get_table(table_ref), schema)
+            print(f"   ✅ {resultado_merge['inseridos']:,} inseridos, {resultado_merge['atualizados'] or 0:,} atualizados "
+                  f"de {resultado_merge['linhas_staging']:,} no staging "
+                  f"(partições {resultado_merge['inicio_particoes']:%Y-%m} a {resultado_merge['fim_particoes']:%Y-%m} exclusivo)")
+        
         tempo_carga = (datetime.now() - inicio_carga).total_seconds()
         
         # Limpar arquivos temporários
@@ -818,14 +759,33 @@ def sincronizar_incremental():
         return False
     
     finally:
+        if escritor is not None:
+            # Sem concluir() (erro no meio), um stream pending é descartado
+            escritor.fechar()
+        if staging is not None:
+            remover_tabela_staging(client_bq, staging)
         if engine_nimbus:
             engine_nimbus.dispose()
 
+def valor_argumento(nome, padrao=None):
+    """Valor de ``--nome=valor`` em sys.argv; ``--nome`` sozinho retorna padrao; None se ausente."""
+    for arg in sys.argv[1:]:
+        if arg == nome:
+            return padrao
+        if arg.startswith(nome + '='):
+            return arg.split('=', 1)[1]
+    return None
+
 def main():
     """Função principal."""
     try:
         if '--once' in sys.argv:
-            sucesso = sincronizar_incremental()
+            sucesso = sincronizar_incremental(
+                carga_unica=True if '--carga-unica' in sys.argv else None,
+                merge=True if '--merge' in sys.argv else None,
+                storage_write=valor_argumento('--storage-write', padrao=MODO_PENDING),
+                storage_write_local=valor_argumento('--storage-write-local'),
+            )
             sys.exit(0 if sucesso else 1)
         else:
             print("=" * 80)
@@ -834,7 +794,12 @@ def main():
             print("\n⚠️  Para usar com cron, execute com --once:")
             print("   python scripts/bigquery/sincronizar_meteorologicos_nimbus_bigquery.py --once")
             print("\n🔄 Executando sincronização única...\n")
-            sucesso = sincronizar_incremental()
+            sucesso = sincronizar_incremental(
+                carga_unica=True if '--carga-unica' in sys.argv else None,
+                merge=True if '--merge' in sys.argv else None,
+                storage_write=valor_argumento('--storage-write', padrao=MODO_PENDING),
+                storage_write_local=valor_argumento('--storage-write-local'),
+            )
             if sucesso:
                 print("\n✅ Sincronização concluída com sucesso!")
             else:
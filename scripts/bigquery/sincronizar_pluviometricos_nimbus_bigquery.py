@@ -38,7 +38,10 @@ VANTAGENS:
 ✅ Busca APENAS dados novos desde esse timestamp no NIMBUS
 ✅ Exporta para formato Parquet (mesma estrutura do script de exportação)
 ✅ Carrega no BigQuery usando WRITE_APPEND
+   (--carga-unica / BIGQUERY_CARGA_UNICA=true: um único load job atômico por sync)
+   (--merge / BIGQUERY_MERGE=true: staging da execução + MERGE em (dia_utc, estacao_id))
 ✅ Processa em lotes para otimizar memória
+✅ Leitura, Parquet e carga sobrepostas (pipeline com fila limitada)
 ✅ Preserva tipos de dados e timezone corretamente
 ✅ Usa EXATAMENTE a mesma lógica do script de exportação
 
@@ -77,7 +80,11 @@ from datetime import datetime, timezone
 from dotenv import load_dotenv
 from pathlib import Path
 import tempfile
-import gc
+import shutil
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 
 # Configurar encoding UTF-8 para Windows (resolve problema com emojis)
 if sys.platform == 'win32':
@@ -89,6 +96,13 @@ if sys.platform == 'win32':
 project_root = Path(__file__).parent.parent.parent
 load_dotenv(dotenv_path=project_root / '.env')
 
+# Normalização vetorizada de timestamps compartilhada com os demais loaders
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'comum'))
+from normalizacao_tempo import aplicar_colunas_tempo
+from extracao_nimbus import filtro_incremental_estacoes
+from parquet_unico import concatenar_parquets
+from merge_bigquery import criar_tabela_staging, merge_staging, remover_tabela_staging
+
 def obter_variavel(nome, obrigatoria=True, padrao=None):
     """Obtém variável de ambiente."""
     valor = os.getenv(nome)
@@ -132,6 +146,8 @@ def carregar_configuracoes():
             'dataset_id': obter_variavel('BIGQUERY_DATASET_ID_NIMBUS', obrigatoria=False, padrao='alertadb_cor_raw'),
             'table_id': obter_variavel('BIGQUERY_TABLE_ID', obrigatoria=False, padrao='pluviometricos'),
             'credentials_path': str(credentials_path) if credentials_path else None,
+            'carga_unica': obter_variavel('BIGQUERY_CARGA_UNICA', obrigatoria=False, padrao='false').lower() in ('1', 'true', 'sim'),
+            'merge': obter_variavel('BIGQUERY_MERGE', obrigatoria=False, padrao='false').lower() in ('1', 'true', 'sim'),
         }
         
         return origem, bigquery_config
@@ -232,56 +248,23 @@ def obter_ultima_sincronizacao_por_estacao(client, dataset_id, table_id):
         return {}
 
 def query_dados_incrementais(ultima_sincronizacao, ultimas_por_estacao=None):
-    """Retorna query para buscar apenas dados novos desde a última sincronização.
+    """Retorna (query, parâmetros) para buscar apenas dados novos desde a última sincronização.
     
     MESMA query do exportar_pluviometricos_nimbus_bigquery.py, mas com WHERE.
     
     IMPORTANTE: ultima_sincronizacao deve estar em UTC (vem de obter_ultima_sincronizacao_bigquery).
     
-    Se ultimas_por_estacao for fornecido, usa filtro por estação para evitar duplicações.
+    Se ultimas_por_estacao for fornecido, cada estação é filtrada pelo próprio
+    último timestamp (JOIN com unnest de arrays, parâmetros vinculados) para
+    evitar duplicações; estações ainda ausentes do BigQuery trazem o histórico completo.
+    ultima_sincronizacao só é usada quando não há watermarks por estação.
     """
-    # Converter timestamp UTC para timestamptz do PostgreSQL
-    if isinstance(ultima_sincronizacao, datetime):
-        # Garantir que está em UTC
-        if ultima_sincronizacao.tzinfo is None:
-            ultima_sincronizacao = ultima_sincronizacao.replace(tzinfo=timezone.utc)
-        elif ultima_sincronizacao.tzinfo != timezone.utc:
-            # Converter para UTC se não estiver
-            ultima_sincronizacao = ultima_sincronizacao.astimezone(timezone.utc)
-        
-        # Formatar para PostgreSQL: usar UTC diretamente no formato ISO 8601
-        # Formato: 'YYYY-MM-DD HH:MM:SS+00:00'
-        timestamp_str = ultima_sincronizacao.strftime('%Y-%m-%d %H:%M:%S+00:00')
-    else:
-        timestamp_str = str(ultima_sincronizacao)
-        if ':' not in timestamp_str or ('+' not in timestamp_str and '-' not in timestamp_str.split()[-1]):
-            timestamp_str += "+00:00"
-    
-    # Se temos últimas sincronizações por estação, usar filtro mais preciso
-    if ultimas_por_estacao and len(ultimas_por_estacao) > 0:
-        # Construir condições por estação
-        condicoes_estacao = []
-        for estacao_id, ultima_estacao in ultimas_por_estacao.items():
-            if isinstance(ultima_estacao, datetime):
-                if ultima_estacao.tzinfo is None:
-                    ultima_estacao = ultima_estacao.replace(tzinfo=timezone.utc)
-                elif ultima_estacao.tzinfo != timezone.utc:
-                    ultima_estacao = ultima_estacao.astimezone(timezone.utc)
-                timestamp_estacao = ultima_estacao.strftime('%Y-%m-%d %H:%M:%S+00:00')
-                condicoes_estacao.append(f"(el.estacao_id = {estacao_id} AND el.\"horaLeitura\" > '{timestamp_estacao}'::timestamptz)")
-        
-        # Adicionar estações que não estão no BigQuery ainda (se houver estações no BigQuery)
-        if len(ultimas_por_estacao) > 0:
-            estacao_ids_str = ','.join(map(str, ultimas_por_estacao.keys()))
-            condicoes_estacao.append(f"el.estacao_id NOT IN ({estacao_ids_str})")
-        
-        where_clause = "(" + " OR ".join(condicoes_estacao) + ")"
-    else:
-        # Usar filtro geral (fallback)
-        where_clause = f"el.\"horaLeitura\" > '{timestamp_str}'::timestamptz"
+    join_watermarks, filtro, parametros = filtro_incremental_estacoes(
+        'el', ultima_sincronizacao, ultimas_por_estacao, fuso_naive=timezone.utc
+    )
     
     # MESMA query do script de exportação, mas com WHERE mais preciso
-    return f"""
+    query = f"""
 SELECT DISTINCT ON (el."horaLeitura", el.estacao_id)
     el."horaLeitura" AS "Dia",  -- TIMESTAMPTZ NOT NULL (preserva timezone original)
     elc.m05,
@@ -302,16 +285,287 @@ FROM public.estacoes_leitura AS el
 JOIN public.estacoes_leiturachuva AS elc
     ON elc.leitura_id = el.id
 JOIN public.estacoes_estacao AS ee
-    ON ee.id = el.estacao_id
-WHERE {where_clause}
+    ON ee.id = el.estacao_id{join_watermarks}
+WHERE {filtro}
 ORDER BY el."horaLeitura" ASC, el.estacao_id ASC, el.id DESC;
 """
+    return query, parametros
+
+# Pipeline leitura → transformação/Parquet → carga no BigQuery.
+# Cada estágio roda em paralelo com os demais; a fila de chunks e o limite de
+# batches em andamento seguram a leitura quando a carga fica para trás.
+# Append direto na tabela final usa 1 worker de upload: os batches entram em
+# ordem e a primeira falha interrompe os seguintes, então o que foi carregado é
+# sempre um prefixo contíguo (o próximo sync retoma do MAX(dia_utc) sem buraco).
+# No modo MERGE a carga vai para o staging e a final só muda no MERGE, então
+# os uploads podem rodar em paralelo (WORKERS_UPLOAD_STAGING).
+CHUNKSIZE = 10000
+CHUNKS_POR_BATCH = 4
+WORKERS_TRANSFORMACAO = 2
+WORKERS_UPLOAD = 1
+WORKERS_UPLOAD_STAGING = 2
+FILA_CHUNKS_MAX = 8
+COLUNAS_NUMERICAS = ['m05', 'm10', 'm15', 'h01', 'h02', 'h03', 'h04', 'h06', 'h12', 'h24', 'h96', 'mes']
+_FIM_LEITURA = object()
+
+def ler_chunks_nimbus(engine, query, parametros, chunksize=CHUNKSIZE):
+    """Lê a query do NIMBUS em DataFrames de chunksize linhas por cursor server-side.
+
+    Sem stream_results o psycopg2 traz o resultado inteiro para o cliente no
+    execute(); com ele, cada chunk é buscado (fetchmany) só quando pedido, então
+    a leitura anda junto com transformação e upload e a memória fica limitada
+    aos chunks em andamento.
+    """
+    with engine.connect().execution_options(stream_results=True, max_row_buffer=chunksize) as conn:
+        yield from pd.read_sql(query, conn, params=parametros, chunksize=chunksize)
+
+def transformar_chunk(chunk_df):
+    """Renomeia, normaliza timestamps/tipos e remove nulos e duplicatas de um chunk do NIMBUS."""
+    # Renomear colunas
+    chunk_df = chunk_df.rename(columns={
+        'Dia': 'dia_utc',
+        'Estacao': 'estacao'
+    })
+
+    # Remover colunas auxiliares
+    chunk_df = chunk_df.drop(columns=[c for c in ('TimezoneOffset', 'leitura_id') if c in chunk_df.columns])
+
+    # dia_utc (UTC), dia (horário local SP), dia_original (STRING em SP) e utc_offset (STRING),
+    # calculados de uma vez para a coluna inteira. Valores sem timezone são tratados como UTC.
+    chunk_df = aplicar_colunas_tempo(chunk_df, 'dia_utc', fuso_naive='UTC')
+
+    if 'estacao_id' in chunk_df.columns:
+        chunk_df['estacao_id'] = chunk_df['estacao_id'].astype('Int64')
+
+    # Converter colunas numéricas no mesmo padrão do script de exportação (FLOAT64)
+    for col in COLUNAS_NUMERICAS:
+        if col in chunk_df.columns:
+            chunk_df[col] = pd.to_numeric(chunk_df[col], errors='coerce').astype('float64')
+
+    # Filtrar registros com dia_utc NULL
+    registros_antes = len(chunk_df)
+    chunk_df = chunk_df[chunk_df['dia_utc'].notna()]
+    if registros_antes != len(chunk_df):
+        print(f"      ⚠️  Removidos {registros_antes - len(chunk_df)} registros com dia_utc NULL")
+
+    # IMPORTANTE: Remover duplicatas baseado em (dia_utc, estacao_id)
+    registros_antes_dedup = len(chunk_df)
+    chunk_df = chunk_df.drop_duplicates(subset=['dia_utc', 'estacao_id'], keep='last')
+    if registros_antes_dedup != len(chunk_df):
+        print(f"      ⚠️  Removidas {registros_antes_dedup - len(chunk_df)} duplicatas (dia_utc, estacao_id)")
+
+    return chunk_df
+
+def preparar_batch(chunks_brutos, batch_file, numero):
+    """Transforma os chunks de um batch e grava um Parquet.
+
+    Returns:
+        tuple: (batch_file ou None se vazio, registros)
+    """
+    chunks = [df for df in (transformar_chunk(c) for c in chunks_brutos) if len(df) > 0]
+    if not chunks:
+        return None, 0
+    df_batch = pd.concat(chunks, ignore_index=True)
+    # Remover duplicatas antes de salvar (pode haver duplicatas entre chunks)
+    registros_antes_batch = len(df_batch)
+    df_batch = df_batch.drop_duplicates(subset=['dia_utc', 'estacao_id'], keep='last')
+    if registros_antes_batch != len(df_batch):
+        print(f"      ⚠️  Removidas {registros_antes_batch - len(df_batch)} duplicatas no batch {numero}")
+    df_batch.to_parquet(
+        batch_file,
+        index=False,
+        engine='pyarrow',
+        compression='snappy',
+        coerce_timestamps='us'
+    )
+    print(f"      💾 Batch {numero} salvo: {len(df_batch):,} registros, {batch_file.stat().st_size / (1024*1024):.2f} MB")
+    return batch_file, len(df_batch)
+
+def carregar_parquet_bigquery(client_bq, table_ref, schema, parquet_file):
+    """Carrega um Parquet na tabela com WRITE_APPEND e aguarda o job."""
+    file_job_config = bigquery.LoadJobConfig(
+        # Mesmo contrato do exportar: schema explícito mapeia Parquet → DATETIME em `dia` (não só inferência).
+        schema=schema,
+        write_disposition=bigquery.WriteDisposition.WRITE_APPEND,
+        source_format=bigquery.SourceFormat.PARQUET,
+        schema_update_options=[
+            bigquery.SchemaUpdateOption.ALLOW_FIELD_ADDITION,
+            bigquery.SchemaUpdateOption.ALLOW_FIELD_RELAXATION,
+        ],
+    )
+    with open(parquet_file, 'rb') as source_file:
+        job = client_bq.load_table_from_file(
+            source_file,
+            table_ref,
+            job_config=file_job_config
+        )
+        job.result()
+
+def executar_pipeline(ler_chunks, preparar, carregar,
+                      chunks_por_batch=CHUNKS_POR_BATCH,
+                      workers_transformacao=WORKERS_TRANSFORMACAO,
+                      workers_upload=WORKERS_UPLOAD,
+                      fila_max=FILA_CHUNKS_MAX):
+    """Executa leitura, preparação e carga de batches com estágios sobrepostos.
+
+    Uma thread lê os chunks para uma fila limitada; a thread principal agrupa
+    chunks_por_batch chunks por batch e envia ``preparar`` ao pool de
+    transformação; cada batch preparado segue para o pool de upload. No máximo
+    workers_transformacao + workers_upload batches ficam em andamento, então a
+    leitura espera quando transformação ou carga são o gargalo.
+
+    Com workers_upload=1 as cargas seguem a ordem dos batches; depois da
+    primeira falha (de preparo ou de carga) nenhum batch seguinte é carregado.
+
+    Args:
+        ler_chunks: callable sem argumentos que retorna um iterável de DataFrames
+        preparar: callable(chunks, numero) -> (arquivo ou None, registros)
+        carregar: callable(arquivo) chamado no pool de upload
+
+    Returns:
+        dict: registros, batches, tempo_total e segundos ocupados por estágio
+            (leitura, transformacao, upload)
+
+    Raises:
+        Exception: o primeiro erro de qualquer estágio; batches ainda não
+            enviados são cancelados.
+    """
+    fila = queue.Queue(maxsize=fila_max)
+    parar = threading.Event()
+    falha = threading.Event()
+    vagas = threading.BoundedSemaphore(workers_transformacao + workers_upload)
+    tempos = {'leitura': 0.0, 'transformacao': 0.0, 'upload': 0.0}
+    lock_tempos = threading.Lock()
+
+    def _somar_tempo(estagio, inicio):
+        with lock_tempos:
+            tempos[estagio] += time.perf_counter() - inicio
+
+    def _colocar(item):
+        while not parar.is_set():
+            try:
+                fila.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _leitor():
+        iterador = None
+        try:
+            iterador = iter(ler_chunks())
+            while not parar.is_set():
+                inicio = time.perf_counter()
+                chunk = next(iterador, _FIM_LEITURA)
+                _somar_tempo('leitura', inicio)
+                if chunk is _FIM_LEITURA or not _colocar(chunk):
+                    break
+        except Exception as e:
+            _colocar(e)
+        finally:
+            # Interrompido antes do fim: fecha o gerador (e o cursor server-side)
+            if hasattr(iterador, 'close'):
+                iterador.close()
+        _colocar(_FIM_LEITURA)
+
+    def _preparar(chunks, numero):
+        inicio = time.perf_counter()
+        try:
+            return preparar(chunks, numero)
+        finally:
+            _somar_tempo('transformacao', inicio)
 
-def sincronizar_incremental():
+    def _carregar(futuro_preparo):
+        if falha.is_set():
+            raise RuntimeError("Carga interrompida: um batch anterior falhou")
+        try:
+            arquivo, registros = futuro_preparo.result()
+            if arquivo is None:
+                return 0
+            inicio = time.perf_counter()
+            try:
+                carregar(arquivo)
+            finally:
+                _somar_tempo('upload', inicio)
+        except BaseException:
+            falha.set()
+            raise
+        return registros
+
+    inicio_total = time.perf_counter()
+    leitor = threading.Thread(target=_leitor, name='leitor-nimbus', daemon=True)
+    pool_transformacao = ThreadPoolExecutor(max_workers=workers_transformacao, thread_name_prefix='transformacao')
+    pool_upload = ThreadPoolExecutor(max_workers=workers_upload, thread_name_prefix='upload')
+    futuros = []
+
+    def _enviar(chunks):
+        # Espera uma vaga sem travar: um erro de carga libera o laço principal
+        while not vagas.acquire(timeout=0.5):
+            _verificar_erros()
+        numero = len(futuros) + 1
+        futuro_preparo = pool_transformacao.submit(_preparar, chunks, numero)
+        futuro_carga = pool_upload.submit(_carregar, futuro_preparo)
+        futuro_carga.add_done_callback(lambda _: vagas.release())
+        futuros.append(futuro_carga)
+
+    def _verificar_erros():
+        for futuro in futuros:
+            if futuro.done() and futuro.exception() is not None:
+                raise futuro.exception()
+
+    try:
+        leitor.start()
+        pendentes = []
+        while True:
+            item = fila.get()
+            if item is _FIM_LEITURA:
+                break
+            if isinstance(item, Exception):
+                raise item
+            pendentes.append(item)
+            if len(pendentes) >= chunks_por_batch:
+                _enviar(pendentes)
+                pendentes = []
+            _verificar_erros()
+        if pendentes:
+            _enviar(pendentes)
+
+        registros = sum(futuro.result() for futuro in futuros)
+    except BaseException:
+        parar.set()
+        pool_transformacao.shutdown(wait=True, cancel_futures=True)
+        pool_upload.shutdown(wait=True, cancel_futures=True)
+        raise
+    finally:
+        parar.set()
+        leitor.join()
+
+    pool_transformacao.shutdown(wait=True)
+    pool_upload.shutdown(wait=True)
+    return {
+        'registros': registros,
+        'batches': len(futuros),
+        'tempo_total': time.perf_counter() - inicio_total,
+        **tempos,
+    }
+
+def sincronizar_incremental(carga_unica=None, merge=None):
     """Sincroniza apenas dados novos do NIMBUS para BigQuery.
     
     Usa EXATAMENTE a mesma lógica do script de exportação.
+
+    Args:
+        carga_unica: True junta todos os batches em um Parquet e faz um único
+            load job (tudo ou nada); None usa BIGQUERY_CARGA_UNICA do .env
+        merge: True carrega numa tabela de staging da execução e aplica um
+            MERGE em (dia_utc, estacao_id) na tabela final (retry não duplica);
+            None usa BIGQUERY_MERGE do .env
     """
+    if carga_unica is None:
+        carga_unica = BIGQUERY_CONFIG['carga_unica']
+    if merge is None:
+        merge = BIGQUERY_CONFIG['merge']
+    staging = None
     engine_nimbus = None
     client_bq = None
     
@@ -421,224 +675,84 @@ def sincronizar_incremental():
             anos = diferenca_dias / 365.25
             print(f"   ⚠️  ATENÇÃO: Coletando {anos:.1f} anos de dados - isso pode demorar bastante!")
         
-        query = query_dados_incrementais(ultima_sincronizacao_geral, ultimas_por_estacao)
+        query, parametros_query = query_dados_incrementais(ultima_sincronizacao_geral, ultimas_por_estacao)
         schema_pluviometricos = obter_schema_pluviometricos()
 
-        # Processar e carregar - EXATAMENTE a mesma lógica do script de exportação
-        inicio_query = datetime.now()
-        chunksize = 10000
-        total_registros = 0
-        chunk_numero = 1
-        
+        # Processar e carregar - EXATAMENTE a mesma lógica do script de exportação,
+        # com leitura, Parquet e carga sobrepostas (executar_pipeline)
         print(f"\n📦 Processando e carregando dados incrementais no BigQuery...")
         print(f"   💡 Usando formato Parquet para melhor performance")
         print(f"   💡 Query usa DISTINCT ON (mesma lógica dos scripts servidor166)")
-        print(f"   💡 Removendo duplicatas por (dia_utc, estacao_id) para garantir unicidade\n")
-        
-        temp_dir = tempfile.mkdtemp()
-        parquet_files = []
-        
-        chunks_list = []
-        batch_size = 4
-        batch_file_num = 1
-        
-        for chunk_df in pd.read_sql(query, engine_nimbus, chunksize=chunksize):
-            print(f"   📦 Processando chunk {chunk_numero} ({len(chunk_df):,} registros)...")
-            
-            # Renomear colunas
-            chunk_df = chunk_df.rename(columns={
-                'Dia': 'dia_utc',
-                'Estacao': 'estacao'
-            })
-            
-            # Remover colunas auxiliares
-            colunas_para_remover = ['TimezoneOffset', 'leitura_id']
-            for col in colunas_para_remover:
-                if col in chunk_df.columns:
-                    chunk_df = chunk_df.drop(columns=[col])
-            
-            # Mesma lógica que exportar_pluviometricos_nimbus_bigquery.py (4 colunas de tempo).
-            def converter_para_utc_e_processar(dt):
-                """Retorna (dia_utc, dia_local_sp, dia_original_str, utc_offset_str) — alinhado ao exportar."""
-                if pd.isna(dt):
-                    return (None, None, None, None)
-                try:
-                    if isinstance(dt, str):
-                        dt_parsed = pd.to_datetime(dt)
-                    elif isinstance(dt, pd.Timestamp):
-                        dt_parsed = dt
-                    elif hasattr(dt, 'tzinfo') and dt.tzinfo is not None:
-                        dt_parsed = pd.Timestamp(dt)
-                    else:
-                        dt_parsed = pd.to_datetime(dt)
-                    
-                    if isinstance(dt_parsed, pd.Timestamp) and dt_parsed.tz is not None:
-                        dt_sp = dt_parsed.tz_convert('America/Sao_Paulo')
-                    else:
-                        dt_parsed = dt_parsed.tz_localize('UTC')
-                        dt_sp = dt_parsed.tz_convert('America/Sao_Paulo')
-                    
-                    offset = dt_sp.tz.utcoffset(dt_sp)
-                    if offset:
-                        total_seconds = offset.total_seconds()
-                        hours = int(total_seconds // 3600)
-                        minutes = int((abs(total_seconds) % 3600) // 60)
-                        utc_offset_str = f"{hours:+03d}{minutes:02d}"
-                    else:
-                        utc_offset_str = "-0300"
-                    
-                    timestamp_str = dt_sp.strftime('%Y-%m-%d %H:%M:%S')
-                    if dt_sp.microsecond:
-                        microsec_str = str(dt_sp.microsecond)[:3].zfill(3)
-                        timestamp_str += f".{microsec_str}"
-                    else:
-                        timestamp_str += ".000"
-                    dia_original_str = f"{timestamp_str} {utc_offset_str}"
-                    
-                    # dia_utc em UTC (sem timezone); dia = mesmo instante em SP sem tz (DATETIME no BQ)
-                    dt_utc = dt_parsed.tz_convert('UTC').tz_localize(None) if dt_parsed.tz is not None else dt_parsed
-                    dia_local_sp = dt_sp.tz_localize(None)
-                    return (dt_utc, dia_local_sp, dia_original_str, utc_offset_str)
-                except Exception as e:
-                    print(f"      ⚠️  Erro ao processar timestamp: {e}")
-                    return (None, None, None, None)
-            
-            resultados = chunk_df['dia_utc'].apply(converter_para_utc_e_processar)
-            chunk_df['dia_utc'] = resultados.apply(lambda x: x[0])
-            chunk_df['dia'] = resultados.apply(lambda x: x[1])
-            chunk_df['dia_original'] = resultados.apply(lambda x: x[2])
-            chunk_df['utc_offset'] = resultados.apply(lambda x: x[3])
-            # Alinhar tipos ao exportar: DATETIME no BQ = datetime64 sem tz (microssegundos)
-            if 'dia' in chunk_df.columns:
-                chunk_df['dia'] = pd.to_datetime(chunk_df['dia']).dt.floor('us')
-
-            if 'estacao_id' in chunk_df.columns:
-                chunk_df['estacao_id'] = chunk_df['estacao_id'].astype('Int64')
-            
-            # Converter colunas numéricas no mesmo padrão do script de exportação (FLOAT64)
-            colunas_numericas = ['m05', 'm10', 'm15', 'h01', 'h02', 'h03', 'h04', 'h06', 'h12', 'h24', 'h96', 'mes']
-            for col in colunas_numericas:
-                if col in chunk_df.columns:
-                    chunk_df[col] = pd.to_numeric(chunk_df[col], errors='coerce').astype('float64')
-            
-            # Filtrar registros com dia_utc NULL
-            registros_antes = len(chunk_df)
-            chunk_df = chunk_df[chunk_df['dia_utc'].notna()]
-            registros_depois = len(chunk_df)
-            if registros_antes != registros_depois:
-                print(f"      ⚠️  Removidos {registros_antes - registros_depois} registros com dia_utc NULL")
-            
-            # IMPORTANTE: Remover duplicatas baseado em (dia_utc, estacao_id)
-            registros_antes_dedup = len(chunk_df)
-            chunk_df = chunk_df.drop_duplicates(subset=['dia_utc', 'estacao_id'], keep='last')
-            registros_depois_dedup = len(chunk_df)
-            if registros_antes_dedup != registros_depois_dedup:
-                print(f"      ⚠️  Removidas {registros_antes_dedup - registros_depois_dedup} duplicatas (dia_utc, estacao_id)")
-            
-            if len(chunk_df) > 0:
-                chunks_list.append(chunk_df)
-            total_registros += len(chunk_df)
-            chunk_numero += 1
-            
-            # Escrever batch em arquivo Parquet
-            if len(chunks_list) >= batch_size:
-                df_batch = pd.concat(chunks_list, ignore_index=True)
-                # Remover duplicatas antes de salvar (pode haver duplicatas entre chunks)
-                registros_antes_batch = len(df_batch)
-                df_batch = df_batch.drop_duplicates(subset=['dia_utc', 'estacao_id'], keep='last')
-                registros_depois_batch = len(df_batch)
-                if registros_antes_batch != registros_depois_batch:
-                    print(f"      ⚠️  Removidas {registros_antes_batch - registros_depois_batch} duplicatas no batch {batch_file_num}")
-                batch_file = Path(temp_dir) / f'{table_id}_batch_{batch_file_num:04d}.parquet'
-                df_batch.to_parquet(
-                    batch_file, 
-                    index=False, 
-                    engine='pyarrow', 
-                    compression='snappy',
-                    coerce_timestamps='us'
-                )
-                parquet_files.append(batch_file)
-                print(f"      💾 Batch {batch_file_num} salvo: {batch_file.stat().st_size / (1024*1024):.2f} MB")
-                chunks_list.clear()
-                del df_batch
-                gc.collect()
-                batch_file_num += 1
-        
-        # Escrever chunks restantes
-        if chunks_list:
-            df_batch = pd.concat(chunks_list, ignore_index=True)
-            df_batch = df_batch[df_batch['dia_utc'].notna()]
-            # Remover duplicatas antes de salvar
-            registros_antes_final = len(df_batch)
-            df_batch = df_batch.drop_duplicates(subset=['dia_utc', 'estacao_id'], keep='last')
-            registros_depois_final = len(df_batch)
-            if registros_antes_final != registros_depois_final:
-                print(f"      ⚠️  Removidas {registros_antes_final - registros_depois_final} duplicatas no batch final")
-            if len(df_batch) > 0:
-                batch_file = Path(temp_dir) / f'{table_id}_batch_{batch_file_num:04d}.parquet'
-                df_batch.to_parquet(
-                    batch_file, 
-                    index=False, 
-                    engine='pyarrow', 
-                    compression='snappy',
-                    coerce_timestamps='us'
-                )
-                parquet_files.append(batch_file)
-                print(f"      💾 Batch {batch_file_num} salvo: {batch_file.stat().st_size / (1024*1024):.2f} MB")
-                del df_batch
-                gc.collect()
-        
-        if total_registros == 0:
-            print("\n✅ Nenhum dado novo para sincronizar.")
-            return True
-        
-        total_size = sum(f.stat().st_size for f in parquet_files) / (1024*1024)
-        print(f"\n   ✅ {len(parquet_files)} arquivos Parquet criados: {total_size:.2f} MB total")
-        
-        tempo_query = (datetime.now() - inicio_query).total_seconds()
-        print(f"   ✅ Dados processados: {total_registros:,} registros em {tempo_query:.1f} segundos")
-        
-        # Carregar arquivos Parquet no BigQuery
-        print(f"\n📤 Carregando {len(parquet_files)} arquivos Parquet no BigQuery...")
+        print(f"   💡 Removendo duplicatas por (dia_utc, estacao_id) para garantir unicidade")
+        if carga_unica:
+            print(f"   💡 Carga única: batches viram um só Parquet e um load job (tudo ou nada)")
+        workers_upload = WORKERS_UPLOAD_STAGING if merge else WORKERS_UPLOAD
+        print(f"   💡 Pipeline: 1 leitor, {WORKERS_TRANSFORMACAO} workers de transformação, "
+              f"{workers_upload} de upload ({CHUNKS_POR_BATCH} chunks de {CHUNKSIZE:,} por batch)\n")
         print(f"   Tabela: {client_bq.project}.{dataset_id}.{table_id}")
-        
-        inicio_carga = datetime.now()
-        
-        for i, parquet_file in enumerate(parquet_files, 1):
-            print(f"   📤 Carregando arquivo {i}/{len(parquet_files)}: {parquet_file.name}...")
-            file_job_config = bigquery.LoadJobConfig(
-                # Mesmo contrato do exportar: schema explícito mapeia Parquet → DATETIME em `dia` (não só inferência).
-                schema=schema_pluviometricos,
-                write_disposition=bigquery.WriteDisposition.WRITE_APPEND,
-                source_format=bigquery.SourceFormat.PARQUET,
-                schema_update_options=[
-                    bigquery.SchemaUpdateOption.ALLOW_FIELD_ADDITION,
-                    bigquery.SchemaUpdateOption.ALLOW_FIELD_RELAXATION,
-                ],
-            )
-            
-            with open(parquet_file, 'rb') as source_file:
-                job = client_bq.load_table_from_file(
-                    source_file,
-                    table_ref,
-                    job_config=file_job_config
-                )
-                job.result()
-                print(f"      ✅ Arquivo {i}/{len(parquet_files)} carregado com sucesso")
-        
-        tempo_carga = (datetime.now() - inicio_carga).total_seconds()
-        
-        # Limpar arquivos temporários
-        print(f"   🧹 Limpando arquivos temporários...")
-        for parquet_file in parquet_files:
-            try:
-                parquet_file.unlink()
-            except Exception:
-                pass
+
+        temp_dir = Path(tempfile.mkdtemp())
+
+        if merge:
+            # Batches vão para a tabela de staging; a final só muda no MERGE
+            staging = criar_tabela_staging(client_bq, dataset_id, table_id, schema_pluviometricos)
+            print(f"   💡 Modo MERGE: staging {staging.table_id} → MERGE em (dia_utc, estacao_id)")
+        destino_carga = staging.reference if merge else table_ref
+
+        def _carregar(parquet_file):
+            if carga_unica:
+                # Batch fica no staging local até a carga única no fim do pipeline
+                return
+            carregar_parquet_bigquery(client_bq, destino_carga, schema_pluviometricos, parquet_file)
+            print(f"      ✅ {parquet_file.name} carregado")
+            parquet_file.unlink()
+
         try:
-            os.rmdir(temp_dir)
-        except Exception:
-            pass
+            resultado = executar_pipeline(
+                lambda: ler_chunks_nimbus(engine_nimbus, query, parametros_query),
+                lambda chunks, numero: preparar_batch(
+                    chunks, temp_dir / f'{table_id}_batch_{numero:04d}.parquet', numero
+                ),
+                _carregar,
+                workers_upload=workers_upload,
+            )
+
+            total_registros = resultado['registros']
+            if total_registros == 0:
+                print("\n✅ Nenhum dado novo para sincronizar.")
+                return True
+
+            tempo_carga = resultado['tempo_total']
+            print(f"\n   ⏱️  Tempo ocupado por estágio: leitura {resultado['leitura']:.1f}s | "
+                  f"transformação+Parquet {resultado['transformacao']:.1f}s | upload {resultado['upload']:.1f}s "
+                  f"(somados entre workers); total {tempo_carga:.1f}s em {resultado['batches']} batches")
+
+            if carga_unica:
+                # Todos os batches como row groups de um Parquet → um load job atômico
+                batches = sorted(temp_dir.glob(f'{table_id}_batch_*.parquet'))
+                arquivo_unico = temp_dir / f'{table_id}_sync.parquet'
+                concatenar_parquets(batches, arquivo_unico)
+                for batch in batches:
+                    batch.unlink()
+                print(f"\n📤 Carga única: {len(batches)} batches em {arquivo_unico.name} "
+                      f"({arquivo_unico.stat().st_size / (1024*1024):.2f} MB)...")
+                inicio_carga = time.perf_counter()
+                carregar_parquet_bigquery(client_bq, destino_carga, schema_pluviometricos, arquivo_unico)
+                tempo_carga += time.perf_counter() - inicio_carga
+
+            if merge:
+                print(f"\n🔀 MERGE {staging.table_id} → {table_id}...")
+                inicio_merge = time.perf_counter()
+                resultado_merge = merge_staging(client_bq, staging, client_bq.get_table(table_ref), schema_pluviometricos)
+                tempo_carga += time.perf_counter() - inicio_merge
+                print(f"   ✅ {resultado_merge['inseridos']:,} inseridos, {resultado_merge['atualizados'] or 0:,} atualizados "
+                      f"de {resultado_merge['linhas_staging']:,} no staging "
+                      f"(partições {resultado_merge['inicio_particoes']:%Y-%m} a {resultado_merge['fim_particoes']:%Y-%m} exclusivo)")
+        finally:
+            # Limpar arquivos temporários
+            shutil.rmtree(temp_dir, ignore_errors=True)
+            if staging is not None:
+                remover_tabela_staging(client_bq, staging)
         
         print(f"\n   ✅ Tabela '{table_id}' atualizada: {total_registros:,} registros adicionados em {tempo_carga:.1f} segundos")
         
@@ -662,7 +776,10 @@ def main():
     """Função principal."""
     try:
         if '--once' in sys.argv:
-            sucesso = sincronizar_incremental()
+            sucesso = sincronizar_incremental(
+                carga_unica=True if '--carga-unica' in sys.argv else None,
+                merge=True if '--merge' in sys.argv else None,
+            )
             sys.exit(0 if sucesso else 1)
         else:
             print("=" * 80)
@@ -671,7 +788,10 @@ def main():
             print("\n⚠️  Para usar com cron, execute com --once:")
             print("   python scripts/bigquery/sincronizar_pluviometricos_nimbus_bigquery.py --once")
             print("\n🔄 Executando sincronização única...\n")
-            sucesso = sincronizar_incremental()
+            sucesso = sincronizar_incremental(
+                carga_unica=True if '--carga-unica' in sys.argv else None,
+                merge=True if '--merge' in sys.argv else None,
+            )
             if sucesso:
                 print("\n✅ Sincronização concluída com sucesso!")
             else:
@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Extração em janelas de tempo com keyset pagination para queries da NIMBUS.
+
+As queries DISTINCT ON ("horaLeitura", estacao_id) ... ORDER BY ..., el.id DESC
+obrigam a NIMBUS a ordenar o resultado inteiro antes de devolver a primeira
+linha. Aqui a mesma query é executada por janelas de "horaLeitura" (ex.: um dia)
+e, dentro de cada janela, em páginas de tamanho fixo:
+
+    WHERE <coluna_tempo> >= janela_inicio AND <coluna_tempo> < janela_fim
+      AND (<coluna_tempo>, <coluna_estacao>) > (última chave emitida)
+    ORDER BY ... LIMIT tamanho_pagina
+
+Cada página ordena no máximo uma janela, o DISTINCT ON continua deduplicando
+(dentro da janela, que contém todas as versões de cada chave) e os registros
+saem por um gerador: a primeira linha chega em segundos e a memória de
+ordenação no servidor fica limitada ao tamanho da janela.
+
+A query base deve ser um SELECT com MARCADOR_JANELA dentro do WHERE e terminar
+no ORDER BY (sem LIMIT e sem ';'); os parâmetros são nomeados (%(nome)s).
+
+filtro_incremental_estacoes monta o filtro "só o que cada estação ainda não
+sincronizou" com os watermarks como arrays vinculados (JOIN com unnest, um
+range por estação), no lugar de um OR por estação formatado no texto da query.
+"""
+
+from datetime import datetime, timedelta
+
+from normalizacao_tempo import FUSO_NAIVE_NIMBUS
+
+MARCADOR_JANELA = '{filtro_janela}'
+JANELA_PADRAO = timedelta(days=1)
+TAMANHO_PAGINA_PADRAO = 10000
+
+
+def _como_datetime(valor, fuso_naive=FUSO_NAIVE_NIMBUS):
+    """Converte string ISO/datetime para datetime com timezone (sem timezone = fuso_naive)."""
+    if isinstance(valor, str):
+        valor = datetime.fromisoformat(valor)
+    if valor.tzinfo is None:
+        valor = valor.replace(tzinfo=fuso_naive)
+    return valor
+
+
+def filtro_incremental_estacoes(alias, inicio, watermarks=None, fuso_naive=FUSO_NAIVE_NIMBUS,
+                                incluir_novas=True):
+    """Filtro incremental por estação sobre estacoes_leitura, com parâmetros vinculados.
+
+    Com watermarks, estacoes_leitura é juntada a uma tabela derivada
+    (estacao_id, ultimo_dia) e cada estação é filtrada só pelo próprio
+    watermark: com índice em (estacao_id, "horaLeitura") o plano vira um range
+    scan por estação, e uma estação parada há anos não arrasta as demais.
+    Estações de estacoes_estacao ainda sem watermark entram por um segundo
+    ramo (UNION ALL) com '-infinity', ou seja, com o histórico completo;
+    com incluir_novas=False só as estações de watermarks entram.
+
+    Sem watermarks, o filtro é só ``"horaLeitura" > inicio``.
+
+    Args:
+        alias: alias de estacoes_leitura na query (ex.: 'el')
+        inicio: limite exclusivo usado quando não há watermarks
+        watermarks: {estacao_id: último horaLeitura sincronizado} ou None
+        fuso_naive: timezone assumido para valores sem offset
+        incluir_novas: inclui as estações sem watermark (ramo '-infinity')
+
+    Returns:
+        tuple: (join, condicao, parametros) — join vai logo após os JOINs de
+        alias, condicao dentro do WHERE e parametros é um dict (%(nome)s).
+    """
+    if not watermarks:
+        return (
+            '',
+            f'{alias}."horaLeitura" > %(inicio_incremental)s',
+            {'inicio_incremental': _como_datetime(inicio, fuso_naive)},
+        )
+
+    ramo_novas = """
+    UNION ALL
+    SELECT novas.id, '-infinity'::timestamptz
+    FROM public.estacoes_estacao AS novas
+    WHERE novas.id <> ALL(%(wm_estacoes)s::int[])""" if incluir_novas else ''
+    join = f"""
+JOIN (
+    SELECT w.estacao_id, w.ultimo_dia
+    FROM unnest(%(wm_estacoes)s::int[], %(wm_marcas)s::timestamptz[]) AS w(estacao_id, ultimo_dia){ramo_novas}
+) AS wm
+    ON wm.estacao_id = {alias}.estacao_id"""
+    condicao = f'{alias}."horaLeitura" > wm.ultimo_dia'
+    parametros = {
+        'wm_estacoes': [int(estacao_id) for estacao_id in watermarks],
+        'wm_marcas': [_como_datetime(marca, fuso_naive) for marca in watermarks.values()],
+    }
+    return join, condicao, parametros
+
+
+def iterar_em_janelas(conn, query_base, parametros=None, inicio=None, fim=None,
+                      janela=JANELA_PADRAO, tamanho_pagina=TAMANHO_PAGINA_PADRAO,
+                      coluna_tempo='el."horaLeitura"', coluna_estacao='el.estacao_id',
+                      indice_tempo=0, indice_estacao=-1, apos_chave=None):
+    """Gera os registros de query_base em ordem, janela a janela.
+
+    Args:
+        conn: conexão psycopg2 com o banco origem
+        query_base: SELECT com MARCADOR_JANELA no WHERE, terminando em ORDER BY
+        parametros: dict de parâmetros nomeados da query base
+        inicio: início inclusivo da primeira janela (obrigatório)
+        fim: fim exclusivo; None = até o NOW() da origem (última janela aberta)
+        janela: largura de cada janela (timedelta)
+        tamanho_pagina: LIMIT de cada página dentro da janela
+        coluna_tempo / coluna_estacao: expressões SQL da chave (ordem do DISTINCT ON)
+        indice_tempo / indice_estacao: posição da chave em cada registro
+        apos_chave: (tempo, estacao_id) já processado; a extração continua
+            estritamente depois dele (retomada)
+
+    Yields:
+        tuple: registros na ordem (coluna_tempo, coluna_estacao)
+    """
+    if MARCADOR_JANELA not in query_base:
+        raise ValueError(f"query_base precisa conter {MARCADOR_JANELA} no WHERE")
+    if inicio is None:
+        raise ValueError("inicio é obrigatório para a extração em janelas")
+
+    inicio = _como_datetime(inicio)
+    fim = _como_datetime(fim) if fim is not None else None
+    chave = None
+    if apos_chave is not None:
+        chave = (_como_datetime(apos_chave[0]), apos_chave[1])
+        inicio = max(inicio, chave[0])
+
+    agora = None
+    if fim is None:
+        with conn.cursor() as cur:
+            cur.execute('SELECT NOW();')
+            agora = cur.fetchone()[0]
+
+    query_pagina = query_base.rstrip().rstrip(';') + '\nLIMIT %(limite_pagina)s;'
+    janela_inicio = inicio
+    while fim is None or janela_inicio < fim:
+        janela_fim = janela_inicio + janela
+        if fim is not None:
+            janela_fim = min(janela_fim, fim)
+        # Sem fim definido, a janela que alcança o presente fica aberta à direita
+        aberta = fim is None and janela_fim > agora
+
+        while True:
+            condicoes = [f'{coluna_tempo} >= %(janela_inicio)s']
+            if not aberta:
+                condicoes.append(f'{coluna_tempo} < %(janela_fim)s')
+            if chave is not None:
+                condicoes.append(
+                    f'({coluna_tempo}, {coluna_estacao}) > (%(chave_tempo)s, %(chave_estacao)s)'
+                )
+            parametros_pagina = dict(parametros or {})
+            parametros_pagina.update({
+                'janela_inicio': janela_inicio,
+                'janela_fim': janela_fim,
+                'chave_tempo': chave[0] if chave else None,
+                'chave_estacao': chave[1] if chave else None,
+                'limite_pagina': tamanho_pagina,
+            })
+
+            with conn.cursor() as cur:
+                cur.execute(
+                    query_pagina.replace(MARCADOR_JANELA, ' AND '.join(condicoes)),
+                    parametros_pagina
+                )
+                registros = cur.fetchall()
+
+            yield from registros
+            if len(registros) < tamanho_pagina:
+                break
+            ultimo = registros[-1]
+            chave = (ultimo[indice_tempo], ultimo[indice_estacao])
+
+        if aberta:
+            return
+        # A chave só restringe a janela em que foi emitida
+        chave = None
+        janela_inicio = janela_fim
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Carga idempotente no BigQuery: tabela de staging por execução + MERGE.
+
+Com WRITE_APPEND, um sync repetido (retry, watermark sobreposto) duplica
+linhas (dia_utc, estacao_id). No modo MERGE o sync carrega os batches numa
+tabela de staging própria da execução e faz um único MERGE na tabela final:
+
+- chave (dia_utc, estacao_id); das linhas repetidas no staging fica uma só,
+  escolhida pela ordem dos valores (não pela ordem de chegada dos batches,
+  que varia com os uploads em paralelo), então um retry dá o mesmo resultado
+- o ON limita a tabela final ao intervalo de meses presentes no staging,
+  então só as partições mensais afetadas são lidas
+- linhas já existentes só são reescritas se algum valor mudou; um retry
+  com os mesmos dados não insere nem atualiza nada
+
+A tabela de staging expira sozinha (STAGING_EXPIRACAO) caso o script morra
+antes de removê-la.
+"""
+
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from google.cloud import bigquery
+
+CHAVES_MERGE = ('dia_utc', 'estacao_id')
+STAGING_EXPIRACAO = timedelta(days=1)
+
+
+def criar_tabela_staging(client, dataset_id, table_id, schema):
+    """Cria a tabela de staging desta execução (mesmo schema da final).
+
+    Returns:
+        bigquery.Table: tabela criada ({table_id}_staging_<UTC>_<id>)
+    """
+    agora = datetime.now(timezone.utc)
+    nome = f"{table_id}_staging_{agora:%Y%m%d%H%M%S}_{uuid.uuid4().hex[:8]}"
+    tabela = bigquery.Table(client.dataset(dataset_id).table(nome), schema=schema)
+    tabela.expires = agora + STAGING_EXPIRACAO
+    return client.create_table(tabela)
+
+
+def remover_tabela_staging(client, staging):
+    """Remove a tabela de staging (sem erro se já não existir)."""
+    client.delete_table(staging, not_found_ok=True)
+
+
+def _nome_completo(tabela):
+    return f"`{tabela.project}.{tabela.dataset_id}.{tabela.table_id}`"
+
+
+def _inicio_mes(valor):
+    return valor.astimezone(timezone.utc).replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def _proximo_mes(valor):
+    inicio = _inicio_mes(valor)
+    return inicio.replace(year=inicio.year + 1, month=1) if inicio.month == 12 else inicio.replace(month=inicio.month + 1)
+
+
+def sql_merge(destino, staging, colunas, chaves=CHAVES_MERGE):
+    """MERGE de staging em destino por chaves, limitado a [@inicio_particoes, @fim_particoes).
+
+    Args:
+        destino, staging: tabelas (project/dataset_id/table_id)
+        colunas: nomes das colunas (as do schema do sync)
+        chaves: colunas da chave; a primeira é a coluna de partição
+    """
+    particao = chaves[0]
+    valores = [c for c in colunas if c not in chaves]
+    condicao_chave = ' AND '.join(f'T.`{c}` = S.`{c}`' for c in chaves)
+    houve_mudanca = ' OR '.join(f'T.`{c}` IS DISTINCT FROM S.`{c}`' for c in valores)
+    atribuicoes = ',\n    '.join(f'`{c}` = S.`{c}`' for c in valores)
+    lista_colunas = ', '.join(f'`{c}`' for c in colunas)
+    lista_valores = ', '.join(f'S.`{c}`' for c in colunas)
+    particao_chaves = ', '.join(f'`{c}`' for c in chaves)
+    # Desempate determinístico entre repetidas: linhas com valores preenchidos primeiro
+    ordem_duplicadas = ', '.join(f'`{c}` ASC NULLS LAST' for c in (valores or chaves))
+    return f"""
+MERGE {_nome_completo(destino)} T
+USING (
+    SELECT *
+    FROM {_nome_completo(staging)}
+    WHERE TRUE
+    QUALIFY ROW_NUMBER() OVER (PARTITION BY {particao_chaves} ORDER BY {ordem_duplicadas}) = 1
+) S
+ON {condicao_chave}
+   AND T.`{particao}` >= @inicio_particoes AND T.`{particao}` < @fim_particoes
+WHEN MATCHED AND ({houve_mudanca}) THEN UPDATE SET
+    {atribuicoes}
+WHEN NOT MATCHED THEN
+    INSERT ({lista_colunas}) VALUES ({lista_valores})
+"""
+
+
+def merge_staging(client, staging, destino, schema, chaves=CHAVES_MERGE):
+    """Aplica o staging na tabela final com um único MERGE.
+
+    Returns:
+        dict: linhas_staging, inseridos, atualizados, inicio_particoes, fim_particoes
+    """
+    particao = chaves[0]
+    resumo = list(client.query(
+        f"SELECT COUNT(*) AS linhas, MIN(`{particao}`) AS minimo, MAX(`{particao}`) AS maximo "
+        f"FROM {_nome_completo(staging)}"
+    ).result())[0]
+    if not resumo.linhas:
+        return {'linhas_staging': 0, 'inseridos': 0, 'atualizados': 0,
+                'inicio_particoes': None, 'fim_particoes': None}
+
+    inicio_particoes = _inicio_mes(resumo.minimo)
+    fim_particoes = _proximo_mes(resumo.maximo)
+    job_config = bigquery.QueryJobConfig(query_parameters=[
+        bigquery.ScalarQueryParameter('inicio_particoes', 'TIMESTAMP', inicio_particoes),
+        bigquery.ScalarQueryParameter('fim_particoes', 'TIMESTAMP', fim_particoes),
+    ])
+    job = client.query(sql_merge(destino, staging, [campo.name for campo in schema], chaves),
+                       job_config=job_config)
+    job.result()
+
+    estatisticas = getattr(job, 'dml_stats', None)
+    return {
+        'linhas_staging': resumo.linhas,
+        'inseridos': estatisticas.inserted_row_count if estatisticas else job.num_dml_affected_rows,
+        'atualizados': estatisticas.updated_row_count if estatisticas else None,
+        'inicio_particoes': inicio_particoes,
+        'fim_particoes': fim_particoes,
+    }
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Normalização vetorizada dos timestamps da NIMBUS (horaLeitura).
+
+Compartilhado pelos scripts de carga/sincronização (servidor166 e BigQuery).
+Substitui os loops por linha (isinstance + garantir_datetime_com_timezone +
+Series.apply) por operações de coluna inteira em pandas.
+
+Colunas produzidas:
+- dia_utc:      instante em UTC, sem timezone (TIMESTAMP no BigQuery)
+- dia:          mesmo instante no horário local de São Paulo, sem timezone
+- dia_original: string no formato da NIMBUS (ex: "2025-12-12 16:35:00.000 -0300")
+- utc_offset:   offset de SP naquele instante (ex: "-0300" ou "-0200")
+
+Valores sem timezone são interpretados em ``fuso_naive`` (padrão: -03:00).
+Colunas vindas do banco nunca misturam valores com e sem timezone
+(TIMESTAMPTZ sempre vem com offset, TIMESTAMP nunca), então o tipo da
+coluna é decidido pelo primeiro valor não nulo.
+"""
+
+import re
+from datetime import datetime, timedelta, timezone
+
+import pandas as pd
+
+FUSO_SP = 'America/Sao_Paulo'
+FUSO_NAIVE_NIMBUS = timezone(timedelta(hours=-3))
+COLUNAS_TEMPO = ['dia_utc', 'dia', 'dia_original', 'utc_offset']
+
+_RE_OFFSET_TEXTO = re.compile(r'(?:Z|[+-]\d{2}(?::?\d{2})?)$')
+
+
+def _valor_tem_timezone(valor):
+    """Indica se um valor isolado (datetime, Timestamp ou string) carrega offset."""
+    if isinstance(valor, str):
+        return bool(_RE_OFFSET_TEXTO.search(valor.strip()))
+    if isinstance(valor, datetime):
+        return valor.tzinfo is not None
+    return False
+
+
+def para_utc(valores, fuso_naive=FUSO_NAIVE_NIMBUS):
+    """Converte uma coluna de timestamps para datetime64[ns, UTC].
+
+    Aceita Series/list de datetime (aware ou naive, inclusive com offsets
+    mistos -02:00/-03:00), pd.Timestamp ou strings ISO 8601 (cada string é
+    interpretada por si, com ou sem fração de segundo). Nulos viram NaT.
+
+    Raises:
+        ValueError: algum valor não nulo não pôde ser convertido
+    """
+    serie = valores if isinstance(valores, pd.Series) else pd.Series(valores, dtype=object)
+
+    if isinstance(serie.dtype, pd.DatetimeTZDtype):
+        return serie.dt.tz_convert('UTC')
+    if pd.api.types.is_datetime64_dtype(serie.dtype):
+        return serie.dt.tz_localize(fuso_naive).dt.tz_convert('UTC')
+
+    nao_nulos = serie.dropna()
+    if nao_nulos.empty:
+        return pd.Series(pd.NaT, index=serie.index, dtype='datetime64[ns, UTC]')
+
+    # format='ISO8601': sem ele o pandas infere o formato do primeiro valor e
+    # descarta como NaT as strings com outra precisão (ex.: com milissegundos)
+    if _valor_tem_timezone(nao_nulos.iloc[0]):
+        convertida = pd.to_datetime(serie, utc=True, errors='coerce', format='ISO8601')
+    else:
+        convertida = pd.to_datetime(serie, errors='coerce', format='ISO8601')
+        convertida = convertida.dt.tz_localize(fuso_naive).dt.tz_convert('UTC')
+
+    invalidos = serie[serie.notna() & convertida.isna()]
+    if not invalidos.empty:
+        raise ValueError(
+            f"{len(invalidos)} timestamp(s) inválido(s), ex.: {invalidos.head(3).tolist()}"
+        )
+    return convertida.astype('datetime64[ns, UTC]')
+
+
+def _formatar_offsets(minutos, separador=''):
+    """Formata offsets em minutos como '-0300' (ou '-03:00' com separador ':').
+
+    Há poucos offsets distintos (SP só usa -02:00 e -03:00), então formatamos
+    cada valor único uma vez e mapeamos a coluna inteira.
+    """
+    formatos = {}
+    for valor in pd.unique(minutos.dropna()):
+        valor = int(valor)
+        horas, resto = divmod(abs(valor), 60)
+        sinal = '-' if valor < 0 else '+'
+        formatos[valor] = f"{sinal}{horas:02d}{separador}{resto:02d}"
+    return minutos.map(formatos).astype(object)
+
+
+def _formatar_local(local_naive, digitos_fracao):
+    """Formata datetime64 sem timezone como 'YYYY-MM-DD HH:MM:SS.fff'.
+
+    digitos_fracao=3 gera o formato da NIMBUS; 6 preserva os microssegundos.
+    """
+    texto = local_naive.dt.strftime('%Y-%m-%d %H:%M:%S.%f')
+    if digitos_fracao < 6:
+        texto = texto.str[:digitos_fracao - 6]
+    return texto.astype(object)
+
+
+def _decompor(valores, fuso_naive):
+    """Retorna (utc, local_sp, offset_minutos) como colunas alinhadas."""
+    utc = para_utc(valores, fuso_naive)
+    local = utc.dt.tz_convert(FUSO_SP)
+    utc_naive = utc.dt.tz_localize(None)
+    local_naive = local.dt.tz_localize(None)
+    offset_minutos = ((local_naive - utc_naive) // pd.Timedelta(minutes=1)).astype('Int64')
+    return utc_naive, local_naive, offset_minutos
+
+
+def normalizar_timestamps(valores, fuso_naive=FUSO_NAIVE_NIMBUS):
+    """Calcula dia_utc, dia, dia_original e utc_offset para uma coluna inteira.
+
+    Args:
+        valores: Series/list de timestamps (datetime, pd.Timestamp ou string)
+        fuso_naive: timezone assumido para valores sem offset
+
+    Returns:
+        pd.DataFrame: colunas COLUNAS_TEMPO, com o mesmo índice da entrada.
+        dia_utc e dia são datetime64[us] sem timezone (TIMESTAMP/DATETIME no BigQuery).
+    """
+    utc_naive, local_naive, offset_minutos = _decompor(valores, fuso_naive)
+    utc_offset = _formatar_offsets(offset_minutos)
+    dia_original = _formatar_local(local_naive, 3) + ' ' + utc_offset
+
+    return pd.DataFrame({
+        'dia_utc': utc_naive.dt.floor('us').astype('datetime64[us]'),
+        'dia': local_naive.dt.floor('us').astype('datetime64[us]'),
+        'dia_original': dia_original.where(utc_naive.notna(), None),
+        'utc_offset': utc_offset.where(utc_naive.notna(), None),
+    }, index=utc_naive.index)
+
+
+def aplicar_colunas_tempo(df, coluna='dia_utc', fuso_naive=FUSO_NAIVE_NIMBUS):
+    """Substitui/gera as quatro colunas de tempo de um DataFrame a partir de ``coluna``."""
+    tempo = normalizar_timestamps(df[coluna], fuso_naive)
+    for nome in COLUNAS_TEMPO:
+        df[nome] = tempo[nome]
+    return df
+
+
+def formatar_timestamptz(valores, fuso_naive=FUSO_NAIVE_NIMBUS):
+    """Formata uma coluna como literais TIMESTAMPTZ para o PostgreSQL.
+
+    Usa o horário local de SP com o offset daquele instante
+    (ex: '2019-02-16 23:45:00.000000-02:00'), preservando a leitura original.
+    Valores nulos viram None.
+
+    Returns:
+        list[str | None]: pronto para COPY ou execute_values.
+    """
+    utc_naive, local_naive, offset_minutos = _decompor(valores, fuso_naive)
+    texto = _formatar_local(local_naive, 6) + _formatar_offsets(offset_minutos, ':')
+    texto = texto.where(utc_naive.notna(), None)
+    return texto.tolist()
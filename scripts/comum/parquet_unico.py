@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Junta os Parquet de um sync em um único arquivo para uma carga atômica no BigQuery.
+
+Os scripts de sincronização gravam vários batches Parquet em um diretório
+temporário. Com carga única, os batches viram row groups de um só arquivo e
+o sync faz um único load job: ou todos os registros entram ou nenhum entra,
+e o custo é um job por execução em vez de um por batch.
+
+Os schemas dos batches podem diferir em colunas que vieram totalmente nulas
+em um batch (tipo null no Arrow); o schema final é a unificação de todos.
+"""
+
+from pathlib import Path
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+
+def concatenar_parquets(arquivos, destino, compressao='snappy'):
+    """Grava os Parquet de ``arquivos`` (na ordem) como row groups de ``destino``.
+
+    Args:
+        arquivos: caminhos dos Parquet de origem
+        destino: caminho do Parquet final
+        compressao: codec do arquivo final
+
+    Returns:
+        int: total de linhas gravadas (0 e nenhum arquivo criado se não há origem)
+    """
+    arquivos = [Path(a) for a in arquivos]
+    if not arquivos:
+        return 0
+
+    schema = pa.unify_schemas([pq.read_schema(a) for a in arquivos], promote_options='permissive')
+    total = 0
+    with pq.ParquetWriter(destino, schema, compression=compressao) as writer:
+        for arquivo in arquivos:
+            arquivo_pq = pq.ParquetFile(arquivo)
+            # Um row group por vez: memória limitada ao maior row group de origem
+            for i in range(arquivo_pq.num_row_groups):
+                tabela = arquivo_pq.read_row_group(i)
+                writer.write_table(_ajustar_schema(tabela, schema))
+                total += tabela.num_rows
+    return total
+
+
+def _ajustar_schema(tabela, schema):
+    """Reordena/converte as colunas de tabela para schema (ausentes viram nulas)."""
+    colunas = []
+    for campo in schema:
+        if campo.name in tabela.column_names:
+            colunas.append(tabela.column(campo.name).cast(campo.type))
+        else:
+            colunas.append(pa.nulls(tabela.num_rows, type=campo.type))
+    return pa.Table.from_arrays(colunas, schema=schema)
@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Escrita no BigQuery pela Storage Write API com batches Arrow.
+
+Alternativa ao Parquet + load job nos syncs de ciclo curto: cada batch do
+DataFrame vira RecordBatches Arrow enviados num write stream, sem arquivo
+temporário e sem fila de load jobs.
+
+Modos:
+- committed: cada append fica consultável assim que é confirmado (segundos)
+- pending:   nada aparece até concluir(); o commit do stream é atômico e,
+             se o sync falhar antes, nada é gravado
+
+Os appends levam offset, então um reenvio dentro do mesmo stream não duplica
+linhas.
+
+EscritorStorageWriteLocal tem a mesma interface, serializa os mesmos bytes
+Arrow e grava Parquet numa pasta local: permite testar o caminho sem
+credenciais nem google-cloud-bigquery-storage instalado.
+"""
+
+from collections import deque
+from pathlib import Path
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+MODO_COMMITTED = 'committed'
+MODO_PENDING = 'pending'
+MODOS_STORAGE_WRITE = (MODO_COMMITTED, MODO_PENDING)
+# Limite da API é 10 MB por AppendRowsRequest; linhas meteorológicas têm ~200 bytes
+LINHAS_POR_APPEND = 10000
+APPENDS_EM_VOO = 4
+
+TIPOS_ARROW = {
+    'TIMESTAMP': pa.timestamp('us', tz='UTC'),
+    'DATETIME': pa.timestamp('us'),
+    'DATE': pa.date32(),
+    'STRING': pa.string(),
+    'INTEGER': pa.int64(),
+    'INT64': pa.int64(),
+    'FLOAT': pa.float64(),
+    'FLOAT64': pa.float64(),
+    'BOOLEAN': pa.bool_(),
+    'BOOL': pa.bool_(),
+}
+
+
+def schema_arrow(schema_bq):
+    """Schema Arrow equivalente a uma lista de bigquery.SchemaField."""
+    return pa.schema([
+        pa.field(campo.name, TIPOS_ARROW[campo.field_type.upper()], nullable=campo.mode != 'REQUIRED')
+        for campo in schema_bq
+    ])
+
+
+def dataframe_para_arrow(df, schema):
+    """Converte df para uma tabela Arrow com exatamente as colunas de schema.
+
+    Nomes são casados sem diferenciar maiúsculas (o PostgreSQL devolve aliases
+    sem aspas em minúsculas); colunas ausentes viram nulas. Timestamps sem
+    timezone em campos TIMESTAMP são tratados como UTC.
+    """
+    colunas_df = {str(c).lower(): c for c in df.columns}
+    arrays = []
+    for campo in schema:
+        coluna = colunas_df.get(campo.name.lower())
+        if coluna is None:
+            arrays.append(pa.nulls(len(df), type=campo.type))
+            continue
+        serie = df[coluna]
+        if pa.types.is_timestamp(campo.type) and campo.type.tz is not None and getattr(serie.dt, 'tz', None) is None:
+            serie = serie.dt.tz_localize('UTC')
+        arrays.append(pa.array(serie, type=campo.type, from_pandas=True))
+    return pa.Table.from_arrays(arrays, schema=schema)
+
+
+class _EscritorArrow:
+    """Base: converte DataFrames e fatia em RecordBatches com offset crescente."""
+
+    def __init__(self, schema_bq, modo=MODO_COMMITTED, linhas_por_append=LINHAS_POR_APPEND):
+        if modo not in MODOS_STORAGE_WRITE:
+            raise ValueError(f"modo deve ser um de {MODOS_STORAGE_WRITE}: {modo}")
+        self.schema = schema_arrow(schema_bq)
+        self.modo = modo
+        self.linhas_por_append = linhas_por_append
+        self.offset = 0
+        self.concluido = False
+
+    def __enter__(self):
+        self.abrir()
+        return self
+
+    def __exit__(self, *exc):
+        self.fechar()
+        return False
+
+    def escrever(self, df):
+        """Envia as linhas de df; retorna quantas foram enviadas."""
+        tabela = dataframe_para_arrow(df, self.schema)
+        for batch in tabela.to_batches(max_chunksize=self.linhas_por_append):
+            self._enviar(batch.serialize().to_pybytes(), self.offset, batch.num_rows)
+            self.offset += batch.num_rows
+        return tabela.num_rows
+
+    def abrir(self):
+        raise NotImplementedError
+
+    def _enviar(self, batch_serializado, offset, linhas):
+        raise NotImplementedError
+
+    def concluir(self):
+        """Confirma o stream (pending: commit atômico); retorna linhas gravadas."""
+        raise NotImplementedError
+
+    def fechar(self):
+        """Libera o stream; sem concluir(), um stream pending é descartado."""
+        raise NotImplementedError
+
+
+class EscritorStorageWrite(_EscritorArrow):
+    """Write stream da Storage Write API (google-cloud-bigquery-storage)."""
+
+    def __init__(self, project_id, dataset_id, table_id, schema_bq, modo=MODO_COMMITTED,
+                 credentials=None, linhas_por_append=LINHAS_POR_APPEND):
+        super().__init__(schema_bq, modo, linhas_por_append)
+        self.project_id = project_id
+        self.dataset_id = dataset_id
+        self.table_id = table_id
+        self.credentials = credentials
+        self._client = None
+        self._stream = None
+        self._append_stream = None
+        self._futuros = deque()
+
+    def abrir(self):
+        # Dependência opcional: só quem usa a Storage Write API precisa dela
+        from google.cloud import bigquery_storage_v1
+        from google.cloud.bigquery_storage_v1 import types, writer
+
+        self._types = types
+        self._client = bigquery_storage_v1.BigQueryWriteClient(credentials=self.credentials)
+        self._parent = self._client.table_path(self.project_id, self.dataset_id, self.table_id)
+        tipo = types.WriteStream.Type.PENDING if self.modo == MODO_PENDING else types.WriteStream.Type.COMMITTED
+        self._stream = self._client.create_write_stream(
+            parent=self._parent, write_stream=types.WriteStream(type_=tipo)
+        )
+
+        modelo = types.AppendRowsRequest()
+        modelo.write_stream = self._stream.name
+        dados = types.AppendRowsRequest.ArrowData()
+        dados.writer_schema.serialized_schema = self.schema.serialize().to_pybytes()
+        modelo.arrow_rows = dados
+        self._append_stream = writer.AppendRowsStream(self._client, modelo)
+        return self
+
+    def _enviar(self, batch_serializado, offset, linhas):
+        requisicao = self._types.AppendRowsRequest()
+        requisicao.offset = offset
+        dados = self._types.AppendRowsRequest.ArrowData()
+        dados.rows.serialized_record_batch = batch_serializado
+        requisicao.arrow_rows = dados
+        self._futuros.append(self._append_stream.send(requisicao))
+        while len(self._futuros) > APPENDS_EM_VOO:
+            self._futuros.popleft().result()
+
+    def concluir(self):
+        while self._futuros:
+            self._futuros.popleft().result()
+        self._append_stream.close()
+        self._append_stream = None
+        self._client.finalize_write_stream(name=self._stream.name)
+        if self.modo == MODO_PENDING:
+            resposta = self._client.batch_commit_write_streams(
+                self._types.BatchCommitWriteStreamsRequest(
+                    parent=self._parent, write_streams=[self._stream.name]
+                )
+            )
+            if resposta.stream_errors:
+                raise RuntimeError(f"Commit do write stream falhou: {list(resposta.stream_errors)}")
+        self.concluido = True
+        return self.offset
+
+    def fechar(self):
+        if self._append_stream is not None:
+            self._append_stream.close()
+            self._append_stream = None
+        self._futuros.clear()
+
+
+class EscritorStorageWriteLocal(_EscritorArrow):
+    """Fake local: mesmos bytes Arrow do escritor real, gravados como Parquet em pasta.
+
+    committed grava um arquivo por append na hora; pending só grava em
+    concluir() (fechar() sem concluir descarta tudo).
+    """
+
+    def __init__(self, pasta, schema_bq, modo=MODO_COMMITTED, linhas_por_append=LINHAS_POR_APPEND):
+        super().__init__(schema_bq, modo, linhas_por_append)
+        self.pasta = Path(pasta)
+        self._pendentes = []
+
+    def abrir(self):
+        self.pasta.mkdir(parents=True, exist_ok=True)
+        return self
+
+    def _enviar(self, batch_serializado, offset, linhas):
+        # Desserializa como o servidor faria: valida schema + bytes enviados
+        batch = pa.ipc.read_record_batch(pa.py_buffer(batch_serializado), self.schema)
+        if self.modo == MODO_COMMITTED:
+            self._gravar([batch], offset)
+        else:
+            self._pendentes.append((offset, batch))
+
+    def _gravar(self, batches, offset):
+        pq.write_table(pa.Table.from_batches(batches, schema=self.schema),
+                       self.pasta / f'append_{offset:012d}.parquet')
+
+    def concluir(self):
+        if self._pendentes:
+            self._gravar([batch for _, batch in self._pendentes], self._pendentes[0][0])
+            self._pendentes.clear()
+        self.concluido = True
+        return self.offset
+
+    def fechar(self):
+        self._pendentes.clear()
+
+    def ler(self):
+        """Tudo que foi gravado na pasta (como o BigQuery veria)."""
+        arquivos = sorted(self.pasta.glob('append_*.parquet'))
+        if not arquivos:
+            return self.schema.empty_table()
+        return pa.concat_tables([pq.read_table(a) for a in arquivos])
@@ -16,15 +16,33 @@ Configuração:
 - Banco padrão: alertadb_cor (mesmo usado pelos scripts de sincronização)
 """
 
-from flask import Flask, jsonify, request, send_file
+from flask import Flask, Response, jsonify, request, send_file, stream_with_context
 from flask_cors import CORS
 import psycopg2
 from psycopg2.extras import RealDictCursor
+from psycopg2.pool import ThreadedConnectionPool
 import os
+import base64
+import binascii
+import hashlib
+import csv
+import io
+import json
+import threading
+import zlib
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
 from datetime import datetime, timedelta
 from functools import wraps
 from dotenv import load_dotenv
 
+# pyarrow é opcional: só o formato arrow de /api/pluviometricos/export depende dele
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
 # Carregar variáveis de ambiente do arquivo .env
 from pathlib import Path
 project_root = Path(__file__).parent.parent.parent
@@ -99,7 +117,8 @@ try:
         'port': port,
         'dbname': dbname,
         'user': user,
-        'password': password
+        'password': password,
+        'connect_timeout': int(obter_variavel('DB_CONNECT_TIMEOUT', obrigatoria=False, padrao='10'))
     }
 except ValueError as e:
     print("=" * 70)
@@ -136,6 +155,54 @@ print()
 # API Key simples (opcional, para proteger a API)
 API_KEY = os.getenv('API_KEY')
 
+# Modos de contagem do total em /api/pluviometricos (?count=)
+MODOS_CONTAGEM = ('exact', 'estimate', 'none')
+
+# Resumo por estação mantido por sincronizar_pluviometricos_novos.py; sem ele
+# (ou vazio), /api/estacoes e /api/stats agregam pluviometricos inteira
+TABELA_ESTATISTICAS_ESTACOES = 'pluviometricos_station_stats'
+
+# Rollups dia/semana/mes (horário de SP) mantidos pela sincronização; sem eles
+# (ou vazios), /api/periodo agrega pluviometricos a cada requisição
+TABELA_ROLLUP = 'pluviometricos_rollup'
+FUSO_ROLLUP = 'America/Sao_Paulo'
+UNIDADES_AGREGACAO = {'dia': 'day', 'semana': 'week', 'mes': 'month'}
+
+# /api/ultimos: a última leitura por estação vem da tabela mantida pela
+# sincronização; o modo bruto é limitado em horas e paginado por cursor
+TABELA_ULTIMA_LEITURA = 'pluviometricos_ultima_leitura'
+MODOS_ULTIMOS = ('bruto', 'ultima_por_estacao')
+ULTIMOS_MAX_HORAS = int(os.getenv('ULTIMOS_MAX_HORAS', '720'))
+ULTIMOS_LIMITE_PADRAO = 1000
+ULTIMOS_LIMITE_MAX = 10000
+
+# /api/pluviometricos/export: linhas por fetch do cursor server-side
+EXPORT_TAMANHO_LOTE = int(os.getenv('EXPORT_TAMANHO_LOTE', '5000'))
+EXPORT_COLUNAS = ['dia', 'm05', 'm10', 'm15', 'h01', 'h04', 'h24', 'h96', 'estacao', 'estacao_id']
+EXPORT_FORMATOS = {
+    'ndjson': ('application/x-ndjson', 'ndjson'),
+    'csv': ('text/csv; charset=utf-8', 'csv'),
+    'arrow': ('application/vnd.apache.arrow.stream', 'arrows'),
+}
+
+# Cache de respostas (por processo) de /api/stats, /api/estacoes e /api/periodo,
+# descartado quando a sincronização avança os watermarks. CACHE_TTL_SEGUNDOS=0 desliga.
+CACHE_TTL_SEGUNDOS = float(os.getenv('CACHE_TTL_SEGUNDOS', '300'))
+CACHE_MAX_ITENS = int(os.getenv('CACHE_MAX_ITENS', '256'))
+# Intervalo mínimo entre consultas a sync_watermarks para detectar dados novos
+CACHE_VERIFICACAO_SEGUNDOS = float(os.getenv('CACHE_VERIFICACAO_SEGUNDOS', '15'))
+TABELA_WATERMARKS = 'sync_watermarks'
+PIPELINE_WATERMARK = 'servidor166_pluviometricos'
+
+# Pool de conexões (por processo; com gunicorn, cada worker tem o seu)
+# Total de conexões no Postgres ≈ workers × DB_POOL_MAX
+DB_POOL_MIN = int(os.getenv('DB_POOL_MIN', '1'))
+DB_POOL_MAX = int(os.getenv('DB_POOL_MAX', '10'))
+# Segundos esperando uma conexão livre antes de responder 503
+DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', '5'))
+# Conexões ociosas há mais que isso são validadas com SELECT 1 antes do uso
+DB_POOL_HEALTHCHECK_SEGUNDOS = float(os.getenv('DB_POOL_HEALTHCHECK_SEGUNDOS', '30'))
+
 # ========================================
 # DECORADORES
 # ========================================
@@ -156,9 +223,225 @@ def require_api_key(f):
             return jsonify({'erro': 'API Key inválida ou não fornecida'}), 401
     return decorated_function
 
-def get_db_connection():
-    """Cria conexão com o banco"""
-    return psycopg2.connect(**DB_CONFIG)
+# ========================================
+# POOL DE CONEXÕES
+# ========================================
+
+class PoolEsgotadoError(psycopg2.OperationalError):
+    """Nenhuma conexão livre no pool dentro de DB_POOL_TIMEOUT (tratado como 503)."""
+
+class PoolConexoes:
+    """ThreadedConnectionPool com timeout de checkout e health check.
+
+    O ThreadedConnectionPool do psycopg2 falha na hora quando todas as
+    conexões estão em uso; o semáforo faz a requisição esperar até
+    DB_POOL_TIMEOUT por uma conexão livre. Conexões ociosas há mais de
+    DB_POOL_HEALTHCHECK_SEGUNDOS são testadas com SELECT 1 e, se quebradas
+    (banco reiniciado, timeout de rede), descartadas e substituídas.
+    """
+
+    def __init__(self, minimo, maximo, timeout, intervalo_healthcheck, **config):
+        self.pool = ThreadedConnectionPool(minimo, maximo, **config)
+        self.timeout = timeout
+        self.intervalo_healthcheck = intervalo_healthcheck
+        self._vagas = threading.BoundedSemaphore(maximo)
+        self._ultimo_uso = {}
+
+    def _saudavel(self, conn):
+        if conn.closed:
+            return False
+        if time.monotonic() - self._ultimo_uso.get(id(conn), 0) < self.intervalo_healthcheck:
+            return True
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1;")
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def obter(self):
+        if not self._vagas.acquire(timeout=self.timeout):
+            raise PoolEsgotadoError(
+                f"Nenhuma conexão livre no pool em {self.timeout:g}s (DB_POOL_MAX={self.pool.maxconn})"
+            )
+        try:
+            conn = self.pool.getconn()
+            if not self._saudavel(conn):
+                self.pool.putconn(conn, close=True)
+                conn = self.pool.getconn()
+            return conn
+        except Exception:
+            self._vagas.release()
+            raise
+
+    def devolver(self, conn, descartar=False):
+        try:
+            if not descartar and not conn.closed:
+                # Encerra a transação de leitura: nada fica "idle in transaction"
+                conn.rollback()
+                self._ultimo_uso[id(conn)] = time.monotonic()
+            else:
+                self._ultimo_uso.pop(id(conn), None)
+            self.pool.putconn(conn, close=descartar or bool(conn.closed))
+        except psycopg2.Error:
+            self._ultimo_uso.pop(id(conn), None)
+            self.pool.putconn(conn, close=True)
+        finally:
+            self._vagas.release()
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+def obter_pool():
+    """Pool do processo atual, criado sob demanda.
+
+    Criado no primeiro uso (e não na importação) para que cada worker do
+    gunicorn, após o fork, abra as próprias conexões.
+    """
+    global _pool, _pool_pid
+    if _pool is None or _pool_pid != os.getpid():
+        with _pool_lock:
+            if _pool is None or _pool_pid != os.getpid():
+                _pool = PoolConexoes(
+                    DB_POOL_MIN, DB_POOL_MAX, DB_POOL_TIMEOUT, DB_POOL_HEALTHCHECK_SEGUNDOS,
+                    **DB_CONFIG
+                )
+                _pool_pid = os.getpid()
+    return _pool
+
+@contextmanager
+def conexao_db():
+    """Empresta uma conexão do pool durante o bloco `with` e a devolve ao final.
+
+    Uso:
+        with conexao_db() as conn:
+            cur = conn.cursor(cursor_factory=RealDictCursor)
+            ...
+    Se o bloco falhar com erro de conexão, a conexão é descartada do pool.
+    """
+    pool = obter_pool()
+    conn = pool.obter()
+    descartar = False
+    try:
+        yield conn
+    except (psycopg2.OperationalError, psycopg2.InterfaceError):
+        descartar = True
+        raise
+    finally:
+        pool.devolver(conn, descartar=descartar)
+
+def codificar_cursor(dia, estacao_id):
+    """Cursor opaco (base64 url-safe) com a última chave (dia, estacao_id) da página."""
+    dia = dia.isoformat() if isinstance(dia, datetime) else str(dia)
+    conteudo = json.dumps([dia, int(estacao_id)], separators=(',', ':'))
+    return base64.urlsafe_b64encode(conteudo.encode('utf-8')).decode('ascii').rstrip('=')
+
+def decodificar_cursor(cursor):
+    """Inverso de codificar_cursor; ValueError se o cursor for inválido."""
+    try:
+        conteudo = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        dia, estacao_id = json.loads(conteudo)
+        return datetime.fromisoformat(dia), int(estacao_id)
+    except (TypeError, ValueError, binascii.Error) as e:
+        raise ValueError(f'cursor inválido: {cursor}') from e
+
+def montar_filtros_pluviometricos(args):
+    """Filtros de data_inicio, data_fim, estacao_id e estacao_nome da query string.
+
+    Returns:
+        tuple: (lista de condições SQL, lista de parâmetros)
+    """
+    filtros = []
+    params = []
+    
+    if args.get('data_inicio'):
+        filtros.append("dia >= %s")
+        params.append(args['data_inicio'])
+    
+    if args.get('data_fim'):
+        filtros.append("dia <= %s")
+        params.append(args['data_fim'])
+    
+    if args.get('estacao_id'):
+        filtros.append("estacao_id = %s")
+        params.append(args['estacao_id'])
+    
+    if args.get('estacao_nome'):
+        filtros.append("estacao ILIKE %s")
+        params.append(f"%{args['estacao_nome']}%")
+    
+    return filtros, params
+
+def contar_registros(cur, filtros, params, modo):
+    """Total de registros para os filtros, conforme o modo (MODOS_CONTAGEM).
+
+    - exact: COUNT(*) (varre todas as linhas que casam com os filtros)
+    - estimate: estimativa do planejador; sem filtros, pg_class.reltuples
+    - none: não conta (None)
+    """
+    if modo == 'none':
+        return None
+    where = " WHERE " + " AND ".join(filtros) if filtros else ""
+    if modo == 'exact':
+        cur.execute("SELECT COUNT(*) AS total FROM pluviometricos" + where, params)
+        return cur.fetchone()['total']
+    if not filtros:
+        cur.execute("SELECT reltuples::bigint AS total FROM pg_class WHERE oid = 'pluviometricos'::regclass")
+        return max(cur.fetchone()['total'], 0)
+    cur.execute("EXPLAIN (FORMAT JSON) SELECT 1 FROM pluviometricos" + where, params)
+    plano = cur.fetchone()['QUERY PLAN']
+    return int(plano[0]['Plan']['Plan Rows'])
+
+def _tabela_populada(cur, tabela):
+    """Indica se uma tabela mantida pela sincronização existe e já tem linhas."""
+    cur.execute("SELECT to_regclass(%s) IS NOT NULL AS existe;", (f'public.{tabela}',))
+    if not cur.fetchone()['existe']:
+        return False
+    cur.execute(f"SELECT EXISTS (SELECT 1 FROM {tabela}) AS populado;")
+    return cur.fetchone()['populado']
+
+def resumo_estacoes_disponivel(cur):
+    """Indica se o resumo por estação existe e já foi populado pela sincronização."""
+    return _tabela_populada(cur, TABELA_ESTATISTICAS_ESTACOES)
+
+def rollup_disponivel(cur):
+    """Indica se os rollups por período existem e já foram populados pela sincronização."""
+    return _tabela_populada(cur, TABELA_ROLLUP)
+
+def ultima_leitura_disponivel(cur):
+    """Indica se a tabela de última leitura por estação existe e já foi populada."""
+    return _tabela_populada(cur, TABELA_ULTIMA_LEITURA)
+
+def query_periodo_bruta(agregacao, data_inicio, data_fim, estacao_id=None):
+    """Monta a agregação de /api/periodo direto de pluviometricos (sem rollups)."""
+    date_trunc = f"DATE_TRUNC('{UNIDADES_AGREGACAO[agregacao]}', dia)"
+    query = f"""
+        SELECT 
+            {date_trunc} as periodo,
+            estacao_id,
+            estacao,
+            ROUND(COALESCE(AVG(m05), 0)::numeric, 2) as media_m05,
+            ROUND(COALESCE(AVG(m15), 0)::numeric, 2) as media_m15,
+            ROUND(COALESCE(AVG(h01), 0)::numeric, 2) as media_h01,
+            ROUND(COALESCE(AVG(h04), 0)::numeric, 2) as media_h04,
+            ROUND(COALESCE(AVG(h24), 0)::numeric, 2) as media_h24,
+            ROUND(COALESCE(AVG(h96), 0)::numeric, 2) as media_h96,
+            ROUND(COALESCE(MAX(h24), 0)::numeric, 2) as max_h24,
+            COUNT(*) as total_leituras
+        FROM pluviometricos
+        WHERE dia >= %s AND dia <= %s
+    """
+    params = [data_inicio, data_fim]
+    if estacao_id is not None:
+        query += " AND estacao_id = %s"
+        params.append(estacao_id)
+    query += f"""
+        GROUP BY {date_trunc}, estacao_id, estacao
+        ORDER BY periodo DESC;
+    """
+    return query, params
 
 def get_base_url():
     """Retorna a URL base da API baseada no request atual"""
@@ -167,6 +450,144 @@ def get_base_url():
     host = request.host  # host:porta do request
     return f"{scheme}://{host}"
 
+# ========================================
+# CACHE DE RESPOSTAS
+# ========================================
+
+class CacheRespostas:
+    """Cache LRU com TTL das respostas JSON, por processo.
+
+    Cada entrada guarda o corpo já serializado, o ETag e a versão dos dados
+    (sync_watermarks) em que foi gerada. Quando a sincronização avança os
+    watermarks, a versão muda e o cache inteiro é descartado.
+    """
+
+    def __init__(self, max_itens, ttl_segundos):
+        self.max_itens = max_itens
+        self.ttl_segundos = ttl_segundos
+        self._itens = OrderedDict()
+        self._versao = None
+        self._lock = threading.Lock()
+
+    def obter(self, chave, versao):
+        """Entrada válida para a chave na versão atual, ou None."""
+        with self._lock:
+            self._invalidar_se_mudou(versao)
+            entrada = self._itens.get(chave)
+            if entrada is None:
+                return None
+            if entrada['expira_em'] <= time.monotonic():
+                del self._itens[chave]
+                return None
+            self._itens.move_to_end(chave)
+            return entrada
+
+    def guardar(self, chave, versao, corpo, mimetype):
+        """Guarda o corpo da resposta e devolve a entrada criada (com ETag)."""
+        entrada = {
+            'corpo': corpo,
+            'mimetype': mimetype,
+            'etag': hashlib.sha1(corpo).hexdigest(),
+            'expira_em': time.monotonic() + self.ttl_segundos,
+        }
+        with self._lock:
+            self._invalidar_se_mudou(versao)
+            self._itens[chave] = entrada
+            self._itens.move_to_end(chave)
+            while len(self._itens) > self.max_itens:
+                self._itens.popitem(last=False)
+        return entrada
+
+    def limpar(self):
+        with self._lock:
+            self._itens.clear()
+
+    def _invalidar_se_mudou(self, versao):
+        if versao != self._versao:
+            self._itens.clear()
+            self._versao = versao
+
+_cache_respostas = CacheRespostas(CACHE_MAX_ITENS, CACHE_TTL_SEGUNDOS)
+_versao_dados = {'valor': None, 'verificada_em': None}
+_versao_lock = threading.Lock()
+
+def obter_versao_dados():
+    """Versão dos dados sincronizados: último avanço dos watermarks da sincronização.
+
+    Consultada no banco no máximo a cada CACHE_VERIFICACAO_SEGUNDOS. Sem a
+    tabela sync_watermarks a versão é None e só o TTL expira as entradas.
+    """
+    agora = time.monotonic()
+    with _versao_lock:
+        verificada_em = _versao_dados['verificada_em']
+        if verificada_em is not None and agora - verificada_em < CACHE_VERIFICACAO_SEGUNDOS:
+            return _versao_dados['valor']
+
+    with conexao_db() as conn:
+        cur = conn.cursor()
+        try:
+            cur.execute("SELECT to_regclass(%s) IS NOT NULL;", (f'public.{TABELA_WATERMARKS}',))
+            versao = None
+            if cur.fetchone()[0]:
+                cur.execute(
+                    f"SELECT MAX(atualizado_em), COUNT(*) FROM {TABELA_WATERMARKS} WHERE pipeline = %s;",
+                    (PIPELINE_WATERMARK,)
+                )
+                ultima, total = cur.fetchone()
+                versao = f"{ultima.isoformat() if ultima else ''}:{total}"
+        finally:
+            cur.close()
+
+    with _versao_lock:
+        _versao_dados['valor'] = versao
+        _versao_dados['verificada_em'] = time.monotonic()
+    return versao
+
+def _chave_cache():
+    """Rota + query string normalizada (parâmetros ordenados, valores repetidos preservados)."""
+    parametros = sorted(request.args.items(multi=True))
+    return request.path, tuple(parametros)
+
+def _resposta_cache(entrada, status_cache):
+    """Monta a resposta (200 ou 304) a partir de uma entrada do cache."""
+    if request.if_none_match.contains(entrada['etag']):
+        resposta = Response(status=304)
+    else:
+        resposta = Response(entrada['corpo'], status=200, mimetype=entrada['mimetype'])
+    resposta.set_etag(entrada['etag'])
+    # Navegadores revalidam a cada uso: dados novos aparecem após a sincronização
+    resposta.headers['Cache-Control'] = 'no-cache'
+    resposta.headers['X-Cache'] = status_cache
+    return resposta
+
+def cache_resposta(f):
+    """Decorator de cache das rotas de leitura (usar abaixo de @require_api_key).
+
+    Só respostas 200 são guardadas; erros sempre vão ao banco. Com
+    CACHE_TTL_SEGUNDOS=0 o cache fica desligado.
+    """
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if CACHE_TTL_SEGUNDOS <= 0:
+            return f(*args, **kwargs)
+        try:
+            versao = obter_versao_dados()
+        except psycopg2.Error:
+            # Sem como saber se os dados mudaram: responde direto do banco
+            return f(*args, **kwargs)
+
+        chave = _chave_cache()
+        entrada = _cache_respostas.obter(chave, versao)
+        if entrada is not None:
+            return _resposta_cache(entrada, 'HIT')
+
+        resposta = app.make_response(f(*args, **kwargs))
+        if resposta.status_code != 200 or resposta.is_streamed:
+            return resposta
+        entrada = _cache_respostas.guardar(chave, versao, resposta.get_data(), resposta.mimetype)
+        return _resposta_cache(entrada, 'MISS')
+    return decorated_function
+
 # ========================================
 # ROTAS DA API
 # ========================================
@@ -265,6 +686,7 @@ def api_info():
         'dashboard': f'{base_url}/dashboard',
         'endpoints': {
             'GET /api/pluviometricos': 'Buscar dados pluviométricos',
+            'GET /api/pluviometricos/export': 'Exportação em streaming (NDJSON, CSV ou Arrow)',
             'GET /api/estacoes': 'Listar todas as estações',
             'GET /api/estacoes/<id>': 'Dados de uma estação específica',
             'GET /api/stats': 'Estatísticas gerais',
@@ -292,14 +714,34 @@ def docs():
                     'estacao_id': 'ID da estação',
                     'estacao_nome': 'Nome da estação (busca parcial)',
                     'limit': 'Limite de resultados (padrão: 1000, máximo: 10000)',
-                    'offset': 'Deslocamento para paginação'
+                    'cursor': 'next_cursor da resposta anterior (paginação por keyset, custo constante)',
+                    'count': 'Total: exact (COUNT), estimate (padrão, estimativa do planejador) ou none',
+                    'offset': 'Deslocamento (legado; prefira cursor)'
                 },
                 'exemplos': [
                     f'{base_url}/api/pluviometricos',
                     f'{base_url}/api/pluviometricos?data_inicio=2024-01-01&data_fim=2024-12-31',
                     f'{base_url}/api/pluviometricos?estacao_id=1&limit=100',
                     f'{base_url}/api/pluviometricos?estacao_nome=Campinas&limit=500',
-                    f'{base_url}/api/pluviometricos?data_inicio=2024-01-01&estacao_id=1&limit=100&offset=0'
+                    f'{base_url}/api/pluviometricos?data_inicio=2024-01-01&estacao_id=1&limit=100&count=exact',
+                    f'{base_url}/api/pluviometricos?estacao_id=1&limit=100&cursor=<next_cursor>'
+                ]
+            },
+            {
+                'rota': '/api/pluviometricos/export',
+                'metodo': 'GET',
+                'descricao': 'Exportação sem limite de linhas, transmitida em streaming',
+                'parametros': {
+                    'data_inicio': 'Data inicial (formato: YYYY-MM-DD)',
+                    'data_fim': 'Data final (formato: YYYY-MM-DD)',
+                    'estacao_id': 'ID da estação',
+                    'estacao_nome': 'Nome da estação (busca parcial)',
+                    'formato': 'ndjson (padrão), csv ou arrow (Arrow IPC stream)',
+                    'gzip': '1 ou 0 (padrão: conforme o header Accept-Encoding)'
+                },
+                'exemplos': [
+                    f'{base_url}/api/pluviometricos/export?estacao_id=1&data_inicio=2024-01-01&data_fim=2024-12-31&formato=csv',
+                    f'{base_url}/api/pluviometricos/export?data_inicio=2024-01-01&formato=arrow'
                 ]
             },
             {
@@ -321,9 +763,17 @@ def docs():
                 'metodo': 'GET',
                 'descricao': 'Últimos registros de todas as estações',
                 'parametros': {
-                    'horas': 'Últimas X horas (padrão: 24)'
+                    'horas': f'Últimas X horas (padrão: 24, máximo: {ULTIMOS_MAX_HORAS})',
+                    'modo': 'bruto (padrão) ou ultima_por_estacao (uma linha por estação)',
+                    'limit': f'Leituras por página no modo bruto (padrão: {ULTIMOS_LIMITE_PADRAO}, máximo: {ULTIMOS_LIMITE_MAX})',
+                    'cursor': 'next_cursor da página anterior (modo bruto)',
+                    'formato': 'json (padrão) ou ndjson (modo bruto em streaming)'
                 },
-                'exemplo': f'{base_url}/api/ultimos?horas=48'
+                'exemplos': [
+                    f'{base_url}/api/ultimos?horas=48',
+                    f'{base_url}/api/ultimos?modo=ultima_por_estacao',
+                    f'{base_url}/api/ultimos?horas=720&formato=ndjson'
+                ]
             },
             {
                 'rota': '/api/periodo',
@@ -372,79 +822,70 @@ def get_pluviometricos():
     - estacao_id: int
     - estacao_nome: string
     - limit: int (padrão: 1000)
-    - offset: int (padrão: 0)
+    - cursor: valor de next_cursor da página anterior (keyset pagination)
+    - count: exact, estimate ou none (padrão: estimate)
+    - offset: int (legado; ignorado quando cursor é informado)
     """
     try:
         # Parâmetros
-        data_inicio = request.args.get('data_inicio')
-        data_fim = request.args.get('data_fim')
-        estacao_id = request.args.get('estacao_id')
-        estacao_nome = request.args.get('estacao_nome')
         limit = min(int(request.args.get('limit', 1000)), 10000)
         offset = int(request.args.get('offset', 0))
+        cursor = request.args.get('cursor')
+        modo_contagem = request.args.get('count', 'estimate')
         
-        conn = get_db_connection()
-        cur = conn.cursor(cursor_factory=RealDictCursor)
-        
-        # Construir query dinâmica
-        query = "SELECT * FROM pluviometricos WHERE 1=1"
-        params = []
-        
-        if data_inicio:
-            query += " AND dia >= %s"
-            params.append(data_inicio)
-        
-        if data_fim:
-            query += " AND dia <= %s"
-            params.append(data_fim)
-        
-        if estacao_id:
-            query += " AND estacao_id = %s"
-            params.append(estacao_id)
-        
-        if estacao_nome:
-            query += " AND estacao ILIKE %s"
-            params.append(f'%{estacao_nome}%')
-        
-        query += " ORDER BY dia DESC LIMIT %s OFFSET %s"
-        params.extend([limit, offset])
-        
-        cur.execute(query, params)
-        resultados = cur.fetchall()
-        
-        # Contar total (para paginação)
-        count_query = "SELECT COUNT(*) FROM pluviometricos WHERE 1=1"
-        count_params = []
-        
-        if data_inicio:
-            count_query += " AND dia >= %s"
-            count_params.append(data_inicio)
-        
-        if data_fim:
-            count_query += " AND dia <= %s"
-            count_params.append(data_fim)
-        
-        if estacao_id:
-            count_query += " AND estacao_id = %s"
-            count_params.append(estacao_id)
-        
-        if estacao_nome:
-            count_query += " AND estacao ILIKE %s"
-            count_params.append(f'%{estacao_nome}%')
+        if modo_contagem not in MODOS_CONTAGEM:
+            return jsonify({'erro': f"count deve ser: {', '.join(MODOS_CONTAGEM)}"}), 400
+        chave = None
+        if cursor:
+            try:
+                chave = decodificar_cursor(cursor)
+            except ValueError:
+                return jsonify({'erro': 'cursor inválido'}), 400
+        
+        # Filtros compartilhados pela página e pela contagem
+        filtros, params = montar_filtros_pluviometricos(request.args)
+        
+        with conexao_db() as conn:
+            cur = conn.cursor(cursor_factory=RealDictCursor)
+        
+            # Keyset pagination: a página começa logo após a última chave
+            # (dia, estacao_id) da anterior, descendo pelo índice da PK.
+            # Toda página custa o mesmo, qualquer que seja a profundidade.
+            filtros_pagina = list(filtros)
+            params_pagina = list(params)
+            if chave:
+                filtros_pagina.append("(dia, estacao_id) < (%s::timestamptz, %s)")
+                params_pagina.extend(chave)
+            query = "SELECT * FROM pluviometricos"
+            if filtros_pagina:
+                query += " WHERE " + " AND ".join(filtros_pagina)
+            query += " ORDER BY dia DESC, estacao_id DESC LIMIT %s"
+            params_pagina.append(limit)
+            if not chave and offset:
+                query += " OFFSET %s"
+                params_pagina.append(offset)
+        
+            cur.execute(query, params_pagina)
+            resultados = cur.fetchall()
+        
+            total = contar_registros(cur, filtros, params, modo_contagem)
         
-        cur.execute(count_query, count_params)
-        total = cur.fetchone()['count']
+            cur.close()
         
-        cur.close()
-        conn.close()
+            next_cursor = None
+            if len(resultados) == limit:
+                ultimo = resultados[-1]
+                next_cursor = codificar_cursor(ultimo['dia'], ultimo['estacao_id'])
         
-        return jsonify({
-            'total': total,
-            'limit': limit,
-            'offset': offset,
-            'resultados': len(resultados),
-            'dados': resultados
-        })
+            return jsonify({
+                'total': total,
+                'count': modo_contagem,
+                'limit': limit,
+                'offset': 0 if chave else offset,
+                'resultados': len(resultados),
+                'next_cursor': next_cursor,
+                'dados': resultados
+            })
         
     except psycopg2.OperationalError as e:
         # Erro de conexão ou banco não disponível
@@ -480,99 +921,267 @@ def get_pluviometricos():
             'traceback': traceback.format_exc()
         }), 500
 
+def _linha_exportacao(registro):
+    """Converte um registro do cursor para tipos serializáveis (dia em ISO 8601)."""
+    linha = dict(zip(EXPORT_COLUNAS, registro))
+    linha['dia'] = linha['dia'].isoformat()
+    return linha
+
+def _serializar_ndjson(lotes):
+    for lote in lotes:
+        yield ''.join(
+            json.dumps(_linha_exportacao(r), ensure_ascii=False) + '\n' for r in lote
+        ).encode('utf-8')
+
+def _serializar_csv(lotes):
+    saida = io.StringIO()
+    writer = csv.writer(saida, lineterminator='\n')
+    writer.writerow(EXPORT_COLUNAS)
+    for lote in lotes:
+        writer.writerows([r[0].isoformat()] + list(r[1:]) for r in lote)
+        yield saida.getvalue().encode('utf-8')
+        saida.seek(0)
+        saida.truncate()
+    if saida.tell():
+        yield saida.getvalue().encode('utf-8')
+
+class _BufferFluxo(io.RawIOBase):
+    """Destino file-like do writer Arrow: acumula bytes até serem retirados."""
+
+    def __init__(self):
+        self._partes = []
+
+    def writable(self):
+        return True
+
+    def write(self, dados):
+        self._partes.append(bytes(dados))
+        return len(dados)
+
+    def retirar(self):
+        dados = b''.join(self._partes)
+        self._partes = []
+        return dados
+
+def _serializar_arrow(lotes):
+    """Arrow IPC stream: schema no início e um record batch por lote do cursor."""
+    schema = pa.schema([
+        pa.field('dia', pa.timestamp('us', tz='UTC')),
+        *[pa.field(coluna, pa.float64()) for coluna in EXPORT_COLUNAS[1:8]],
+        pa.field('estacao', pa.string()),
+        pa.field('estacao_id', pa.int32()),
+    ])
+    destino = _BufferFluxo()
+    with pa.ipc.new_stream(destino, schema) as writer:
+        for lote in lotes:
+            colunas = list(zip(*lote))
+            writer.write_batch(pa.record_batch(
+                [pa.array(valores, type=campo.type) for valores, campo in zip(colunas, schema)],
+                schema=schema
+            ))
+            yield destino.retirar()
+    yield destino.retirar()
+
+def _lotes_cursor_servidor(query, params, nome_cursor):
+    """Lotes de EXPORT_TAMANHO_LOTE linhas de um cursor server-side.
+
+    A conexão fica emprestada do pool enquanto a resposta é transmitida.
+    """
+    with conexao_db() as conn:
+        with conn.cursor(name=nome_cursor) as cur:
+            cur.itersize = EXPORT_TAMANHO_LOTE
+            cur.execute(query, params)
+            while True:
+                lote = cur.fetchmany(EXPORT_TAMANHO_LOTE)
+                if not lote:
+                    break
+                yield lote
+
+def _usar_gzip():
+    """gzip=1/0 na query string força ou desliga; senão, conforme Accept-Encoding."""
+    parametro_gzip = request.args.get('gzip')
+    if parametro_gzip is None:
+        return 'gzip' in request.headers.get('Accept-Encoding', '').lower()
+    return parametro_gzip.lower() in ('1', 'true', 'sim')
+
+def _comprimir_gzip(blocos):
+    """Aplica gzip incrementalmente, bloco a bloco (sem materializar a resposta)."""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for bloco in blocos:
+        comprimido = compressor.compress(bloco)
+        if comprimido:
+            yield comprimido
+    yield compressor.flush()
+
+@app.route('/api/pluviometricos/export', methods=['GET'])
+@require_api_key
+def exportar_pluviometricos():
+    """
+    Exporta dados pluviométricos em streaming (sem limite de linhas)
+    
+    Parâmetros:
+    - data_inicio, data_fim, estacao_id, estacao_nome: mesmos filtros de /api/pluviometricos
+    - formato: ndjson (padrão), csv ou arrow (Arrow IPC stream)
+    - gzip: 1/0 força ou desliga a compressão (padrão: conforme Accept-Encoding)
+    
+    As linhas vêm de um cursor server-side em lotes de EXPORT_TAMANHO_LOTE e
+    são serializadas (e comprimidas) à medida que chegam: a memória do worker
+    fica constante, qualquer que seja o período.
+    """
+    formato = request.args.get('formato', 'ndjson')
+    if formato not in EXPORT_FORMATOS:
+        return jsonify({'erro': f"formato deve ser: {', '.join(EXPORT_FORMATOS)}"}), 400
+    if formato == 'arrow' and pa is None:
+        return jsonify({'erro': 'formato arrow indisponível: instale pyarrow no servidor'}), 501
+    
+    usar_gzip = _usar_gzip()
+    
+    filtros, params = montar_filtros_pluviometricos(request.args)
+    query = (
+        "SELECT dia, m05::float8, m10::float8, m15::float8, h01::float8, h04::float8, "
+        "h24::float8, h96::float8, estacao, estacao_id FROM pluviometricos"
+    )
+    if filtros:
+        query += " WHERE " + " AND ".join(filtros)
+    query += " ORDER BY dia, estacao_id"
+    
+    serializadores = {
+        'ndjson': _serializar_ndjson,
+        'csv': _serializar_csv,
+        'arrow': _serializar_arrow,
+    }
+    corpo = serializadores[formato](_lotes_cursor_servidor(query, params, 'exportar_pluviometricos'))
+    if usar_gzip:
+        corpo = _comprimir_gzip(corpo)
+    
+    mimetype, extensao = EXPORT_FORMATOS[formato]
+    headers = {
+        'Content-Disposition': f'attachment; filename=pluviometricos.{extensao}',
+        'Vary': 'Accept-Encoding',
+    }
+    if usar_gzip:
+        headers['Content-Encoding'] = 'gzip'
+    return Response(stream_with_context(corpo), content_type=mimetype, headers=headers)
+
 @app.route('/api/estacoes', methods=['GET'])
 @require_api_key
+@cache_resposta
 def get_estacoes():
     """Lista todas as estações disponíveis"""
     try:
-        conn = get_db_connection()
-        cur = conn.cursor(cursor_factory=RealDictCursor)
-        
-        cur.execute("""
-            SELECT 
-                estacao_id,
-                estacao,
-                COUNT(*) as total_registros,
-                MIN(dia) as primeira_leitura,
-                MAX(dia) as ultima_leitura
-            FROM pluviometricos
-            GROUP BY estacao_id, estacao
-            ORDER BY estacao;
-        """)
-        
-        resultados = cur.fetchall()
-        cur.close()
-        conn.close()
+        with conexao_db() as conn:
+            cur = conn.cursor(cursor_factory=RealDictCursor)
+        
+            if resumo_estacoes_disponivel(cur):
+                cur.execute(f"""
+                    SELECT 
+                        estacao_id,
+                        estacao,
+                        total_registros,
+                        primeira_leitura,
+                        ultima_leitura
+                    FROM {TABELA_ESTATISTICAS_ESTACOES}
+                    ORDER BY estacao;
+                """)
+            else:
+                cur.execute("""
+                    SELECT 
+                        estacao_id,
+                        estacao,
+                        COUNT(*) as total_registros,
+                        MIN(dia) as primeira_leitura,
+                        MAX(dia) as ultima_leitura
+                    FROM pluviometricos
+                    GROUP BY estacao_id, estacao
+                    ORDER BY estacao;
+                """)
+        
+            resultados = cur.fetchall()
+            cur.close()
         
-        return jsonify({
-            'total_estacoes': len(resultados),
-            'estacoes': resultados
-        })
+            return jsonify({
+                'total_estacoes': len(resultados),
+                'estacoes': resultados
+            })
         
     except Exception as e:
         return jsonify({'erro': str(e)}), 500
 
 @app.route('/api/estacoes/<int:estacao_id>', methods=['GET'])
 @require_api_key
+@cache_resposta
 def get_estacao_detalhes(estacao_id):
     """Detalhes de uma estação específica"""
     try:
-        conn = get_db_connection()
-        cur = conn.cursor(cursor_factory=RealDictCursor)
-        
-        # Informações gerais
-        cur.execute("""
-            SELECT 
-                estacao_id,
-                estacao,
-                COUNT(*) as total_registros,
-                MIN(dia) as primeira_leitura,
-                MAX(dia) as ultima_leitura,
-                ROUND(COALESCE(AVG(h24), 0)::numeric, 2) as media_h24,
-                ROUND(COALESCE(MAX(h24), 0)::numeric, 2) as max_h24
-            FROM pluviometricos
-            WHERE estacao_id = %s
-            GROUP BY estacao_id, estacao;
-        """, (estacao_id,))
-        
-        info = cur.fetchone()
-        
-        if not info:
-            return jsonify({'erro': 'Estação não encontrada'}), 404
-        
-        # Processar valores numéricos
-        info_dict = dict(info)
-        for campo in ['media_h24', 'max_h24']:
-            if campo in info_dict and info_dict[campo] is not None:
-                try:
-                    valor = float(info_dict[campo])
-                    if abs(valor) < 0.001:
+        with conexao_db() as conn:
+            cur = conn.cursor(cursor_factory=RealDictCursor)
+        
+            # Informações gerais
+            if resumo_estacoes_disponivel(cur):
+                cur.execute(f"""
+                    SELECT 
+                        estacao_id,
+                        estacao,
+                        total_registros,
+                        primeira_leitura,
+                        ultima_leitura,
+                        ROUND(COALESCE(soma_h24 / NULLIF(contagem_h24, 0), 0)::numeric, 2) as media_h24,
+                        ROUND(COALESCE(max_h24, 0)::numeric, 2) as max_h24
+                    FROM {TABELA_ESTATISTICAS_ESTACOES}
+                    WHERE estacao_id = %s;
+                """, (estacao_id,))
+            else:
+                cur.execute("""
+                    SELECT 
+                        estacao_id,
+                        estacao,
+                        COUNT(*) as total_registros,
+                        MIN(dia) as primeira_leitura,
+                        MAX(dia) as ultima_leitura,
+                        ROUND(COALESCE(AVG(h24), 0)::numeric, 2) as media_h24,
+                        ROUND(COALESCE(MAX(h24), 0)::numeric, 2) as max_h24
+                    FROM pluviometricos
+                    WHERE estacao_id = %s
+                    GROUP BY estacao_id, estacao;
+                """, (estacao_id,))
+        
+            info = cur.fetchone()
+        
+            if not info:
+                return jsonify({'erro': 'Estação não encontrada'}), 404
+        
+            # Processar valores numéricos
+            info_dict = dict(info)
+            for campo in ['media_h24', 'max_h24']:
+                if campo in info_dict and info_dict[campo] is not None:
+                    try:
+                        valor = float(info_dict[campo])
+                        if abs(valor) < 0.001:
+                            info_dict[campo] = 0.00
+                        else:
+                            info_dict[campo] = round(valor, 2)
+                    except (ValueError, TypeError):
                         info_dict[campo] = 0.00
-                    else:
-                        info_dict[campo] = round(valor, 2)
-                except (ValueError, TypeError):
+                else:
                     info_dict[campo] = 0.00
-            else:
-                info_dict[campo] = 0.00
-        info = info_dict
+            info = info_dict
         
-        # Últimas 10 leituras
-        cur.execute("""
-            SELECT * FROM pluviometricos
-            WHERE estacao_id = %s
-            ORDER BY dia DESC
-            LIMIT 10;
-        """, (estacao_id,))
+            # Últimas 10 leituras
+            cur.execute("""
+                SELECT * FROM pluviometricos
+                WHERE estacao_id = %s
+                ORDER BY dia DESC
+                LIMIT 10;
+            """, (estacao_id,))
         
-        ultimas_leituras = cur.fetchall()
+            ultimas_leituras = cur.fetchall()
         
-        cur.close()
-        conn.close()
+            cur.close()
         
-        return jsonify({
-            'informacoes': info,
-            'ultimas_leituras': ultimas_leituras
-        })
+            return jsonify({
+                'informacoes': info,
+                'ultimas_leituras': ultimas_leituras
+            })
         
     except Exception as e:
         return jsonify({'erro': str(e)}), 500
@@ -580,34 +1189,120 @@ def get_estacao_detalhes(estacao_id):
 @app.route('/api/ultimos', methods=['GET'])
 @require_api_key
 def get_ultimos():
-    """Últimos registros de todas as estações"""
+    """
+    Últimos registros de todas as estações
+    
+    Parâmetros:
+    - horas: janela a partir de agora (padrão: 24, máximo: ULTIMOS_MAX_HORAS)
+    - modo: bruto (padrão; todas as leituras da janela) ou ultima_por_estacao
+      (uma linha por estação, lida de pluviometricos_ultima_leitura)
+    - limit: leituras por página no modo bruto (padrão: 1000, máximo: 10000)
+    - cursor: valor de next_cursor da página anterior (modo bruto)
+    - formato: json (padrão) ou ndjson (modo bruto em streaming, sem limit)
+    """
     try:
         horas = int(request.args.get('horas', 24))
+        modo = request.args.get('modo', 'bruto')
+        formato = request.args.get('formato', 'json')
+        
+        if modo not in MODOS_ULTIMOS:
+            return jsonify({'erro': f"modo deve ser: {', '.join(MODOS_ULTIMOS)}"}), 400
+        if formato not in ('json', 'ndjson'):
+            return jsonify({'erro': 'formato deve ser: json ou ndjson'}), 400
+        if not 0 < horas <= ULTIMOS_MAX_HORAS:
+            return jsonify({'erro': f'horas deve estar entre 1 e {ULTIMOS_MAX_HORAS}'}), 400
+        
+        if modo == 'ultima_por_estacao':
+            with conexao_db() as conn:
+                cur = conn.cursor(cursor_factory=RealDictCursor)
+            
+                if ultima_leitura_disponivel(cur):
+                    cur.execute(f"""
+                        SELECT {', '.join(EXPORT_COLUNAS)}
+                        FROM {TABELA_ULTIMA_LEITURA}
+                        WHERE dia >= NOW() - make_interval(hours => %s)
+                        ORDER BY estacao;
+                    """, (horas,))
+                else:
+                    cur.execute(f"""
+                        SELECT * FROM (
+                            SELECT DISTINCT ON (estacao_id) {', '.join(EXPORT_COLUNAS)}
+                            FROM pluviometricos
+                            WHERE dia >= NOW() - make_interval(hours => %s)
+                            ORDER BY estacao_id, dia DESC
+                        ) AS ultimas
+                        ORDER BY estacao;
+                    """, (horas,))
+            
+                resultados = cur.fetchall()
+                cur.close()
+            
+                return jsonify({
+                    'modo': modo,
+                    'periodo': f'Últimas {horas} horas',
+                    'total_registros': len(resultados),
+                    'dados': resultados
+                })
+        
+        if formato == 'ndjson':
+            # Janela inteira em streaming, com memória constante no worker
+            query = (
+                "SELECT dia, m05::float8, m10::float8, m15::float8, h01::float8, h04::float8, "
+                "h24::float8, h96::float8, estacao, estacao_id FROM pluviometricos "
+                "WHERE dia >= NOW() - make_interval(hours => %s) "
+                "ORDER BY dia DESC, estacao_id DESC"
+            )
+            corpo = _serializar_ndjson(_lotes_cursor_servidor(query, (horas,), 'exportar_ultimos'))
+            headers = {'Vary': 'Accept-Encoding'}
+            if _usar_gzip():
+                corpo = _comprimir_gzip(corpo)
+                headers['Content-Encoding'] = 'gzip'
+            return Response(stream_with_context(corpo), content_type=EXPORT_FORMATOS['ndjson'][0],
+                            headers=headers)
+        
+        limit = min(int(request.args.get('limit', ULTIMOS_LIMITE_PADRAO)), ULTIMOS_LIMITE_MAX)
+        cursor = request.args.get('cursor')
+        chave = None
+        if cursor:
+            try:
+                chave = decodificar_cursor(cursor)
+            except ValueError:
+                return jsonify({'erro': 'cursor inválido'}), 400
+        
+        query = "SELECT * FROM pluviometricos WHERE dia >= NOW() - make_interval(hours => %s)"
+        params = [horas]
+        if chave:
+            query += " AND (dia, estacao_id) < (%s::timestamptz, %s)"
+            params.extend(chave)
+        query += " ORDER BY dia DESC, estacao_id DESC LIMIT %s;"
+        params.append(limit)
+        
+        with conexao_db() as conn:
+            cur = conn.cursor(cursor_factory=RealDictCursor)
+            cur.execute(query, params)
+            resultados = cur.fetchall()
+            cur.close()
         
-        conn = get_db_connection()
-        cur = conn.cursor(cursor_factory=RealDictCursor)
-        
-        cur.execute("""
-            SELECT * FROM pluviometricos
-            WHERE dia >= NOW() - INTERVAL '%s hours'
-            ORDER BY dia DESC;
-        """, (horas,))
-        
-        resultados = cur.fetchall()
-        cur.close()
-        conn.close()
+            next_cursor = None
+            if len(resultados) == limit:
+                ultimo = resultados[-1]
+                next_cursor = codificar_cursor(ultimo['dia'], ultimo['estacao_id'])
         
-        return jsonify({
-            'periodo': f'Últimas {horas} horas',
-            'total_registros': len(resultados),
-            'dados': resultados
-        })
+            return jsonify({
+                'modo': modo,
+                'periodo': f'Últimas {horas} horas',
+                'total_registros': len(resultados),
+                'limit': limit,
+                'next_cursor': next_cursor,
+                'dados': resultados
+            })
         
     except Exception as e:
         return jsonify({'erro': str(e)}), 500
 
 @app.route('/api/periodo', methods=['GET'])
 @require_api_key
+@cache_resposta
 def get_periodo():
     """
     Agregação de dados por período
@@ -618,8 +1313,10 @@ def get_periodo():
     - dias: Número de dias para buscar (padrão: 30). Usado apenas se data_inicio/data_fim não fornecidos
     - estacao_id: ID da estação (opcional)
     - agregacao: Tipo de agregação - dia, semana, mes (padrão: dia)
+
+    Com pluviometricos_rollup populado, lê os períodos pré-agregados (horário de
+    SP) cujo início está entre o início do período de data_inicio e data_fim.
     """
-    conn = None
     cur = None
     try:
         data_inicio = request.args.get('data_inicio')
@@ -632,156 +1329,156 @@ def get_periodo():
         if agregacao not in ['dia', 'semana', 'mes']:
             return jsonify({'erro': 'agregacao deve ser: dia, semana ou mes'}), 400
         
-        conn = get_db_connection()
-        cur = conn.cursor(cursor_factory=RealDictCursor)
-        
-        # Verificar se a tabela existe
-        cur.execute("""
-            SELECT EXISTS (
-                SELECT FROM information_schema.tables 
-                WHERE table_schema = 'public' 
-                AND table_name = 'pluviometricos'
-            );
-        """)
-        tabela_existe = cur.fetchone()['exists']
+        with conexao_db() as conn:
+            cur = conn.cursor(cursor_factory=RealDictCursor)
         
-        if not tabela_existe:
-            return jsonify({
-                'erro': 'Tabela pluviometricos não encontrada',
-                'sugestao': 'Execute primeiro: python scripts/carregar_pluviometricos_historicos.py'
-            }), 404
+            # Verificar se a tabela existe
+            cur.execute("""
+                SELECT EXISTS (
+                    SELECT FROM information_schema.tables 
+                    WHERE table_schema = 'public' 
+                    AND table_name = 'pluviometricos'
+                );
+            """)
+            tabela_existe = cur.fetchone()['exists']
         
-        # Se não forneceu datas, determinar período automaticamente
-        if not data_inicio or not data_fim:
-            # Buscar data mínima e máxima do banco
-            cur.execute("SELECT MIN(dia) as min_dia, MAX(dia) as max_dia FROM pluviometricos;")
-            periodo_banco = cur.fetchone()
-            
-            if not periodo_banco or not periodo_banco['min_dia']:
+            if not tabela_existe:
                 return jsonify({
-                    'erro': 'Nenhum dado encontrado no banco',
-                    'sugestao': 'Execute: python scripts/carregar_pluviometricos_historicos.py'
+                    'erro': 'Tabela pluviometricos não encontrada',
+                    'sugestao': 'Execute primeiro: python scripts/carregar_pluviometricos_historicos.py'
                 }), 404
+        
+            # Se não forneceu datas, determinar período automaticamente
+            if not data_inicio or not data_fim:
+                # Buscar data mínima e máxima do banco (pelo resumo por estação, se houver)
+                if resumo_estacoes_disponivel(cur):
+                    cur.execute(f"""
+                        SELECT MIN(primeira_leitura) as min_dia, MAX(ultima_leitura) as max_dia
+                        FROM {TABELA_ESTATISTICAS_ESTACOES};
+                    """)
+                else:
+                    cur.execute("SELECT MIN(dia) as min_dia, MAX(dia) as max_dia FROM pluviometricos;")
+                periodo_banco = cur.fetchone()
             
-            max_dia_banco = periodo_banco['max_dia']
-            min_dia_banco = periodo_banco['min_dia']
+                if not periodo_banco or not periodo_banco['min_dia']:
+                    return jsonify({
+                        'erro': 'Nenhum dado encontrado no banco',
+                        'sugestao': 'Execute: python scripts/carregar_pluviometricos_historicos.py'
+                    }), 404
             
-            # Se forneceu apenas dias, calcular período
-            if dias:
-                data_fim = max_dia_banco.strftime('%Y-%m-%d') if isinstance(max_dia_banco, datetime) else str(max_dia_banco)[:10]
-                data_inicio_obj = datetime.strptime(data_fim, '%Y-%m-%d') - timedelta(days=dias)
-                data_inicio = data_inicio_obj.strftime('%Y-%m-%d')
-            else:
-                # Padrão: últimos 30 dias ou período completo se menos de 30 dias disponíveis
-                if isinstance(max_dia_banco, datetime):
-                    data_fim = max_dia_banco.strftime('%Y-%m-%d')
-                    data_inicio_obj = max_dia_banco - timedelta(days=30)
-                    data_inicio = max(data_inicio_obj.strftime('%Y-%m-%d'), 
-                                     min_dia_banco.strftime('%Y-%m-%d') if isinstance(min_dia_banco, datetime) else str(min_dia_banco)[:10])
+                max_dia_banco = periodo_banco['max_dia']
+                min_dia_banco = periodo_banco['min_dia']
+            
+                # Se forneceu apenas dias, calcular período
+                if dias:
+                    data_fim = max_dia_banco.strftime('%Y-%m-%d') if isinstance(max_dia_banco, datetime) else str(max_dia_banco)[:10]
+                    data_inicio_obj = datetime.strptime(data_fim, '%Y-%m-%d') - timedelta(days=dias)
+                    data_inicio = data_inicio_obj.strftime('%Y-%m-%d')
                 else:
-                    data_fim = str(max_dia_banco)[:10]
-                    data_inicio_obj = datetime.strptime(data_fim, '%Y-%m-%d') - timedelta(days=30)
-                    data_inicio = max(data_inicio_obj.strftime('%Y-%m-%d'), str(min_dia_banco)[:10])
+                    # Padrão: últimos 30 dias ou período completo se menos de 30 dias disponíveis
+                    if isinstance(max_dia_banco, datetime):
+                        data_fim = max_dia_banco.strftime('%Y-%m-%d')
+                        data_inicio_obj = max_dia_banco - timedelta(days=30)
+                        data_inicio = max(data_inicio_obj.strftime('%Y-%m-%d'), 
+                                         min_dia_banco.strftime('%Y-%m-%d') if isinstance(min_dia_banco, datetime) else str(min_dia_banco)[:10])
+                    else:
+                        data_fim = str(max_dia_banco)[:10]
+                        data_inicio_obj = datetime.strptime(data_fim, '%Y-%m-%d') - timedelta(days=30)
+                        data_inicio = max(data_inicio_obj.strftime('%Y-%m-%d'), str(min_dia_banco)[:10])
         
-        # Validar formato das datas
-        try:
-            datetime.strptime(data_inicio, '%Y-%m-%d')
-            datetime.strptime(data_fim, '%Y-%m-%d')
-        except ValueError as e:
-            return jsonify({
-                'erro': 'Formato de data inválido. Use YYYY-MM-DD',
-                'data_inicio': data_inicio,
-                'data_fim': data_fim,
-                'detalhes': str(e)
-            }), 400
+            # Validar formato das datas
+            try:
+                datetime.strptime(data_inicio, '%Y-%m-%d')
+                datetime.strptime(data_fim, '%Y-%m-%d')
+            except ValueError as e:
+                return jsonify({
+                    'erro': 'Formato de data inválido. Use YYYY-MM-DD',
+                    'data_inicio': data_inicio,
+                    'data_fim': data_fim,
+                    'detalhes': str(e)
+                }), 400
+        
+            # Validar que data_inicio <= data_fim
+            if data_inicio > data_fim:
+                return jsonify({
+                    'erro': 'data_inicio deve ser anterior ou igual a data_fim',
+                    'data_inicio': data_inicio,
+                    'data_fim': data_fim
+                }), 400
         
-        # Validar que data_inicio <= data_fim
-        if data_inicio > data_fim:
-            return jsonify({
-                'erro': 'data_inicio deve ser anterior ou igual a data_fim',
-                'data_inicio': data_inicio,
-                'data_fim': data_fim
-            }), 400
-        
-        # Definir formato de agregação
-        if agregacao == 'semana':
-            date_trunc = "DATE_TRUNC('week', dia)"
-        elif agregacao == 'mes':
-            date_trunc = "DATE_TRUNC('month', dia)"
-        else:
-            date_trunc = "DATE_TRUNC('day', dia)"
-        
-        query = f"""
-            SELECT 
-                {date_trunc} as periodo,
-                estacao_id,
-                estacao,
-                ROUND(COALESCE(AVG(m05), 0)::numeric, 2) as media_m05,
-                ROUND(COALESCE(AVG(m15), 0)::numeric, 2) as media_m15,
-                ROUND(COALESCE(AVG(h01), 0)::numeric, 2) as media_h01,
-                ROUND(COALESCE(AVG(h04), 0)::numeric, 2) as media_h04,
-                ROUND(COALESCE(AVG(h24), 0)::numeric, 2) as media_h24,
-                ROUND(COALESCE(AVG(h96), 0)::numeric, 2) as media_h96,
-                ROUND(COALESCE(MAX(h24), 0)::numeric, 2) as max_h24,
-                COUNT(*) as total_leituras
-            FROM pluviometricos
-            WHERE dia >= %s AND dia <= %s
-        """
-        
-        params = [data_inicio, data_fim]
-        
-        if estacao_id:
             try:
-                estacao_id_int = int(estacao_id)
-                query += " AND estacao_id = %s"
-                params.append(estacao_id_int)
+                estacao_id_int = int(estacao_id) if estacao_id else None
             except ValueError:
                 return jsonify({'erro': 'estacao_id deve ser um número inteiro'}), 400
         
-        query += f"""
-            GROUP BY {date_trunc}, estacao_id, estacao
-            ORDER BY periodo DESC;
-        """
-        
-        cur.execute(query, params)
-        resultados = cur.fetchall()
-        
-        # Processar resultados para formatar valores numéricos
-        dados_formatados = []
-        for row in resultados:
-            row_dict = dict(row)
-            # Converter valores numéricos para float e formatar
-            campos_numericos = ['media_m05', 'media_m15', 'media_h01', 'media_h04', 
-                              'media_h24', 'media_h96', 'max_h24']
-            for campo in campos_numericos:
-                if campo in row_dict and row_dict[campo] is not None:
-                    try:
-                        valor = float(row_dict[campo])
-                        # Se o valor for muito pequeno (praticamente zero), usar 0.00
-                        if abs(valor) < 0.001:
+            usar_rollup = rollup_disponivel(cur)
+            if usar_rollup:
+                # Médias exatas a partir das somas/contagens de cada período
+                medias = ',\n'.join(
+                    f"ROUND(COALESCE(soma_{col} / NULLIF(contagem_{col}, 0), 0)::numeric, 2) as media_{col}"
+                    for col in ('m05', 'm15', 'h01', 'h04', 'h24', 'h96')
+                )
+                query = f"""
+                    SELECT 
+                        periodo,
+                        estacao_id,
+                        estacao,
+                        {medias},
+                        ROUND(COALESCE(max_h24, 0)::numeric, 2) as max_h24,
+                        total_leituras
+                    FROM {TABELA_ROLLUP}
+                    WHERE agregacao = %s
+                      AND periodo >= DATE_TRUNC(%s, %s::timestamp) AT TIME ZONE %s
+                      AND periodo <= %s::timestamp AT TIME ZONE %s
+                """
+                params = [agregacao, UNIDADES_AGREGACAO[agregacao], data_inicio, FUSO_ROLLUP,
+                          data_fim, FUSO_ROLLUP]
+                if estacao_id_int is not None:
+                    query += " AND estacao_id = %s"
+                    params.append(estacao_id_int)
+                query += " ORDER BY periodo DESC;"
+            else:
+                query, params = query_periodo_bruta(agregacao, data_inicio, data_fim, estacao_id_int)
+        
+            cur.execute(query, params)
+            resultados = cur.fetchall()
+        
+            # Processar resultados para formatar valores numéricos
+            dados_formatados = []
+            for row in resultados:
+                row_dict = dict(row)
+                # Converter valores numéricos para float e formatar
+                campos_numericos = ['media_m05', 'media_m15', 'media_h01', 'media_h04', 
+                                  'media_h24', 'media_h96', 'max_h24']
+                for campo in campos_numericos:
+                    if campo in row_dict and row_dict[campo] is not None:
+                        try:
+                            valor = float(row_dict[campo])
+                            # Se o valor for muito pequeno (praticamente zero), usar 0.00
+                            if abs(valor) < 0.001:
+                                row_dict[campo] = 0.00
+                            else:
+                                row_dict[campo] = round(valor, 2)
+                        except (ValueError, TypeError):
                             row_dict[campo] = 0.00
-                        else:
-                            row_dict[campo] = round(valor, 2)
-                    except (ValueError, TypeError):
+                    else:
                         row_dict[campo] = 0.00
-                else:
-                    row_dict[campo] = 0.00
             
-            # Formatar período se for datetime
-            if 'periodo' in row_dict and row_dict['periodo']:
-                if isinstance(row_dict['periodo'], datetime):
-                    row_dict['periodo'] = row_dict['periodo'].isoformat()
+                # Formatar período se for datetime
+                if 'periodo' in row_dict and row_dict['periodo']:
+                    if isinstance(row_dict['periodo'], datetime):
+                        row_dict['periodo'] = row_dict['periodo'].isoformat()
             
-            dados_formatados.append(row_dict)
+                dados_formatados.append(row_dict)
         
-        return jsonify({
-            'agregacao': agregacao,
-            'data_inicio': data_inicio,
-            'data_fim': data_fim,
-            'periodo_usado': f'{data_inicio} até {data_fim}',
-            'total_registros': len(dados_formatados),
-            'dados': dados_formatados
-        })
+            return jsonify({
+                'agregacao': agregacao,
+                'data_inicio': data_inicio,
+                'data_fim': data_fim,
+                'periodo_usado': f'{data_inicio} até {data_fim}',
+                'total_registros': len(dados_formatados),
+                'dados': dados_formatados
+            })
         
     except psycopg2.Error as e:
         return jsonify({
@@ -799,95 +1496,115 @@ def get_periodo():
     finally:
         if cur:
             cur.close()
-        if conn:
-            conn.close()
 
 @app.route('/api/stats', methods=['GET'])
 @require_api_key
+@cache_resposta
 def get_stats():
     """Estatísticas gerais do banco"""
-    conn = None
     cur = None
     try:
-        conn = get_db_connection()
-        cur = conn.cursor(cursor_factory=RealDictCursor)
-        
-        # Verificar se a tabela existe
-        cur.execute("""
-            SELECT EXISTS (
-                SELECT FROM information_schema.tables 
-                WHERE table_schema = 'public' 
-                AND table_name = 'pluviometricos'
-            );
-        """)
-        tabela_existe = cur.fetchone()['exists']
-        
-        if not tabela_existe:
-            return jsonify({
-                'erro': 'Tabela pluviometricos não encontrada',
-                'sugestao': 'Execute primeiro: python scripts/carregar_pluviometricos_historicos.py'
-            }), 404
+        with conexao_db() as conn:
+            cur = conn.cursor(cursor_factory=RealDictCursor)
+        
+            # Verificar se a tabela existe
+            cur.execute("""
+                SELECT EXISTS (
+                    SELECT FROM information_schema.tables 
+                    WHERE table_schema = 'public' 
+                    AND table_name = 'pluviometricos'
+                );
+            """)
+            tabela_existe = cur.fetchone()['exists']
+        
+            if not tabela_existe:
+                return jsonify({
+                    'erro': 'Tabela pluviometricos não encontrada',
+                    'sugestao': 'Execute primeiro: python scripts/carregar_pluviometricos_historicos.py'
+                }), 404
         
-        cur.execute("""
-            SELECT 
-                COUNT(*) as total_registros,
-                MIN(dia) as data_minima,
-                MAX(dia) as data_maxima,
-                COUNT(DISTINCT estacao_id) as total_estacoes,
-                ROUND(COALESCE(AVG(h24), 0)::numeric, 2) as media_geral_h24,
-                ROUND(COALESCE(MAX(h24), 0)::numeric, 2) as max_geral_h24
-            FROM pluviometricos;
-        """)
-        
-        stats = cur.fetchone()
-        
-        # Processar valores numéricos para evitar notação científica
-        if stats:
-            stats_dict = dict(stats)
-            for campo in ['media_geral_h24', 'max_geral_h24']:
-                if campo in stats_dict and stats_dict[campo] is not None:
-                    try:
-                        valor = float(stats_dict[campo])
-                        if abs(valor) < 0.001:
+            usar_resumo = resumo_estacoes_disponivel(cur)
+            if usar_resumo:
+                # Agregação sobre uma linha por estação (em vez da tabela inteira)
+                cur.execute(f"""
+                    SELECT 
+                        COALESCE(SUM(total_registros), 0)::bigint as total_registros,
+                        MIN(primeira_leitura) as data_minima,
+                        MAX(ultima_leitura) as data_maxima,
+                        COUNT(*) as total_estacoes,
+                        ROUND(COALESCE(SUM(soma_h24) / NULLIF(SUM(contagem_h24), 0), 0)::numeric, 2) as media_geral_h24,
+                        ROUND(COALESCE(MAX(max_h24), 0)::numeric, 2) as max_geral_h24
+                    FROM {TABELA_ESTATISTICAS_ESTACOES};
+                """)
+            else:
+                cur.execute("""
+                    SELECT 
+                        COUNT(*) as total_registros,
+                        MIN(dia) as data_minima,
+                        MAX(dia) as data_maxima,
+                        COUNT(DISTINCT estacao_id) as total_estacoes,
+                        ROUND(COALESCE(AVG(h24), 0)::numeric, 2) as media_geral_h24,
+                        ROUND(COALESCE(MAX(h24), 0)::numeric, 2) as max_geral_h24
+                    FROM pluviometricos;
+                """)
+        
+            stats = cur.fetchone()
+        
+            # Processar valores numéricos para evitar notação científica
+            if stats:
+                stats_dict = dict(stats)
+                for campo in ['media_geral_h24', 'max_geral_h24']:
+                    if campo in stats_dict and stats_dict[campo] is not None:
+                        try:
+                            valor = float(stats_dict[campo])
+                            if abs(valor) < 0.001:
+                                stats_dict[campo] = 0.00
+                            else:
+                                stats_dict[campo] = round(valor, 2)
+                        except (ValueError, TypeError):
                             stats_dict[campo] = 0.00
-                        else:
-                            stats_dict[campo] = round(valor, 2)
-                    except (ValueError, TypeError):
+                    else:
                         stats_dict[campo] = 0.00
-                else:
-                    stats_dict[campo] = 0.00
-            stats = stats_dict
+                stats = stats_dict
         
-        # Se não houver dados, retornar valores padrão
-        if not stats or stats['total_registros'] == 0:
-            return jsonify({
-                'estatisticas_gerais': {
-                    'total_registros': 0,
-                    'data_minima': None,
-                    'data_maxima': None,
-                    'total_estacoes': 0,
-                    'media_geral_h24': None,
-                    'max_geral_h24': None
-                },
-                'top_5_estacoes': [],
-                'aviso': 'Nenhum dado encontrado na tabela. Execute: python scripts/carregar_pluviometricos_historicos.py'
-            })
-        
-        # Top 5 estações com mais registros
-        cur.execute("""
-            SELECT estacao, COUNT(*) as total
-            FROM pluviometricos
-            GROUP BY estacao
-            ORDER BY total DESC
-            LIMIT 5;
-        """)
+            # Se não houver dados, retornar valores padrão
+            if not stats or stats['total_registros'] == 0:
+                return jsonify({
+                    'estatisticas_gerais': {
+                        'total_registros': 0,
+                        'data_minima': None,
+                        'data_maxima': None,
+                        'total_estacoes': 0,
+                        'media_geral_h24': None,
+                        'max_geral_h24': None
+                    },
+                    'top_5_estacoes': [],
+                    'aviso': 'Nenhum dado encontrado na tabela. Execute: python scripts/carregar_pluviometricos_historicos.py'
+                })
+        
+            # Top 5 estações com mais registros
+            if usar_resumo:
+                cur.execute(f"""
+                    SELECT estacao, total_registros as total
+                    FROM {TABELA_ESTATISTICAS_ESTACOES}
+                    ORDER BY total DESC
+                    LIMIT 5;
+                """)
+            else:
+                cur.execute("""
+                    SELECT estacao, COUNT(*) as total
+                    FROM pluviometricos
+                    GROUP BY estacao
+                    ORDER BY total DESC
+                    LIMIT 5;
+                """)
         
-        top_estacoes = cur.fetchall()
+            top_estacoes = cur.fetchall()
         
-        return jsonify({
-            'estatisticas_gerais': stats,
-            'top_5_estacoes': top_estacoes
-        })
+            return jsonify({
+                'estatisticas_gerais': stats,
+                'top_5_estacoes': top_estacoes
+            })
         
     except psycopg2.Error as e:
         return jsonify({
@@ -905,8 +1622,6 @@ def get_stats():
     finally:
         if cur:
             cur.close()
-        if conn:
-            conn.close()
 
 # Handler global de erros para garantir que sempre retorne JSON
 @app.errorhandler(404)
@@ -935,17 +1650,16 @@ def handle_exception(e):
 def health():
     """Status de saúde da API"""
     try:
-        conn = get_db_connection()
-        cur = conn.cursor()
-        cur.execute("SELECT 1;")
-        cur.close()
-        conn.close()
+        with conexao_db() as conn:
+            cur = conn.cursor()
+            cur.execute("SELECT 1;")
+            cur.close()
         
-        return jsonify({
-            'status': 'ok',
-            'banco': 'conectado',
-            'timestamp': datetime.now().isoformat()
-        })
+            return jsonify({
+                'status': 'ok',
+                'banco': 'conectado',
+                'timestamp': datetime.now().isoformat()
+            })
         
     except Exception as e:
         return jsonify({
@@ -984,6 +1698,7 @@ if __name__ == '__main__':
     
     # Rodar em produção com WSGI (ex: gunicorn)
     # gunicorn -w 4 -b 0.0.0.0:5000 scripts.app:app
+    # (cada worker cria o próprio pool: até 4 × DB_POOL_MAX conexões no banco)
     
     # Desenvolvimento
     app.run(host=SERVER_HOST, port=SERVER_PORT, debug=DEBUG_MODE)
\ No newline at end of file
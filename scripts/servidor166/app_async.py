@@ -0,0 +1,794 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+🌧️ API REST ASSÍNCRONA - DADOS PLUVIOMÉTRICOS
+Servidor: 10.50.30.166
+Porta: 5001 (padrão; a versão Flask usa 5000)
+
+Variante ASGI (Starlette + pool assíncrono do psycopg 3) das rotas de leitura
+de app.py, com os mesmos parâmetros e o mesmo formato de resposta. Enquanto uma
+consulta lenta (ex.: /api/ultimos?horas=720) espera o banco, o mesmo processo
+continua atendendo as outras requisições: a concorrência passa a ser limitada
+pelo pool de conexões (DB_POOL_MAX), não pelo número de workers.
+
+Rotas: /api/health, /api/pluviometricos, /api/estacoes, /api/estacoes/<id>,
+/api/ultimos, /api/periodo e /api/stats. Dashboard, documentação e
+/api/pluviometricos/export continuam na versão Flask.
+
+/api/estacoes, /api/estacoes/<id>, /api/periodo e /api/stats usam o mesmo cache
+de respostas de app.py (ETag, If-None-Match/304, X-Cache e Cache-Control:
+no-cache, invalidado pelos watermarks da sincronização); o cache é por processo,
+separado do cache dos workers Flask. /api/ultimos?formato=ndjson também é
+comprimido com gzip conforme Accept-Encoding ou o parâmetro gzip.
+
+Configuração e constantes vêm de app.py (mesmo .env, DB_DESTINO_*, API_KEY e
+DB_POOL_*). Execução:
+    uvicorn app_async:app --app-dir scripts/servidor166 --host 0.0.0.0 --port 5001
+
+Dependências (opcionais, só para esta variante): starlette, uvicorn, psycopg[binary,pool]
+"""
+
+import json
+import os
+import time
+import traceback
+import zlib
+from contextlib import asynccontextmanager
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from functools import wraps
+from uuid import UUID
+
+from psycopg import Error as PsycopgError
+from psycopg.rows import dict_row, tuple_row
+from psycopg_pool import AsyncConnectionPool, PoolTimeout
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse, Response, StreamingResponse
+from starlette.routing import Route
+from werkzeug.http import http_date, parse_etags, quote_etag
+
+# Configuração, constantes e helpers puros compartilhados com a versão Flask
+from app import (
+    API_KEY, CACHE_MAX_ITENS, CACHE_TTL_SEGUNDOS, CACHE_VERIFICACAO_SEGUNDOS, DB_CONFIG, DB_POOL_MAX, DB_POOL_MIN, DB_POOL_TIMEOUT, EXPORT_COLUNAS,
+    EXPORT_FORMATOS, EXPORT_TAMANHO_LOTE, FUSO_ROLLUP, MODOS_CONTAGEM, MODOS_ULTIMOS,
+    TABELA_ESTATISTICAS_ESTACOES, TABELA_ROLLUP, TABELA_ULTIMA_LEITURA,
+    PIPELINE_WATERMARK, TABELA_WATERMARKS, ULTIMOS_LIMITE_MAX, ULTIMOS_LIMITE_PADRAO,
+    ULTIMOS_MAX_HORAS, UNIDADES_AGREGACAO, CacheRespostas, _linha_exportacao, codificar_cursor, decodificar_cursor,
+    montar_filtros_pluviometricos, query_periodo_bruta,
+)
+
+CAMPOS_MEDIA_PERIODO = ['media_m05', 'media_m15', 'media_h01', 'media_h04',
+                        'media_h24', 'media_h96', 'max_h24']
+
+# ========================================
+# JSON (mesmo formato do jsonify do Flask)
+# ========================================
+
+def _json_padrao(valor):
+    """Serialização dos tipos que o DefaultJSONProvider do Flask também converte."""
+    if isinstance(valor, date):
+        return http_date(valor)
+    if isinstance(valor, (Decimal, UUID)):
+        return str(valor)
+    raise TypeError(f'Objeto do tipo {type(valor).__name__} não é serializável em JSON')
+
+class RespostaJSON(JSONResponse):
+    """JSONResponse com chaves ordenadas, datas em HTTP-date e Decimal como texto."""
+
+    def render(self, content):
+        return (json.dumps(content, default=_json_padrao, sort_keys=True,
+                           separators=(',', ':')) + '\n').encode('utf-8')
+
+def _arredondar_campos(registro, campos):
+    """Mesma normalização de app.py: float com 2 casas, ~0 e inválidos viram 0.00."""
+    for campo in campos:
+        valor = registro.get(campo)
+        try:
+            valor = float(valor) if valor is not None else 0.00
+        except (ValueError, TypeError):
+            valor = 0.00
+        registro[campo] = 0.00 if abs(valor) < 0.001 else round(valor, 2)
+    return registro
+
+def _erro_banco(e):
+    """Resposta de erro do banco; sem conexão livre no pool (PoolTimeout) é 503."""
+    if isinstance(e, PoolTimeout):
+        return RespostaJSON({
+            'erro': 'Banco de dados ocupado',
+            'detalhes': str(e),
+            'sugestao': 'Tente novamente em instantes'
+        }, status_code=503)
+    return RespostaJSON({
+        'erro': 'Erro no banco de dados',
+        'detalhes': str(e),
+        'tipo': type(e).__name__
+    }, status_code=500)
+
+# ========================================
+# POOL DE CONEXÕES
+# ========================================
+
+# Mesmos limites do pool da versão Flask; conexões quebradas são descartadas pelo
+# próprio pool ao serem devolvidas
+pool = AsyncConnectionPool(
+    kwargs=dict(DB_CONFIG, row_factory=dict_row),
+    min_size=DB_POOL_MIN,
+    max_size=DB_POOL_MAX,
+    timeout=DB_POOL_TIMEOUT,
+    open=False,
+)
+
+@asynccontextmanager
+async def ciclo_de_vida(aplicacao):
+    """Abre o pool ao subir o processo e fecha ao encerrar."""
+    await pool.open()
+    try:
+        yield
+    finally:
+        await pool.close()
+
+# ========================================
+# DECORADORES
+# ========================================
+
+def exigir_api_key(f):
+    """Equivalente assíncrono de require_api_key (API_KEY vazia = acesso livre)."""
+    @wraps(f)
+    async def decorated_function(request):
+        if API_KEY and request.headers.get('X-API-Key') != API_KEY:
+            return RespostaJSON({'erro': 'API Key inválida ou não fornecida'}, status_code=401)
+        return await f(request)
+    return decorated_function
+
+# ========================================
+# CACHE DE RESPOSTAS
+# ========================================
+
+_cache_respostas = CacheRespostas(CACHE_MAX_ITENS, CACHE_TTL_SEGUNDOS)
+_versao_dados = {'valor': None, 'verificada_em': None}
+
+async def obter_versao_dados():
+    """Versão assíncrona de app.obter_versao_dados (mesma tabela e mesmo intervalo)."""
+    verificada_em = _versao_dados['verificada_em']
+    if verificada_em is not None and time.monotonic() - verificada_em < CACHE_VERIFICACAO_SEGUNDOS:
+        return _versao_dados['valor']
+
+    async with pool.connection() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute("SELECT to_regclass(%s) IS NOT NULL AS existe;", (f'public.{TABELA_WATERMARKS}',))
+            versao = None
+            if (await cur.fetchone())['existe']:
+                await cur.execute(
+                    f"SELECT MAX(atualizado_em) AS ultima, COUNT(*) AS total FROM {TABELA_WATERMARKS} WHERE pipeline = %s;",
+                    (PIPELINE_WATERMARK,)
+                )
+                linha = await cur.fetchone()
+                versao = f"{linha['ultima'].isoformat() if linha['ultima'] else ''}:{linha['total']}"
+
+    _versao_dados['valor'] = versao
+    _versao_dados['verificada_em'] = time.monotonic()
+    return versao
+
+def _chave_cache(request):
+    """Rota + query string normalizada, como app._chave_cache."""
+    return request.url.path, tuple(sorted(request.query_params.multi_items()))
+
+def _resposta_cache(request, entrada, status_cache):
+    """Monta a resposta (200 ou 304) a partir de uma entrada do cache."""
+    headers = {
+        'ETag': quote_etag(entrada['etag']),
+        # Navegadores revalidam a cada uso: dados novos aparecem após a sincronização
+        'Cache-Control': 'no-cache',
+        'X-Cache': status_cache,
+    }
+    if parse_etags(request.headers.get('If-None-Match')).contains(entrada['etag']):
+        return Response(status_code=304, headers=headers)
+    return Response(entrada['corpo'], status_code=200, media_type=entrada['mimetype'], headers=headers)
+
+def cache_resposta(f):
+    """Equivalente assíncrono de app.cache_resposta (usar abaixo de @exigir_api_key)."""
+    @wraps(f)
+    async def decorated_function(request):
+        if CACHE_TTL_SEGUNDOS <= 0:
+            return await f(request)
+        try:
+            versao = await obter_versao_dados()
+        except (PsycopgError, PoolTimeout):
+            # Sem como saber se os dados mudaram: responde direto do banco
+            return await f(request)
+
+        chave = _chave_cache(request)
+        entrada = _cache_respostas.obter(chave, versao)
+        if entrada is not None:
+            return _resposta_cache(request, entrada, 'HIT')
+
+        resposta = await f(request)
+        if resposta.status_code != 200 or isinstance(resposta, StreamingResponse):
+            return resposta
+        entrada = _cache_respostas.guardar(chave, versao, resposta.body, resposta.media_type)
+        return _resposta_cache(request, entrada, 'MISS')
+    return decorated_function
+
+# ========================================
+# CONSULTAS AUXILIARES
+# ========================================
+
+async def _tabela_populada(cur, tabela):
+    """Indica se a tabela existe e já tem ao menos uma linha."""
+    await cur.execute("SELECT to_regclass(%s) IS NOT NULL AS existe;", (f'public.{tabela}',))
+    if not (await cur.fetchone())['existe']:
+        return False
+    await cur.execute(f"SELECT EXISTS (SELECT 1 FROM {tabela}) AS populado;")
+    return (await cur.fetchone())['populado']
+
+async def _tabela_pluviometricos_existe(cur):
+    await cur.execute("SELECT to_regclass('public.pluviometricos') IS NOT NULL AS existe;")
+    return (await cur.fetchone())['existe']
+
+async def contar_registros(cur, filtros, params, modo):
+    """Versão assíncrona de app.contar_registros."""
+    if modo == 'none':
+        return None
+    where = " WHERE " + " AND ".join(filtros) if filtros else ""
+    if modo == 'exact':
+        await cur.execute("SELECT COUNT(*) AS total FROM pluviometricos" + where, params)
+        return (await cur.fetchone())['total']
+    if not filtros:
+        await cur.execute("SELECT reltuples::bigint AS total FROM pg_class WHERE oid = 'pluviometricos'::regclass")
+        return max((await cur.fetchone())['total'], 0)
+    await cur.execute("EXPLAIN (FORMAT JSON) SELECT 1 FROM pluviometricos" + where, params)
+    plano = (await cur.fetchone())['QUERY PLAN']
+    return int(plano[0]['Plan']['Plan Rows'])
+
+# ========================================
+# ROTAS DA API
+# ========================================
+
+async def health(request):
+    """Status de saúde da API"""
+    try:
+        async with pool.connection() as conn:
+            await conn.execute("SELECT 1;")
+        return RespostaJSON({
+            'status': 'ok',
+            'banco': 'conectado',
+            'timestamp': datetime.now().isoformat()
+        })
+    except Exception as e:
+        return RespostaJSON({
+            'status': 'erro',
+            'banco': 'desconectado',
+            'erro': str(e),
+            'timestamp': datetime.now().isoformat()
+        }, status_code=500)
+
+@exigir_api_key
+async def get_pluviometricos(request):
+    """Mesmos parâmetros de app.get_pluviometricos (cursor, count, limit, offset, filtros)."""
+    args = request.query_params
+    limit = min(int(args.get('limit', 1000)), 10000)
+    offset = int(args.get('offset', 0))
+    cursor = args.get('cursor')
+    modo_contagem = args.get('count', 'estimate')
+
+    if modo_contagem not in MODOS_CONTAGEM:
+        return RespostaJSON({'erro': f"count deve ser: {', '.join(MODOS_CONTAGEM)}"}, status_code=400)
+    chave = None
+    if cursor:
+        try:
+            chave = decodificar_cursor(cursor)
+        except ValueError:
+            return RespostaJSON({'erro': 'cursor inválido'}, status_code=400)
+
+    filtros, params = montar_filtros_pluviometricos(args)
+    filtros_pagina = list(filtros)
+    params_pagina = list(params)
+    if chave:
+        filtros_pagina.append("(dia, estacao_id) < (%s::timestamptz, %s)")
+        params_pagina.extend(chave)
+    query = "SELECT * FROM pluviometricos"
+    if filtros_pagina:
+        query += " WHERE " + " AND ".join(filtros_pagina)
+    query += " ORDER BY dia DESC, estacao_id DESC LIMIT %s"
+    params_pagina.append(limit)
+    if not chave and offset:
+        query += " OFFSET %s"
+        params_pagina.append(offset)
+
+    try:
+        async with pool.connection() as conn:
+            async with conn.cursor() as cur:
+                await cur.execute(query, params_pagina)
+                resultados = await cur.fetchall()
+                total = await contar_registros(cur, filtros, params, modo_contagem)
+    except PsycopgError as e:
+        return _erro_banco(e)
+
+    next_cursor = None
+    if len(resultados) == limit:
+        ultimo = resultados[-1]
+        next_cursor = codificar_cursor(ultimo['dia'], ultimo['estacao_id'])
+
+    return RespostaJSON({
+        'total': total,
+        'count': modo_contagem,
+        'limit': limit,
+        'offset': 0 if chave else offset,
+        'resultados': len(resultados),
+        'next_cursor': next_cursor,
+        'dados': resultados
+    })
+
+@exigir_api_key
+@cache_resposta
+async def get_estacoes(request):
+    """Lista todas as estações disponíveis"""
+    try:
+        async with pool.connection() as conn:
+            async with conn.cursor() as cur:
+                if await _tabela_populada(cur, TABELA_ESTATISTICAS_ESTACOES):
+                    await cur.execute(f"""
+                        SELECT estacao_id, estacao, total_registros, primeira_leitura, ultima_leitura
+                        FROM {TABELA_ESTATISTICAS_ESTACOES}
+                        ORDER BY estacao;
+                    """)
+                else:
+                    await cur.execute("""
+                        SELECT
+                            estacao_id,
+                            estacao,
+                            COUNT(*) as total_registros,
+                            MIN(dia) as primeira_leitura,
+                            MAX(dia) as ultima_leitura
+                        FROM pluviometricos
+                        GROUP BY estacao_id, estacao
+                        ORDER BY estacao;
+                    """)
+                resultados = await cur.fetchall()
+    except Exception as e:
+        return RespostaJSON({'erro': str(e)}, status_code=500)
+
+    return RespostaJSON({
+        'total_estacoes': len(resultados),
+        'estacoes': resultados
+    })
+
+@exigir_api_key
+@cache_resposta
+async def get_estacao_detalhes(request):
+    """Detalhes de uma estação específica"""
+    estacao_id = request.path_params['estacao_id']
+    try:
+        async with pool.connection() as conn:
+            async with conn.cursor() as cur:
+                if await _tabela_populada(cur, TABELA_ESTATISTICAS_ESTACOES):
+                    await cur.execute(f"""
+                        SELECT
+                            estacao_id,
+                            estacao,
+                            total_registros,
+                            primeira_leitura,
+                            ultima_leitura,
+                            ROUND(COALESCE(soma_h24 / NULLIF(contagem_h24, 0), 0)::numeric, 2) as media_h24,
+                            ROUND(COALESCE(max_h24, 0)::numeric, 2) as max_h24
+                        FROM {TABELA_ESTATISTICAS_ESTACOES}
+                        WHERE estacao_id = %s;
+                    """, (estacao_id,))
+                else:
+                    await cur.execute("""
+                        SELECT
+                            estacao_id,
+                            estacao,
+                            COUNT(*) as total_registros,
+                            MIN(dia) as primeira_leitura,
+                            MAX(dia) as ultima_leitura,
+                            ROUND(COALESCE(AVG(h24), 0)::numeric, 2) as media_h24,
+                            ROUND(COALESCE(MAX(h24), 0)::numeric, 2) as max_h24
+                        FROM pluviometricos
+                        WHERE estacao_id = %s
+                        GROUP BY estacao_id, estacao;
+                    """, (estacao_id,))
+                info = await cur.fetchone()
+                if not info:
+                    return RespostaJSON({'erro': 'Estação não encontrada'}, status_code=404)
+
+                await cur.execute("""
+                    SELECT * FROM pluviometricos
+                    WHERE estacao_id = %s
+                    ORDER BY dia DESC
+                    LIMIT 10;
+                """, (estacao_id,))
+                ultimas_leituras = await cur.fetchall()
+    except Exception as e:
+        return RespostaJSON({'erro': str(e)}, status_code=500)
+
+    return RespostaJSON({
+        'informacoes': _arredondar_campos(dict(info), ['media_h24', 'max_h24']),
+        'ultimas_leituras': ultimas_leituras
+    })
+
+@exigir_api_key
+async def get_ultimos(request):
+    """Mesmos parâmetros de app.get_ultimos (horas, modo, limit, cursor, formato)."""
+    args = request.query_params
+    try:
+        horas = int(args.get('horas', 24))
+        modo = args.get('modo', 'bruto')
+        formato = args.get('formato', 'json')
+
+        if modo not in MODOS_ULTIMOS:
+            return RespostaJSON({'erro': f"modo deve ser: {', '.join(MODOS_ULTIMOS)}"}, status_code=400)
+        if formato not in ('json', 'ndjson'):
+            return RespostaJSON({'erro': 'formato deve ser: json ou ndjson'}, status_code=400)
+        if not 0 < horas <= ULTIMOS_MAX_HORAS:
+            return RespostaJSON({'erro': f'horas deve estar entre 1 e {ULTIMOS_MAX_HORAS}'}, status_code=400)
+
+        if modo == 'ultima_por_estacao':
+            async with pool.connection() as conn:
+                async with conn.cursor() as cur:
+                    if await _tabela_populada(cur, TABELA_ULTIMA_LEITURA):
+                        await cur.execute(f"""
+                            SELECT {', '.join(EXPORT_COLUNAS)}
+                            FROM {TABELA_ULTIMA_LEITURA}
+                            WHERE dia >= NOW() - make_interval(hours => %s)
+                            ORDER BY estacao;
+                        """, (horas,))
+                    else:
+                        await cur.execute(f"""
+                            SELECT * FROM (
+                                SELECT DISTINCT ON (estacao_id) {', '.join(EXPORT_COLUNAS)}
+                                FROM pluviometricos
+                                WHERE dia >= NOW() - make_interval(hours => %s)
+                                ORDER BY estacao_id, dia DESC
+                            ) AS ultimas
+                            ORDER BY estacao;
+                        """, (horas,))
+                    resultados = await cur.fetchall()
+            return RespostaJSON({
+                'modo': modo,
+                'periodo': f'Últimas {horas} horas',
+                'total_registros': len(resultados),
+                'dados': resultados
+            })
+
+        if formato == 'ndjson':
+            corpo = _ndjson_ultimos(horas)
+            headers = {'Vary': 'Accept-Encoding'}
+            if _usar_gzip(request):
+                corpo = _comprimir_gzip(corpo)
+                headers['Content-Encoding'] = 'gzip'
+            return StreamingResponse(corpo, media_type=EXPORT_FORMATOS['ndjson'][0], headers=headers)
+
+        limit = min(int(args.get('limit', ULTIMOS_LIMITE_PADRAO)), ULTIMOS_LIMITE_MAX)
+        cursor = args.get('cursor')
+        chave = None
+        if cursor:
+            try:
+                chave = decodificar_cursor(cursor)
+            except ValueError:
+                return RespostaJSON({'erro': 'cursor inválido'}, status_code=400)
+
+        query = "SELECT * FROM pluviometricos WHERE dia >= NOW() - make_interval(hours => %s)"
+        params = [horas]
+        if chave:
+            query += " AND (dia, estacao_id) < (%s::timestamptz, %s)"
+            params.extend(chave)
+        query += " ORDER BY dia DESC, estacao_id DESC LIMIT %s;"
+        params.append(limit)
+
+        async with pool.connection() as conn:
+            async with conn.cursor() as cur:
+                await cur.execute(query, params)
+                resultados = await cur.fetchall()
+    except Exception as e:
+        return RespostaJSON({'erro': str(e)}, status_code=500)
+
+    next_cursor = None
+    if len(resultados) == limit:
+        ultimo = resultados[-1]
+        next_cursor = codificar_cursor(ultimo['dia'], ultimo['estacao_id'])
+
+    return RespostaJSON({
+        'modo': modo,
+        'periodo': f'Últimas {horas} horas',
+        'total_registros': len(resultados),
+        'limit': limit,
+        'next_cursor': next_cursor,
+        'dados': resultados
+    })
+
+async def _ndjson_ultimos(horas):
+    """Janela inteira de /api/ultimos em NDJSON, lida por cursor server-side em lotes."""
+    async with pool.connection() as conn:
+        async with conn.cursor(name='exportar_ultimos', row_factory=tuple_row) as cur:
+            await cur.execute(
+                "SELECT dia, m05::float8, m10::float8, m15::float8, h01::float8, h04::float8, "
+                "h24::float8, h96::float8, estacao, estacao_id FROM pluviometricos "
+                "WHERE dia >= NOW() - make_interval(hours => %s) "
+                "ORDER BY dia DESC, estacao_id DESC",
+                (horas,)
+            )
+            while True:
+                lote = await cur.fetchmany(EXPORT_TAMANHO_LOTE)
+                if not lote:
+                    break
+                yield ''.join(
+                    json.dumps(_linha_exportacao(r), ensure_ascii=False) + '\n' for r in lote
+                ).encode('utf-8')
+
+def _usar_gzip(request):
+    """gzip=1/0 na query string força ou desliga; senão, conforme Accept-Encoding."""
+    parametro_gzip = request.query_params.get('gzip')
+    if parametro_gzip is None:
+        return 'gzip' in request.headers.get('Accept-Encoding', '').lower()
+    return parametro_gzip.lower() in ('1', 'true', 'sim')
+
+async def _comprimir_gzip(blocos):
+    """Aplica gzip incrementalmente, bloco a bloco (versão assíncrona de app._comprimir_gzip)."""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    async for bloco in blocos:
+        comprimido = compressor.compress(bloco)
+        if comprimido:
+            yield comprimido
+    yield compressor.flush()
+
+def _data_texto(valor):
+    return valor.strftime('%Y-%m-%d') if isinstance(valor, datetime) else str(valor)[:10]
+
+async def _periodo_padrao(cur, dias):
+    """(data_inicio, data_fim) padrão de /api/periodo, como em app.get_periodo; None sem dados."""
+    if await _tabela_populada(cur, TABELA_ESTATISTICAS_ESTACOES):
+        await cur.execute(f"""
+            SELECT MIN(primeira_leitura) as min_dia, MAX(ultima_leitura) as max_dia
+            FROM {TABELA_ESTATISTICAS_ESTACOES};
+        """)
+    else:
+        await cur.execute("SELECT MIN(dia) as min_dia, MAX(dia) as max_dia FROM pluviometricos;")
+    periodo_banco = await cur.fetchone()
+    if not periodo_banco or not periodo_banco['min_dia']:
+        return None
+
+    data_fim = _data_texto(periodo_banco['max_dia'])
+    data_inicio = (datetime.strptime(data_fim, '%Y-%m-%d') - timedelta(days=dias or 30)).strftime('%Y-%m-%d')
+    if not dias:
+        # Padrão: últimos 30 dias ou período completo se menos de 30 dias disponíveis
+        data_inicio = max(data_inicio, _data_texto(periodo_banco['min_dia']))
+    return data_inicio, data_fim
+
+@exigir_api_key
+@cache_resposta
+async def get_periodo(request):
+    """Agregação de dados por período (mesmos parâmetros de app.get_periodo)."""
+    args = request.query_params
+    data_inicio = args.get('data_inicio')
+    data_fim = args.get('data_fim')
+    try:
+        dias = int(args['dias']) if args.get('dias') else None
+    except ValueError:
+        dias = None  # como request.args.get(type=int) no Flask
+    estacao_id = args.get('estacao_id')
+    agregacao = args.get('agregacao', 'dia')
+
+    if agregacao not in UNIDADES_AGREGACAO:
+        return RespostaJSON({'erro': 'agregacao deve ser: dia, semana ou mes'}, status_code=400)
+
+    try:
+        async with pool.connection() as conn:
+            async with conn.cursor() as cur:
+                if not await _tabela_pluviometricos_existe(cur):
+                    return RespostaJSON({
+                        'erro': 'Tabela pluviometricos não encontrada',
+                        'sugestao': 'Execute primeiro: python scripts/carregar_pluviometricos_historicos.py'
+                    }, status_code=404)
+
+                if not data_inicio or not data_fim:
+                    periodo = await _periodo_padrao(cur, dias)
+                    if periodo is None:
+                        return RespostaJSON({
+                            'erro': 'Nenhum dado encontrado no banco',
+                            'sugestao': 'Execute: python scripts/carregar_pluviometricos_historicos.py'
+                        }, status_code=404)
+                    data_inicio, data_fim = periodo
+
+                try:
+                    datetime.strptime(data_inicio, '%Y-%m-%d')
+                    datetime.strptime(data_fim, '%Y-%m-%d')
+                except ValueError as e:
+                    return RespostaJSON({
+                        'erro': 'Formato de data inválido. Use YYYY-MM-DD',
+                        'data_inicio': data_inicio,
+                        'data_fim': data_fim,
+                        'detalhes': str(e)
+                    }, status_code=400)
+
+                if data_inicio > data_fim:
+                    return RespostaJSON({
+                        'erro': 'data_inicio deve ser anterior ou igual a data_fim',
+                        'data_inicio': data_inicio,
+                        'data_fim': data_fim
+                    }, status_code=400)
+
+                try:
+                    estacao_id_int = int(estacao_id) if estacao_id else None
+                except ValueError:
+                    return RespostaJSON({'erro': 'estacao_id deve ser um número inteiro'}, status_code=400)
+
+                if await _tabela_populada(cur, TABELA_ROLLUP):
+                    medias = ',\n'.join(
+                        f"ROUND(COALESCE(soma_{col} / NULLIF(contagem_{col}, 0), 0)::numeric, 2) as media_{col}"
+                        for col in ('m05', 'm15', 'h01', 'h04', 'h24', 'h96')
+                    )
+                    query = f"""
+                        SELECT
+                            periodo,
+                            estacao_id,
+                            estacao,
+                            {medias},
+                            ROUND(COALESCE(max_h24, 0)::numeric, 2) as max_h24,
+                            total_leituras
+                        FROM {TABELA_ROLLUP}
+                        WHERE agregacao = %s
+                          AND periodo >= DATE_TRUNC(%s, %s::timestamp) AT TIME ZONE %s
+                          AND periodo <= %s::timestamp AT TIME ZONE %s
+                    """
+                    params = [agregacao, UNIDADES_AGREGACAO[agregacao], data_inicio, FUSO_ROLLUP,
+                              data_fim, FUSO_ROLLUP]
+                    if estacao_id_int is not None:
+                        query += " AND estacao_id = %s"
+                        params.append(estacao_id_int)
+                    query += " ORDER BY periodo DESC;"
+                else:
+                    query, params = query_periodo_bruta(agregacao, data_inicio, data_fim, estacao_id_int)
+
+                await cur.execute(query, params)
+                resultados = await cur.fetchall()
+    except PsycopgError as e:
+        return _erro_banco(e)
+
+    dados_formatados = []
+    for row in resultados:
+        row_dict = _arredondar_campos(dict(row), CAMPOS_MEDIA_PERIODO)
+        if isinstance(row_dict.get('periodo'), datetime):
+            row_dict['periodo'] = row_dict['periodo'].isoformat()
+        dados_formatados.append(row_dict)
+
+    return RespostaJSON({
+        'agregacao': agregacao,
+        'data_inicio': data_inicio,
+        'data_fim': data_fim,
+        'periodo_usado': f'{data_inicio} até {data_fim}',
+        'total_registros': len(dados_formatados),
+        'dados': dados_formatados
+    })
+
+@exigir_api_key
+@cache_resposta
+async def get_stats(request):
+    """Estatísticas gerais do banco"""
+    try:
+        async with pool.connection() as conn:
+            async with conn.cursor() as cur:
+                if not await _tabela_pluviometricos_existe(cur):
+                    return RespostaJSON({
+                        'erro': 'Tabela pluviometricos não encontrada',
+                        'sugestao': 'Execute primeiro: python scripts/carregar_pluviometricos_historicos.py'
+                    }, status_code=404)
+
+                usar_resumo = await _tabela_populada(cur, TABELA_ESTATISTICAS_ESTACOES)
+                if usar_resumo:
+                    await cur.execute(f"""
+                        SELECT
+                            COALESCE(SUM(total_registros), 0)::bigint as total_registros,
+                            MIN(primeira_leitura) as data_minima,
+                            MAX(ultima_leitura) as data_maxima,
+                            COUNT(*) as total_estacoes,
+                            ROUND(COALESCE(SUM(soma_h24) / NULLIF(SUM(contagem_h24), 0), 0)::numeric, 2) as media_geral_h24,
+                            ROUND(COALESCE(MAX(max_h24), 0)::numeric, 2) as max_geral_h24
+                        FROM {TABELA_ESTATISTICAS_ESTACOES};
+                    """)
+                else:
+                    await cur.execute("""
+                        SELECT
+                            COUNT(*) as total_registros,
+                            MIN(dia) as data_minima,
+                            MAX(dia) as data_maxima,
+                            COUNT(DISTINCT estacao_id) as total_estacoes,
+                            ROUND(COALESCE(AVG(h24), 0)::numeric, 2) as media_geral_h24,
+                            ROUND(COALESCE(MAX(h24), 0)::numeric, 2) as max_geral_h24
+                        FROM pluviometricos;
+                    """)
+                stats = await cur.fetchone()
+                if stats:
+                    stats = _arredondar_campos(dict(stats), ['media_geral_h24', 'max_geral_h24'])
+
+                if not stats or stats['total_registros'] == 0:
+                    return RespostaJSON({
+                        'estatisticas_gerais': {
+                            'total_registros': 0,
+                            'data_minima': None,
+                            'data_maxima': None,
+                            'total_estacoes': 0,
+                            'media_geral_h24': None,
+                            'max_geral_h24': None
+                        },
+                        'top_5_estacoes': [],
+                        'aviso': 'Nenhum dado encontrado na tabela. Execute: python scripts/carregar_pluviometricos_historicos.py'
+                    })
+
+                if usar_resumo:
+                    await cur.execute(f"""
+                        SELECT estacao, total_registros as total
+                        FROM {TABELA_ESTATISTICAS_ESTACOES}
+                        ORDER BY total DESC
+                        LIMIT 5;
+                    """)
+                else:
+                    await cur.execute("""
+                        SELECT estacao, COUNT(*) as total
+                        FROM pluviometricos
+                        GROUP BY estacao
+                        ORDER BY total DESC
+                        LIMIT 5;
+                    """)
+                top_estacoes = await cur.fetchall()
+    except PsycopgError as e:
+        return _erro_banco(e)
+
+    return RespostaJSON({
+        'estatisticas_gerais': stats,
+        'top_5_estacoes': top_estacoes
+    })
+
+# ========================================
+# ERROS
+# ========================================
+
+async def nao_encontrado(request, exc):
+    return RespostaJSON({'erro': 'Endpoint não encontrado'}, status_code=404)
+
+async def erro_interno(request, exc):
+    return RespostaJSON({
+        'erro': str(exc),
+        'tipo': type(exc).__name__,
+        'traceback': traceback.format_exc()
+    }, status_code=500)
+
+app = Starlette(
+    routes=[
+        Route('/api/health', health),
+        Route('/api/pluviometricos', get_pluviometricos),
+        Route('/api/estacoes', get_estacoes),
+        Route('/api/estacoes/{estacao_id:int}', get_estacao_detalhes),
+        Route('/api/ultimos', get_ultimos),
+        Route('/api/periodo', get_periodo),
+        Route('/api/stats', get_stats),
+    ],
+    exception_handlers={
+        404: nao_encontrado,
+        Exception: erro_interno,
+    },
+    lifespan=ciclo_de_vida,
+)
+
+# ========================================
+# MAIN
+# ========================================
+
+if __name__ == '__main__':
+    import uvicorn
+
+    SERVER_HOST = os.getenv('SERVER_HOST', '0.0.0.0')
+    SERVER_PORT = int(os.getenv('ASYNC_SERVER_PORT', '5001'))
+
+    print("="*70)
+    print("🌧️  API DADOS PLUVIOMÉTRICOS (ASGI)")
+    print("="*70)
+    print(f"🌐 Servidor: http://{'localhost' if SERVER_HOST == '0.0.0.0' else SERVER_HOST}:{SERVER_PORT}")
+    print(f"💾 Banco de dados: {DB_CONFIG['dbname']} @ {DB_CONFIG['host']}:{DB_CONFIG['port']}")
+    print(f"🔌 Pool: {DB_POOL_MIN}-{DB_POOL_MAX} conexões (timeout {DB_POOL_TIMEOUT:g}s)")
+    print("="*70)
+    print()
+
+    # Um único processo atende todas as requisições em andamento
+    uvicorn.run(app, host=SERVER_HOST, port=SERVER_PORT)
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+⏱️ BENCHMARK - API FLASK (app.py) x API ASSÍNCRONA (app_async.py)
+
+Dispara requisições concorrentes contra cada API durante um tempo fixo e
+mostra req/s, latências p50/p95/p99 e erros por rota.
+
+Para comparar só o acesso ao banco, suba as duas APIs com CACHE_TTL_SEGUNDOS=0
+(senão /api/stats, /api/estacoes e /api/periodo saem do cache em memória) e use
+o mesmo DB_POOL_MAX nas duas.
+
+Exemplo (Flask com gunicorn e 4 workers; ASGI com um único processo):
+    gunicorn -w 4 -b 0.0.0.0:5000 --chdir scripts/servidor166 app:app
+    uvicorn app_async:app --app-dir scripts/servidor166 --port 5001
+    python scripts/servidor166/benchmark_api.py \\
+        --flask http://localhost:5000 --async http://localhost:5001 \\
+        --concorrencia 50 --duracao 30
+"""
+
+import argparse
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+ROTAS_PADRAO = [
+    '/api/health',
+    '/api/stats',
+    '/api/estacoes',
+    '/api/periodo?dias=30',
+    '/api/pluviometricos?limit=500&count=none',
+    '/api/ultimos?horas=24',
+]
+CONCORRENCIA_PADRAO = 50
+DURACAO_PADRAO = 20
+TIMEOUT_REQUISICAO = 120
+
+def percentil(valores_ordenados, p):
+    """Percentil p (0-100) por vizinho mais próximo; None sem amostras."""
+    if not valores_ordenados:
+        return None
+    indice = min(len(valores_ordenados) - 1, int(round(p / 100 * (len(valores_ordenados) - 1))))
+    return valores_ordenados[indice]
+
+def medir_rota(url, concorrencia, duracao, headers):
+    """Mantém `concorrencia` requisições em andamento contra url por `duracao` segundos.
+
+    Returns:
+        dict: req_s, p50/p95/p99 (ms), ok, erros
+    """
+    sessao_local = threading.local()
+    latencias = []
+    erros = [0]
+    lock = threading.Lock()
+    fim = time.perf_counter() + duracao
+
+    def trabalhador():
+        if not hasattr(sessao_local, 'sessao'):
+            sessao_local.sessao = requests.Session()
+        while time.perf_counter() < fim:
+            inicio = time.perf_counter()
+            try:
+                resposta = sessao_local.sessao.get(url, headers=headers, timeout=TIMEOUT_REQUISICAO)
+                resposta.content  # corpo completo conta na latência
+                ok = resposta.status_code == 200
+            except requests.RequestException:
+                ok = False
+            decorrido = time.perf_counter() - inicio
+            with lock:
+                if ok:
+                    latencias.append(decorrido)
+                else:
+                    erros[0] += 1
+
+    inicio_total = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concorrencia) as executor:
+        futuros = [executor.submit(trabalhador) for _ in range(concorrencia)]
+        # Propaga exceções de um trabalhador em vez de medir com menos concorrência
+        for futuro in futuros:
+            futuro.result()
+    tempo_total = time.perf_counter() - inicio_total
+
+    latencias.sort()
+    return {
+        'req_s': len(latencias) / tempo_total if tempo_total else 0.0,
+        'p50': _ms(percentil(latencias, 50)),
+        'p95': _ms(percentil(latencias, 95)),
+        'p99': _ms(percentil(latencias, 99)),
+        'ok': len(latencias),
+        'erros': erros[0],
+    }
+
+def _ms(segundos):
+    return segundos * 1000 if segundos is not None else None
+
+def _fmt(valor, casas=1):
+    return f'{valor:,.{casas}f}' if valor is not None else '-'
+
+def imprimir_resultados(resultados, rotas):
+    """Tabela por rota com uma linha por API."""
+    print()
+    print("=" * 86)
+    print(f"{'Rota':<42}{'API':<8}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}")
+    print("=" * 86)
+    for rota in rotas:
+        for nome, medicoes in resultados.items():
+            m = medicoes[rota]
+            print(f"{rota[:41]:<42}{nome:<8}{_fmt(m['req_s']):>9}{_fmt(m['p50']):>9}"
+                  f"{_fmt(m['p95']):>9}{_fmt(m['p99']):>9}"
+                  + (f"  ⚠️ {m['erros']} erros" if m['erros'] else ''))
+        print("-" * 86)
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark da API pluviométrica: Flask x ASGI')
+    parser.add_argument('--flask', help='URL base da API Flask (ex.: http://localhost:5000)')
+    parser.add_argument('--async', dest='assincrona', help='URL base da API ASGI (ex.: http://localhost:5001)')
+    parser.add_argument('--rota', action='append', dest='rotas',
+                        help='Rota com query string (repetível). Padrão: ' + ', '.join(ROTAS_PADRAO))
+    parser.add_argument('--concorrencia', type=int, default=CONCORRENCIA_PADRAO,
+                        help=f'Requisições simultâneas (padrão: {CONCORRENCIA_PADRAO})')
+    parser.add_argument('--duracao', type=float, default=DURACAO_PADRAO,
+                        help=f'Segundos por rota e API (padrão: {DURACAO_PADRAO})')
+    parser.add_argument('--api-key', default=os.getenv('API_KEY'),
+                        help='X-API-Key (padrão: API_KEY do ambiente)')
+    args = parser.parse_args()
+
+    alvos = {nome: url.rstrip('/') for nome, url in (('flask', args.flask), ('asgi', args.assincrona)) if url}
+    if not alvos:
+        parser.error('informe --flask e/ou --async')
+    rotas = args.rotas or ROTAS_PADRAO
+    headers = {'X-API-Key': args.api_key} if args.api_key else {}
+
+    print("=" * 86)
+    print("⏱️  BENCHMARK API PLUVIOMÉTRICA")
+    print("=" * 86)
+    for nome, url in alvos.items():
+        print(f"🌐 {nome}: {url}")
+    print(f"🔀 Concorrência: {args.concorrencia} | ⏳ {args.duracao:g}s por rota")
+
+    resultados = {nome: {} for nome in alvos}
+    for rota in rotas:
+        for nome, url in alvos.items():
+            print(f"   ▶️ {nome} {rota}...")
+            resultados[nome][rota] = medir_rota(url + rota, args.concorrencia, args.duracao, headers)
+
+    imprimir_resultados(resultados, rotas)
+
+if __name__ == '__main__':
+    main()
@@ -27,6 +27,8 @@ pluviométricos históricos do banco alertadb (origem) para o banco alertadb_cor
 ✅ Mostra progresso detalhado durante a carga
 ✅ Exibe estatísticas finais (total de registros, período dos dados)
 ✅ Diagnostica duplicatas no banco origem antes da carga
+✅ Journal de checkpoint por lote (logs/carga_pluviometricos_checkpoint.jsonl)
+✅ Modo particionado (--particionar mes|estacao) com pool de workers e retomada
 
 ═══════════════════════════════════════════════════════════════════════════
 ⚠️ QUANDO USAR ESTE SCRIPT:
@@ -45,6 +47,30 @@ pluviométricos históricos do banco alertadb (origem) para o banco alertadb_cor
 2. Execute: python carregar_pluviometricos_historicos.py
 3. Aguarde a conclusão (pode levar vários minutos dependendo do volume)
 4. Após concluir, execute o sincronizar_pluviometricos_novos.py para manter atualizado
+5. Se a tabela já tinha dados (backfill de um período), rode
+   sincronizar_pluviometricos_novos.py --recalcular-estatisticas: a carga não
+   atualiza o resumo por estação nem pluviometricos_rollup, e é pelo
+   atualizado_em do rollup que exportar_pluviometricos_parquet.py --incremental
+   descobre os meses a regravar
+
+Execução não interativa (Prefect, cron, benchmarks):
+   python carregar_pluviometricos_historicos.py --yes --since 2020-01-01 --until 2021-01-01
+   python carregar_pluviometricos_historicos.py --yes --stations 1,5,22 --batch-size 20000
+   python carregar_pluviometricos_historicos.py --dry-run --particionar mes
+
+   --since é inclusivo e --until exclusivo. Ao final o script imprime um resumo
+   JSON em uma linha (última linha da saída) e sai com código 1 em caso de falha.
+
+Retomar uma carga completa interrompida (a partir do último lote commitado):
+   python carregar_pluviometricos_historicos.py --resume --yes
+
+Carga particionada (backfill paralelo, retomável):
+   python carregar_pluviometricos_historicos.py --particionar mes --workers 4
+   python carregar_pluviometricos_historicos.py --particionar estacao --workers 8
+
+   Cada partição (mês ou estação) é carregada com commit próprio e registrada
+   na tabela carga_historica_particoes. Ao rodar de novo, apenas as partições
+   pendentes são carregadas.
 
 ═══════════════════════════════════════════════════════════════════════════
 🔒 PROTEÇÕES IMPLEMENTADAS:
@@ -80,9 +106,15 @@ Variáveis opcionais:
 import psycopg2
 from psycopg2 import errors as psycopg2_errors
 from psycopg2.extras import execute_values
+import argparse
+import json
 import os
 import re
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime, timedelta
+from itertools import islice
+from zoneinfo import ZoneInfo
 from dotenv import load_dotenv
 
 # Carregar variáveis de ambiente (busca .env na raiz do projeto)
@@ -92,6 +124,11 @@ from pathlib import Path
 project_root = Path(__file__).parent.parent.parent
 load_dotenv(dotenv_path=project_root / '.env')
 
+# Normalização vetorizada de timestamps compartilhada com os demais loaders
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'comum'))
+from normalizacao_tempo import FUSO_SP, formatar_timestamptz
+from extracao_nimbus import MARCADOR_JANELA, iterar_em_janelas
+
 def extrair_timezone_offset(dt):
     """
     Extrai o offset de timezone de um datetime aware.
@@ -323,49 +360,112 @@ def carregar_configuracoes():
 # Carregar configurações
 ORIGEM, DESTINO = carregar_configuracoes()
 
-# 🧱 Query para buscar TODOS os dados (sem filtro de data)
-def query_todos_dados():
-    """Retorna query para buscar TODOS os dados disponíveis no banco.
-    
-    Usa DISTINCT ON para garantir apenas um registro por (dia, estacao_id),
-    mantendo o registro com o maior ID (mais recente), que é exatamente como
-    está no banco alertadb.
-    
-    IMPORTANTE: A ordem do ORDER BY deve corresponder à ordem do DISTINCT ON,
-    e depois ordenar por id DESC para pegar o registro mais recente.
+# 🧩 Carga particionada: cada partição (mês ou estação) é carregada por um worker,
+# com commit próprio e registro em TABELA_PARTICOES para retomada
+TABELA_PARTICOES = 'carga_historica_particoes'
+MODOS_PARTICAO = ('mes', 'estacao')
+# Largura das janelas de extração por modo: uma estação tem ~288 leituras por
+# dia, então no modo estação uma janela de 30 dias ainda cabe em uma página
+JANELA_EXTRACAO = {'mes': timedelta(days=1), 'estacao': timedelta(days=30)}
+WORKERS_PADRAO = 4
+TAMANHO_LOTE = 10000
+
+# 📒 Journal de checkpoint da carga completa: uma linha JSON por lote commitado
+ARQUIVO_CHECKPOINT = Path(
+    os.getenv('CARGA_CHECKPOINT_ARQUIVO')
+    or project_root / 'logs' / 'carga_pluviometricos_checkpoint.jsonl'
+)
+
+# Usar ON CONFLICT DO UPDATE para garantir que os dados sejam sempre atualizados
+# com os valores corretos do banco origem, mesmo se já existirem dados incorretos
+SQL_UPSERT_PLUVIOMETRICOS = '''
+INSERT INTO pluviometricos
+(dia, m05, m10, m15, h01, h04, h24, h96, estacao, estacao_id)
+VALUES %s
+ON CONFLICT (dia, estacao_id) 
+DO UPDATE SET
+    m05 = EXCLUDED.m05,
+    m10 = EXCLUDED.m10,
+    m15 = EXCLUDED.m15,
+    h01 = EXCLUDED.h01,
+    h04 = EXCLUDED.h04,
+    h24 = EXCLUDED.h24,
+    h96 = EXCLUDED.h96,
+    estacao = EXCLUDED.estacao;
+'''
+
+# 🕒 Limites do período (--since/--until, data digitada, journal de checkpoint)
+def interpretar_data(valor):
+    """Converte o limite do período em datetime com timezone (uma única vez).
+
+    Sem offset, a data/hora é o horário civil de São Paulo (-02:00 no horário
+    de verão antigo, -03:00 fora dele). O mesmo datetime vai para o SQL
+    (%(data_inicial)s::timestamptz) e para as janelas de iterar_em_janelas,
+    então os dois não dependem do timezone da sessão.
+
+    Returns:
+        datetime | None: None se valor for vazio
     """
-    return """
-SELECT DISTINCT ON (el."horaLeitura", el.estacao_id)
-    el."horaLeitura" AS "Dia",
-    elc.m05,
-    elc.m10,
-    elc.m15,
-    elc.h01,
-    elc.h04,
-    elc.h24,
-    elc.h96,
-    ee.nome AS "Estacao",
-    el.estacao_id
-FROM public.estacoes_leitura AS el
-JOIN public.estacoes_leiturachuva AS elc
-    ON elc.leitura_id = el.id
-JOIN public.estacoes_estacao AS ee
-    ON ee.id = el.estacao_id
-ORDER BY el."horaLeitura" ASC, el.estacao_id ASC, el.id DESC;
-"""
+    if valor is None or valor == '':
+        return None
+    if isinstance(valor, str):
+        valor = datetime.fromisoformat(valor.strip())
+    if valor.tzinfo is None:
+        valor = valor.replace(tzinfo=ZoneInfo(FUSO_SP))
+    return valor
+
+def _rotulo_data(valor):
+    """Texto do limite na chave da partição (YYYY-MM-DD quando é meia-noite local)."""
+    local = valor.astimezone(ZoneInfo(FUSO_SP))
+    return f"{local:%Y-%m-%d}" if local.time() == datetime.min.time() else f"{local:%Y-%m-%d %H:%M:%S}"
+
+def _texto_data(valor):
+    """Limite do período em ISO 8601 com offset (resumo JSON e journal)."""
+    return valor.isoformat() if valor is not None else None
+
+# 🧱 Query de carga: DISTINCT ON com filtros opcionais (período, estações, retomada)
+def query_carga(data_inicial=None, data_final=None, estacoes=None, apos_chave=None,
+                com_janela=False):
+    """Retorna (query, parametros) para buscar dados do banco origem.
 
-# 🧱 Query para buscar dados desde uma data específica
-def query_dados_desde_data(data_inicial):
-    """Retorna query para buscar dados desde uma data específica.
-    
     Usa DISTINCT ON para garantir apenas um registro por (dia, estacao_id),
     mantendo o registro com o maior ID (mais recente), que é exatamente como
     está no banco alertadb.
-    
+
     IMPORTANTE: A ordem do ORDER BY deve corresponder à ordem do DISTINCT ON,
     e depois ordenar por id DESC para pegar o registro mais recente.
+
+    Args:
+        data_inicial: início inclusivo ("horaLeitura" >= data_inicial)
+        data_final: fim exclusivo ("horaLeitura" < data_final)
+        estacoes: lista de estacao_id a carregar (None = todas)
+        apos_chave: (ultimo_dia, ultima_estacao_id) do último checkpoint; a
+            comparação de tupla segue a ordem do DISTINCT ON (keyset pagination)
+        com_janela: inclui MARCADOR_JANELA no WHERE para a extração em janelas
+            (iterar_em_janelas); nesse modo a retomada é feita pelo próprio
+            iterador e apos_chave deve ser None
     """
-    return f"""
+    condicoes = []
+    parametros = {}
+    if data_inicial is not None:
+        condicoes.append('el."horaLeitura" >= %(data_inicial)s::timestamptz')
+        parametros['data_inicial'] = data_inicial
+    if data_final is not None:
+        condicoes.append('el."horaLeitura" < %(data_final)s::timestamptz')
+        parametros['data_final'] = data_final
+    if estacoes:
+        condicoes.append('el.estacao_id = ANY(%(estacoes)s)')
+        parametros['estacoes'] = list(estacoes)
+    if apos_chave is not None:
+        condicoes.append(
+            '(el."horaLeitura", el.estacao_id) > (%(ultimo_dia)s::timestamptz, %(ultima_estacao_id)s)'
+        )
+        parametros['ultimo_dia'], parametros['ultima_estacao_id'] = apos_chave
+    if com_janela:
+        condicoes.append(MARCADOR_JANELA)
+
+    where = f"WHERE {' AND '.join(condicoes)}" if condicoes else ''
+    query = f"""
 SELECT DISTINCT ON (el."horaLeitura", el.estacao_id)
     el."horaLeitura" AS "Dia",
     elc.m05,
@@ -382,9 +482,10 @@ JOIN public.estacoes_leiturachuva AS elc
     ON elc.leitura_id = el.id
 JOIN public.estacoes_estacao AS ee
     ON ee.id = el.estacao_id
-WHERE el."horaLeitura" >= '{data_inicial}'::timestamp
+{where}
 ORDER BY el."horaLeitura" ASC, el.estacao_id ASC, el.id DESC;
 """
+    return query, parametros
 
 def testar_conexoes():
     """Testa as conexões com ambos os bancos antes de sincronizar."""
@@ -724,107 +825,224 @@ def diagnosticar_banco_origem():
         if conn_origem:
             conn_origem.close()
 
-def carregar_dados_completos(usar_data_inicial=None):
-    """Carrega todos os dados disponíveis no banco."""
+def iniciar_journal_checkpoint():
+    """Começa um journal de checkpoint vazio (nova carga, sem retomada)."""
+    ARQUIVO_CHECKPOINT.parent.mkdir(parents=True, exist_ok=True)
+    ARQUIVO_CHECKPOINT.write_text('', encoding='utf-8')
+
+def registrar_checkpoint(checkpoint):
+    """Acrescenta um checkpoint ao journal logo após o commit de um lote.
+
+    O fsync garante que a linha sobreviva a uma queda da máquina; se a última
+    linha ficar truncada, ler_ultimo_checkpoint() usa a anterior.
+    """
+    with open(ARQUIVO_CHECKPOINT, 'a', encoding='utf-8') as arquivo:
+        arquivo.write(json.dumps(checkpoint, ensure_ascii=False) + '\n')
+        arquivo.flush()
+        os.fsync(arquivo.fileno())
+
+def ler_ultimo_checkpoint():
+    """Retorna o último checkpoint válido do journal, ou None se não houver."""
+    if not ARQUIVO_CHECKPOINT.exists():
+        return None
+
+    ultimo = None
+    with open(ARQUIVO_CHECKPOINT, encoding='utf-8') as arquivo:
+        for linha in arquivo:
+            if not linha.strip():
+                continue
+            try:
+                ultimo = json.loads(linha)
+            except json.JSONDecodeError:
+                break
+    return ultimo
+
+def estimar_linhas(cur_origem, query, parametros):
+    """Estimativa de linhas do planejador (EXPLAIN), sem executar a query."""
+    cur_origem.execute('EXPLAIN (FORMAT JSON) ' + query.strip().rstrip(';'), parametros)
+    plano = cur_origem.fetchone()[0]
+    return int(plano[0]['Plan']['Plan Rows'])
+
+def obter_inicio_origem(cur_origem, data_inicial=None, data_final=None, estacoes=None):
+    """Início da primeira janela de extração: data_inicial ou a leitura mais antiga.
+
+    Returns:
+        datetime | str | None: None quando não há leituras no período/estações
+    """
+    if data_inicial:
+        return data_inicial
+    query, parametros = query_carga(None, data_final, estacoes)
+    filtro = query[query.index('FROM'):query.index('ORDER BY')]
+    cur_origem.execute(f'SELECT MIN(el."horaLeitura") {filtro};', parametros)
+    return cur_origem.fetchone()[0]
+
+def carregar_dados_completos(usar_data_inicial=None, retomar=False, data_final=None,
+                             estacoes=None, tamanho_lote=TAMANHO_LOTE, confirmar=False,
+                             simular=False):
+    """Carrega todos os dados disponíveis no banco.
+
+    Após cada lote commitado grava um checkpoint em ARQUIVO_CHECKPOINT. Com
+    retomar=True, continua a partir do último checkpoint em vez de recomeçar.
+
+    Args:
+        usar_data_inicial: início inclusivo (None pergunta, ou usa tudo com confirmar)
+        retomar: continua a partir do último checkpoint do journal
+        data_final: fim exclusivo do período
+        estacoes: lista de estacao_id (None = todas)
+        tamanho_lote: registros por lote/commit
+        confirmar: não faz perguntas (equivale a responder "sim")
+        simular: só mostra o plano e a estimativa de linhas, sem gravar nada
+
+    Returns:
+        dict: resumo da execução (status, linhas, lotes, duração, filtros)
+    """
     conn_origem = None
     cur_origem = None
     conn_destino = None
     cur_destino = None
     
     timestamp_atual = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    inicio_execucao = time.time()
+    usar_data_inicial = interpretar_data(usar_data_inicial)
+    data_final = interpretar_data(data_final)
+    resumo = {
+        'modo': 'completo',
+        'status': 'erro',
+        'linhas': 0,
+        'lotes': 0,
+        'data_inicial': usar_data_inicial,
+        'data_final': data_final,
+        'estacoes': estacoes,
+        'tamanho_lote': tamanho_lote,
+        'retomado': False,
+    }
     
     try:
-        # Verificar se já existem dados
-        if not verificar_tabela_vazia():
-            resposta = input("\n⚠️  A tabela já contém dados. Deseja continuar mesmo assim? (s/N): ")
-            if resposta.lower() != 's':
-                print("❌ Operação cancelada pelo usuário.")
-                return 0
-        
-        # Executar diagnóstico primeiro
-        diagnostico = diagnosticar_banco_origem()
-        
-        if not diagnostico:
-            print("\n❌ Não foi possível executar o diagnóstico. Continuando mesmo assim...")
-        else:
-            if diagnostico['total_com_join'] == 0:
-                print("\n❌ ERRO: Não há dados disponíveis no banco de origem!")
-                print("   Verifique se as tabelas estão populadas corretamente.")
-                return 0
+        checkpoint = None
+        if retomar:
+            checkpoint = ler_ultimo_checkpoint()
+            if checkpoint:
+                print(f"\n📒 Checkpoint encontrado: lote {checkpoint['lote']}, "
+                      f"{checkpoint['linhas']:,} registros, último dia {checkpoint['ultimo_dia']} "
+                      f"(estação {checkpoint['ultima_estacao_id']})")
+            else:
+                print(f"\n⚠️  Nenhum checkpoint em {ARQUIVO_CHECKPOINT}. Iniciando carga do começo.")
+        
+        if checkpoint is None:
+            # Verificar se já existem dados
+            if not verificar_tabela_vazia():
+                if confirmar or simular:
+                    print("\n⚠️  A tabela já contém dados. Continuando (ON CONFLICT atualiza os existentes).")
+                else:
+                    resposta = input("\n⚠️  A tabela já contém dados. Deseja continuar mesmo assim? (s/N): ")
+                    if resposta.lower() != 's':
+                        print("❌ Operação cancelada pelo usuário.")
+                        resumo['status'] = 'cancelado'
+                        return resumo
+        
+            # Dry-run não roda o diagnóstico: os COUNT(*) na NIMBUS custam mais
+            # que o plano; a estimativa de linhas vem de estimar_linhas
+            if not simular:
+                # Executar diagnóstico primeiro
+                diagnostico = diagnosticar_banco_origem()
+
+                if not diagnostico:
+                    print("\n❌ Não foi possível executar o diagnóstico. Continuando mesmo assim...")
+                else:
+                    if diagnostico['total_com_join'] == 0:
+                        print("\n❌ ERRO: Não há dados disponíveis no banco de origem!")
+                        print("   Verifique se as tabelas estão populadas corretamente.")
+                        resumo['status'] = 'sem_dados'
+                        return resumo
             
-            # Perguntar se deseja usar todos os dados ou filtrar por data
-            if usar_data_inicial is None:
-                print(f"\n📋 Dados disponíveis:")
-                print(f"   • Data mínima: {diagnostico['data_min']}")
-                print(f"   • Data máxima: {diagnostico['data_max']}")
-                print(f"   • Total de registros: {diagnostico['total_com_join']:,}")
+                    # Perguntar se deseja usar todos os dados ou filtrar por data
+                    if usar_data_inicial is None and not (confirmar or data_final or estacoes):
+                        print(f"\n📋 Dados disponíveis:")
+                        print(f"   • Data mínima: {diagnostico['data_min']}")
+                        print(f"   • Data máxima: {diagnostico['data_max']}")
+                        print(f"   • Total de registros: {diagnostico['total_com_join']:,}")
                 
-                resposta = input("\n❓ Deseja buscar TODOS os dados disponíveis? (S/n): ")
-                if resposta.lower() == 'n':
-                    data_input = input("   Digite a data inicial (formato: YYYY-MM-DD) ou pressione Enter para usar a data mínima: ")
-                    if data_input.strip():
-                        usar_data_inicial = data_input.strip()
-                    else:
-                        usar_data_inicial = str(diagnostico['data_min'])[:10] if diagnostico['data_min'] else None
-                else:
-                    usar_data_inicial = None
+                        resposta = input("\n❓ Deseja buscar TODOS os dados disponíveis? (S/n): ")
+                        if resposta.lower() == 'n':
+                            data_input = input("   Digite a data inicial (formato: YYYY-MM-DD) ou pressione Enter para usar a data mínima: ")
+                            if data_input.strip():
+                                usar_data_inicial = interpretar_data(data_input)
+                            else:
+                                usar_data_inicial = interpretar_data(str(diagnostico['data_min'])[:10]) if diagnostico['data_min'] else None
+                        else:
+                            usar_data_inicial = None
         
         # Conectar ao banco origem
         conn_origem = psycopg2.connect(**ORIGEM)
         cur_origem = conn_origem.cursor()
         
         # Executar query apropriada
-        if usar_data_inicial:
-            print(f"\n🔄 Iniciando carga completa desde {usar_data_inicial}...")
-            query = query_dados_desde_data(usar_data_inicial)
+        apos_chave = None
+        if checkpoint:
+            # Retomada mantém os mesmos filtros da carga original
+            print(f"\n🔄 Retomando carga após o lote {checkpoint['lote']}...")
+            apos_chave = (checkpoint['ultimo_dia'], checkpoint['ultima_estacao_id'])
+            usar_data_inicial = interpretar_data(checkpoint.get('data_inicial'))
+            data_final = interpretar_data(checkpoint.get('data_final'))
+            estacoes = checkpoint.get('estacoes')
+            resumo.update(retomado=True, data_inicial=usar_data_inicial,
+                          data_final=data_final, estacoes=estacoes)
+        elif usar_data_inicial or data_final or estacoes:
+            print(f"\n🔄 Iniciando carga de {usar_data_inicial or 'início'} até {data_final or 'hoje'}"
+                  f"{f' (estações: {estacoes})' if estacoes else ''}...")
         else:
             print(f"\n🔄 Iniciando carga completa de TODOS os dados disponíveis...")
-            query = query_todos_dados()
+        
+        if simular:
+            query, parametros = query_carga(usar_data_inicial, data_final, estacoes, apos_chave)
+            linhas_estimadas = estimar_linhas(cur_origem, query, parametros)
+            print(f"\n🧪 Dry-run: nada será gravado.")
+            print(f"   • Linhas estimadas pelo planejador: {linhas_estimadas:,}")
+            print(f"   • Lotes estimados: {-(-linhas_estimadas // tamanho_lote):,} de {tamanho_lote:,} registros")
+            resumo.update(status='dry-run', linhas_estimadas=linhas_estimadas)
+            return resumo
         
         print(f"   Isso pode levar vários minutos dependendo do volume de dados...")
         print(f"   Por favor, aguarde...\n")
         
-        cur_origem.execute(query)
+        # Extração em janelas diárias com páginas por keyset: a NIMBUS ordena no
+        # máximo um dia por vez e o primeiro lote chega sem esperar o sort completo
+        cur_origem.execute("SET timezone = 'America/Sao_Paulo';")
+        inicio_extracao = obter_inicio_origem(cur_origem, usar_data_inicial, data_final, estacoes)
+        query, parametros = query_carga(usar_data_inicial, data_final, estacoes, com_janela=True)
+        registros = iter(()) if inicio_extracao is None else iterar_em_janelas(
+            conn_origem, query, parametros,
+            inicio=inicio_extracao, fim=data_final,
+            tamanho_pagina=tamanho_lote, indice_estacao=9, apos_chave=apos_chave
+        )
         
         # Processar em lotes para evitar problemas de memória
-        TAMANHO_LOTE = 10000
         total_inseridos = 0
-        lote_numero = 1
+        lote_numero = checkpoint['lote'] + 1 if checkpoint else 1
+        linhas_anteriores = checkpoint['linhas'] if checkpoint else 0
+        tempo_anterior = checkpoint['tempo_decorrido'] if checkpoint else 0.0
+        inicio_execucao = time.time()
+        if not checkpoint:
+            iniciar_journal_checkpoint()
+        print(f"📒 Checkpoints em: {ARQUIVO_CHECKPOINT}")
         
         # Conectar ao banco destino
         conn_destino = psycopg2.connect(**DESTINO)
         cur_destino = conn_destino.cursor()
 
-        # Usar ON CONFLICT DO UPDATE para garantir que os dados sejam sempre atualizados
-        # com os valores corretos do banco origem, mesmo se já existirem dados incorretos
         # A query já garante apenas um registro por (dia, estacao_id) usando DISTINCT ON
         # com ORDER BY id DESC (mais recente)
         # IMPORTANTE: O psycopg2 vai converter automaticamente timestamps com timezone
         # para o timezone do servidor antes de armazenar. Para evitar diferença de 3 horas,
         # precisamos garantir que o timestamp seja inserido com o timezone correto (-03:00)
         # e o PostgreSQL vai converter para o timezone do servidor mantendo o valor local.
-        insert_sql = '''
-        INSERT INTO pluviometricos
-        (dia, m05, m10, m15, h01, h04, h24, h96, estacao, estacao_id)
-        VALUES %s
-        ON CONFLICT (dia, estacao_id) 
-        DO UPDATE SET
-            m05 = EXCLUDED.m05,
-            m10 = EXCLUDED.m10,
-            m15 = EXCLUDED.m15,
-            h01 = EXCLUDED.h01,
-            h04 = EXCLUDED.h04,
-            h24 = EXCLUDED.h24,
-            h96 = EXCLUDED.h96,
-            estacao = EXCLUDED.estacao;
-        '''
         
         # Configurar timezone do banco destino para 'America/Sao_Paulo' durante a inserção
         # Isso garante que timestamps com timezone sejam convertidos corretamente
         cur_destino.execute("SET timezone = 'America/Sao_Paulo';")
         
         # Processar dados em lotes
-        print("📦 Processando dados em lotes de 10.000 registros...")
+        print(f"📦 Processando dados em lotes de {tamanho_lote:,} registros...")
         print("   💡 A query usa DISTINCT ON para garantir apenas um registro por (dia, estacao_id),")
         print("      mantendo o registro mais recente (maior ID), exatamente como no banco alertadb.\n")
         
@@ -832,7 +1050,7 @@ def carregar_dados_completos(usar_data_inicial=None):
         ultima_data = None
         
         while True:
-            dados = cur_origem.fetchmany(TAMANHO_LOTE)
+            dados = list(islice(registros, tamanho_lote))
             
             if not dados:
                 break
@@ -842,35 +1060,12 @@ def carregar_dados_completos(usar_data_inicial=None):
             # Quando o banco origem retorna timestamps com timezone:
             # - '2025-11-28 11:40:00.000 -0300' (horário padrão)
             # - '2019-02-16 23:45:00.000 -0200' (horário de verão)
-            # Precisamos preservar o timezone original para que o PostgreSQL converta corretamente
-            dados_ajustados = []
-            for registro in dados:
-                dia_original = registro[0]
-                
-                # Se já é datetime com timezone, manter como está (preserva -02:00 ou -03:00)
-                if isinstance(dia_original, datetime) and dia_original.tzinfo:
-                    dia_ajustado = dia_original
-                elif isinstance(dia_original, datetime):
-                    # Se é datetime sem timezone, converter para string e tentar parse novamente
-                    # para detectar se há timezone na representação original
-                    dia_ajustado = garantir_datetime_com_timezone(str(dia_original))
-                    # Se ainda não tem timezone após conversão, assumir -03:00 (padrão Brasília)
-                    if dia_ajustado.tzinfo is None:
-                        from datetime import timezone
-                        tz_brasilia = timezone(timedelta(hours=-3))
-                        dia_ajustado = dia_original.replace(tzinfo=tz_brasilia)
-                else:
-                    # Se é string ou outro tipo, converter mantendo timezone original (-02:00 ou -03:00)
-                    dia_ajustado = garantir_datetime_com_timezone(dia_original)
-                    # Se não tem timezone após conversão, adicionar -03:00 (padrão Brasília)
-                    if dia_ajustado.tzinfo is None:
-                        from datetime import timezone
-                        tz_brasilia = timezone(timedelta(hours=-3))
-                        dia_ajustado = dia_ajustado.replace(tzinfo=tz_brasilia)
-                
-                # Criar nova tupla com o timestamp ajustado (com timezone)
-                registro_ajustado = (dia_ajustado,) + registro[1:]
-                dados_ajustados.append(registro_ajustado)
+            # Precisamos preservar o timezone original para que o PostgreSQL converta corretamente.
+            # A coluna dia do lote inteiro é normalizada de uma vez (sem timezone, assume -03:00).
+            dias = formatar_timestamptz([registro[0] for registro in dados])
+            dados_ajustados = [
+                (dia,) + registro[1:] for dia, registro in zip(dias, dados)
+            ]
             
             # Log de debug para primeiro lote (apenas para verificação)
             if lote_numero == 1 and dados_ajustados:
@@ -878,10 +1073,7 @@ def carregar_dados_completos(usar_data_inicial=None):
                 dia_original = dados[0][0]
                 print(f'   🔍 Exemplo de timestamp processado:')
                 print(f'      Original: {dia_original} (tipo: {type(dia_original)})')
-                print(f'      Processado: {formatar_timestamp_nimbus(primeiro_registro[0])} (tipo: {type(primeiro_registro[0])})')
-                if hasattr(primeiro_registro[0], 'tzinfo') and primeiro_registro[0].tzinfo:
-                    offset = primeiro_registro[0].tzinfo.utcoffset(primeiro_registro[0])
-                    print(f'      Timezone offset: {offset}')
+                print(f'      Processado: {primeiro_registro[0]}')
             
             # Capturar primeira e última data do lote atual (após ajuste)
             data_inicio_lote = dados_ajustados[0][0] if dados_ajustados else None
@@ -892,10 +1084,25 @@ def carregar_dados_completos(usar_data_inicial=None):
                 primeira_data = data_inicio_lote
             ultima_data = data_fim_lote
             
-            execute_values(cur_destino, insert_sql, dados_ajustados)
+            execute_values(cur_destino, SQL_UPSERT_PLUVIOMETRICOS, dados_ajustados)
             conn_destino.commit()
             
             total_inseridos += len(dados)
+            ultimo_registro = dados[-1]
+            registrar_checkpoint({
+                'lote': lote_numero,
+                'ultimo_dia': ultimo_registro[0].isoformat() if isinstance(ultimo_registro[0], datetime) else str(ultimo_registro[0]),
+                'ultima_estacao_id': ultimo_registro[9],
+                'linhas': linhas_anteriores + total_inseridos,
+                'linhas_lote': len(dados),
+                'tempo_decorrido': round(tempo_anterior + time.time() - inicio_execucao, 3),
+                'data_inicial': _texto_data(usar_data_inicial),
+                'data_final': _texto_data(data_final),
+                'estacoes': estacoes,
+                'registrado_em': datetime.now().isoformat(timespec='seconds'),
+            })
+            resumo['linhas'] = total_inseridos
+            resumo['lotes'] += 1
             print(f'   📦 Lote {lote_numero}: {len(dados):,} registros processados (Total acumulado: {total_inseridos:,})')
             if data_inicio_lote and data_fim_lote:
                 print(f'      📅 Período deste lote: {data_inicio_lote} até {data_fim_lote}')
@@ -904,7 +1111,8 @@ def carregar_dados_completos(usar_data_inicial=None):
         if total_inseridos == 0:
             print(f'\n   ⚠️  Nenhum dado encontrado para inserir.')
             print(f'   💡 Verifique o diagnóstico acima para entender o problema.')
-            return 0
+            resumo['status'] = 'sem_dados'
+            return resumo
         
         # Obter estatísticas finais
         cur_destino.execute("SELECT COUNT(*) FROM pluviometricos;")
@@ -954,15 +1162,20 @@ def carregar_dados_completos(usar_data_inicial=None):
         
         print("\n💡 PRÓXIMO PASSO:")
         print("   Execute o script 'sincronizar_pluviometricos_novos.py' para manter")
-        print("   os dados atualizados em tempo real a cada 5 minutos.\n")
+        print("   os dados atualizados em tempo real a cada 5 minutos.")
+        avisar_recalculo_apos_carga()
         
-        return total_inseridos
+        resumo.update(status='ok', validacao_ok=validacao_ok,
+                      primeira_data=primeira_data, ultima_data=ultima_data)
+        return resumo
 
     except Exception as e:
         print(f'\n❌ Erro na carga: {e}')
-        return 0
+        resumo['erro'] = str(e)
+        return resumo
 
     finally:
+        resumo['duracao_segundos'] = round(time.time() - inicio_execucao, 3)
         if cur_origem:
             cur_origem.close()
         if conn_origem:
@@ -972,8 +1185,413 @@ def carregar_dados_completos(usar_data_inicial=None):
         if conn_destino:
             conn_destino.close()
 
+def avisar_recalculo_apos_carga():
+    """Lembra de recalcular os agregados do sync depois de uma carga/backfill.
+
+    A carga grava só em pluviometricos: o resumo por estação e
+    pluviometricos_rollup continuam sem os meses carregados, e o export
+    incremental só regrava meses cujo atualizado_em no rollup avançou.
+    """
+    print("\n💡 Se a tabela já tinha dados (backfill), recalcule os agregados e o export:")
+    print("   python scripts/servidor166/sincronizar_pluviometricos_novos.py --recalcular-estatisticas")
+    print("   python scripts/servidor166/exportar_pluviometricos_parquet.py --incremental")
+    print("   (o recálculo marca todos os meses no rollup, então o incremental regrava o dataset inteiro)\n")
+
+def garantir_tabela_particoes(cur_destino):
+    """Cria (se necessário) a tabela de controle da carga particionada."""
+    cur_destino.execute(f'''
+        CREATE TABLE IF NOT EXISTS {TABELA_PARTICOES} (
+            particao TEXT PRIMARY KEY,
+            modo TEXT NOT NULL,
+            inicio TIMESTAMPTZ NOT NULL,
+            fim TIMESTAMPTZ NOT NULL,
+            estacao_id INTEGER,
+            linhas BIGINT NOT NULL,
+            duracao_segundos NUMERIC,
+            concluida_em TIMESTAMPTZ NOT NULL DEFAULT NOW()
+        );
+    ''')
+
+def obter_particoes_concluidas(criar_tabela=True):
+    """Retorna {chave: fim} das partições já carregadas (fim = até onde foi carregada).
+
+    Args:
+        criar_tabela: cria TABELA_PARTICOES se não existir; com False (dry-run)
+            o banco destino não é alterado e a tabela ausente equivale a
+            nenhuma partição concluída
+    """
+    conn_destino = None
+    try:
+        conn_destino = psycopg2.connect(**DESTINO)
+        cur_destino = conn_destino.cursor()
+        cur_destino.execute("SELECT to_regclass(%s) IS NOT NULL;", (TABELA_PARTICOES,))
+        if not cur_destino.fetchone()[0]:
+            if not criar_tabela:
+                return {}
+            garantir_tabela_particoes(cur_destino)
+            conn_destino.commit()
+        cur_destino.execute(f"SELECT particao, fim FROM {TABELA_PARTICOES};")
+        return dict(cur_destino.fetchall())
+    finally:
+        if conn_destino:
+            conn_destino.close()
+
+def _chave_particao(modo, rotulo, inicio_recortado, fim_recortado, estacoes):
+    """Chave estável da partição; recortes e filtro de estações entram na chave."""
+    chave = f"{modo}:{rotulo}"
+    if inicio_recortado:
+        chave += f"@{_rotulo_data(inicio_recortado)}"
+    if fim_recortado:
+        chave += f"..{_rotulo_data(fim_recortado)}"
+    if estacoes and modo == 'mes':
+        chave += f"[{','.join(str(e) for e in sorted(estacoes))}]"
+    return chave
+
+def listar_particoes(modo='mes', data_inicial=None, data_final=None, estacoes=None):
+    """Divide o histórico do banco origem em partições.
+
+    Args:
+        modo: 'mes' (um mês civil de São Paulo por partição) ou 'estacao'
+            (da primeira à última leitura da estação no período; estações
+            sem leitura no período não viram partição)
+        data_inicial: opcional, início inclusivo; ignora leituras anteriores
+        data_final: opcional, fim exclusivo; ignora leituras a partir dele
+        estacoes: opcional, lista de estacao_id
+
+    Um período que chega ao presente (mês corrente, estação sem --until) não
+    tem fim fixo: o fim da carga é limitado ao NOW() da origem no momento da
+    listagem e esse corte é gravado em TABELA_PARTICOES. A próxima execução
+    continua a partir dele em vez de tratar a partição como concluída.
+
+    Returns:
+        list[dict]: partições com chave, inicio, fim (exclusivo, da extração),
+        corte (fim gravado ao concluir), estacao_id e estacoes
+    """
+    if modo not in MODOS_PARTICAO:
+        raise ValueError(f"Modo de partição inválido: {modo} (use {', '.join(MODOS_PARTICAO)})")
+
+    conn_origem = None
+    try:
+        conn_origem = psycopg2.connect(**ORIGEM)
+        cur_origem = conn_origem.cursor()
+        cur_origem.execute("SET timezone = 'America/Sao_Paulo';")
+        cur_origem.execute("SELECT NOW();")
+        agora = cur_origem.fetchone()[0]
+
+        condicoes = []
+        if data_inicial:
+            condicoes.append('"horaLeitura" >= %(data_inicial)s::timestamptz')
+        if data_final:
+            condicoes.append('"horaLeitura" < %(data_final)s::timestamptz')
+        filtro = f"WHERE {' AND '.join(condicoes)}" if condicoes else ''
+        cur_origem.execute(
+            f'SELECT MIN("horaLeitura"), MAX("horaLeitura") FROM public.estacoes_leitura {filtro};',
+            {'data_inicial': data_inicial, 'data_final': data_final}
+        )
+        data_min, data_max = cur_origem.fetchone()
+        if data_min is None:
+            return []
+
+        if modo == 'mes':
+            cur_origem.execute("""
+                SELECT inicio, inicio + INTERVAL '1 month'
+                FROM generate_series(
+                    date_trunc('month', %(data_min)s::timestamptz),
+                    %(data_max)s::timestamptz,
+                    INTERVAL '1 month'
+                ) AS inicio
+                ORDER BY inicio;
+            """, {'data_min': data_min, 'data_max': data_max})
+            meses = cur_origem.fetchall()
+            particoes = []
+            for numero, (inicio, fim) in enumerate(meses):
+                # --since/--until recortam apenas o primeiro e o último mês
+                recorte_inicio = data_inicial if numero == 0 and data_inicial else None
+                recorte_fim = data_final if numero == len(meses) - 1 and data_final else None
+                # Mês ainda aberto: carrega só até agora
+                fim_carga = min(recorte_fim or fim, agora)
+                particoes.append({
+                    'chave': _chave_particao('mes', f"{inicio:%Y-%m}", recorte_inicio, recorte_fim, estacoes),
+                    'inicio': recorte_inicio or inicio,
+                    'fim': fim_carga,
+                    'corte': fim_carga,
+                    'estacao_id': None,
+                    'estacoes': estacoes,
+                })
+            return particoes
+
+        # Uma partição por estação, limitada à primeira e à última leitura da
+        # própria estação: com o índice (estacao_id, "horaLeitura") são duas
+        # buscas por estação, e a carga não percorre anos sem leituras dela
+        condicoes_leitura = ''.join(f' AND l.{condicao}' for condicao in condicoes)
+        filtro_estacoes = 'WHERE e.id = ANY(%(estacoes)s)' if estacoes else ''
+        cur_origem.execute(f"""
+            SELECT e.id, primeira."horaLeitura", ultima."horaLeitura"
+            FROM public.estacoes_estacao AS e
+            CROSS JOIN LATERAL (
+                SELECT l."horaLeitura"
+                FROM public.estacoes_leitura AS l
+                WHERE l.estacao_id = e.id{condicoes_leitura}
+                ORDER BY l."horaLeitura" ASC
+                LIMIT 1
+            ) AS primeira
+            CROSS JOIN LATERAL (
+                SELECT l."horaLeitura"
+                FROM public.estacoes_leitura AS l
+                WHERE l.estacao_id = e.id{condicoes_leitura}
+                ORDER BY l."horaLeitura" DESC
+                LIMIT 1
+            ) AS ultima
+            {filtro_estacoes}
+            ORDER BY e.id;
+        """, {'data_inicial': data_inicial, 'data_final': data_final, 'estacoes': estacoes})
+        return [
+            {
+                'chave': _chave_particao('estacao', estacao_id, data_inicial, data_final, None),
+                'inicio': primeira_leitura,
+                'fim': ultima_leitura + timedelta(microseconds=1),
+                # Sem --until a estação pode voltar a ter leituras: fica carregada até agora
+                'corte': data_final or max(agora, ultima_leitura + timedelta(microseconds=1)),
+                'estacao_id': estacao_id,
+                'estacoes': [estacao_id],
+            }
+            for estacao_id, primeira_leitura, ultima_leitura in cur_origem.fetchall()
+        ]
+    finally:
+        if conn_origem:
+            conn_origem.close()
+
+def carregar_particao(particao, modo, tamanho_lote=TAMANHO_LOTE):
+    """Carrega uma partição com conexões próprias e um único commit.
+
+    Os dados e o registro em TABELA_PARTICOES são gravados na mesma transação:
+    ou a partição inteira fica carregada e marcada como concluída até
+    particao['corte'], ou nada muda e ela será refeita na próxima execução.
+    Com 'inicio_carga', continua uma partição carregada antes só até um corte
+    anterior.
+
+    Returns:
+        dict: chave, linhas, duracao e erro (None em caso de sucesso)
+    """
+    inicio_execucao = time.time()
+    conn_origem = None
+    conn_destino = None
+    total = 0
+
+    try:
+        conn_origem = psycopg2.connect(**ORIGEM)
+        conn_origem.cursor().execute("SET timezone = 'America/Sao_Paulo';")
+        conn_destino = psycopg2.connect(**DESTINO)
+        cur_destino = conn_destino.cursor()
+        cur_destino.execute("SET timezone = 'America/Sao_Paulo';")
+
+        inicio_carga = particao.get('inicio_carga', particao['inicio'])
+        query, parametros = query_carga(inicio_carga, particao['fim'], particao['estacoes'],
+                                        com_janela=True)
+
+        # Janelas (JANELA_EXTRACAO) paginadas por keyset: a partição é lida em
+        # blocos, sem materializar no cliente nem ordenar o período inteiro de uma vez
+        registros = iterar_em_janelas(
+            conn_origem, query, parametros,
+            inicio=inicio_carga, fim=particao['fim'], janela=JANELA_EXTRACAO[modo],
+            tamanho_pagina=tamanho_lote, indice_estacao=9
+        )
+        while True:
+            dados = list(islice(registros, tamanho_lote))
+            if not dados:
+                break
+            dias = formatar_timestamptz([registro[0] for registro in dados])
+            execute_values(
+                cur_destino,
+                SQL_UPSERT_PLUVIOMETRICOS,
+                [(dia,) + registro[1:] for dia, registro in zip(dias, dados)],
+                page_size=1000
+            )
+            total += len(dados)
+
+        duracao = time.time() - inicio_execucao
+        cur_destino.execute(f'''
+            INSERT INTO {TABELA_PARTICOES}
+                (particao, modo, inicio, fim, estacao_id, linhas, duracao_segundos)
+            VALUES (%s, %s, %s, %s, %s, %s, %s)
+            ON CONFLICT (particao) DO UPDATE SET
+                fim = EXCLUDED.fim,
+                linhas = {TABELA_PARTICOES}.linhas + EXCLUDED.linhas,
+                duracao_segundos = {TABELA_PARTICOES}.duracao_segundos + EXCLUDED.duracao_segundos,
+                concluida_em = NOW();
+        ''', (particao['chave'], modo, particao['inicio'], particao['corte'],
+              particao['estacao_id'], total, round(duracao, 3)))
+        conn_destino.commit()
+        return {'chave': particao['chave'], 'linhas': total, 'duracao': duracao, 'erro': None}
+
+    except Exception as e:
+        if conn_destino:
+            conn_destino.rollback()
+        return {'chave': particao['chave'], 'linhas': 0,
+                'duracao': time.time() - inicio_execucao, 'erro': str(e)}
+
+    finally:
+        if conn_origem:
+            conn_origem.close()
+        if conn_destino:
+            conn_destino.close()
+
+def carregar_particionado(modo='mes', workers=WORKERS_PADRAO, usar_data_inicial=None,
+                          data_final=None, estacoes=None, tamanho_lote=TAMANHO_LOTE,
+                          simular=False):
+    """Backfill paralelo: carrega as partições pendentes com um pool de workers.
+
+    Partições já registradas em TABELA_PARTICOES são puladas, então uma nova
+    execução após falha ou interrupção retoma apenas o que falta. Uma partição
+    registrada só até um corte anterior ao seu fim atual (mês que estava em
+    andamento) é continuada a partir desse corte.
+
+    Returns:
+        dict: resumo da execução (status, linhas, partições, falhas, duração)
+    """
+    inicio_execucao = time.time()
+    usar_data_inicial = interpretar_data(usar_data_inicial)
+    data_final = interpretar_data(data_final)
+    resumo = {
+        'modo': f'particionado_{modo}',
+        'status': 'ok',
+        'linhas': 0,
+        'workers': workers,
+        'data_inicial': usar_data_inicial,
+        'data_final': data_final,
+        'estacoes': estacoes,
+        'tamanho_lote': tamanho_lote,
+    }
+    print(f"\n🧩 Carga particionada por {modo} com {workers} worker(s)...")
+
+    particoes = listar_particoes(modo, usar_data_inicial, data_final, estacoes)
+    concluidas = obter_particoes_concluidas(criar_tabela=not simular)
+    pendentes = []
+    for particao in particoes:
+        carregada_ate = concluidas.get(particao['chave'])
+        if carregada_ate is None:
+            pendentes.append(particao)
+        elif carregada_ate < particao['fim']:
+            pendentes.append(dict(particao, inicio_carga=max(particao['inicio'], carregada_ate)))
+    continuadas = sum(1 for p in pendentes if 'inicio_carga' in p)
+    resumo.update(particoes=len(particoes), particoes_pendentes=len(pendentes))
+
+    print(f"   • Partições no período: {len(particoes):,}")
+    print(f"   • Já concluídas: {len(particoes) - len(pendentes):,}")
+    print(f"   • Pendentes: {len(pendentes):,} ({continuadas:,} continuando de um corte anterior)")
+
+    if simular:
+        print("\n🧪 Dry-run: nada será gravado. Partições pendentes:")
+        for particao in pendentes:
+            print(f"   • {particao['chave']}: {particao.get('inicio_carga', particao['inicio'])} → {particao['fim']}")
+        resumo.update(status='dry-run', pendentes=[p['chave'] for p in pendentes],
+                      duracao_segundos=round(time.time() - inicio_execucao, 3))
+        return resumo
+
+    if not pendentes:
+        print("\n✅ Nenhuma partição pendente. Carga já concluída.")
+        resumo['duracao_segundos'] = round(time.time() - inicio_execucao, 3)
+        return resumo
+
+    total_linhas = 0
+    falhas = []
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futuros = [executor.submit(carregar_particao, p, modo, tamanho_lote) for p in pendentes]
+        for numero, futuro in enumerate(as_completed(futuros), start=1):
+            resultado = futuro.result()
+            if resultado['erro']:
+                falhas.append(resultado)
+                print(f"   ❌ [{numero}/{len(pendentes)}] {resultado['chave']}: {resultado['erro']}")
+            else:
+                total_linhas += resultado['linhas']
+                print(f"   ✅ [{numero}/{len(pendentes)}] {resultado['chave']}: "
+                      f"{resultado['linhas']:,} registros em {resultado['duracao']:.1f}s")
+
+    duracao = time.time() - inicio_execucao
+    print("\n" + "=" * 70)
+    print("✅ CARGA PARTICIONADA FINALIZADA!" if not falhas else "⚠️  CARGA PARTICIONADA INCOMPLETA")
+    print("=" * 70)
+    print(f"📊 Registros carregados nesta execução: {total_linhas:,}")
+    print(f"🧩 Partições concluídas: {len(pendentes) - len(falhas):,} | com falha: {len(falhas):,}")
+    print(f"⏱️  Duração: {duracao:.1f}s")
+    if falhas:
+        print("💡 Execute novamente para retomar apenas as partições pendentes.")
+    print("=" * 70)
+    if total_linhas:
+        avisar_recalculo_apos_carga()
+
+    resumo.update(
+        status='ok' if not falhas else 'incompleto',
+        linhas=total_linhas,
+        particoes_concluidas=len(pendentes) - len(falhas),
+        falhas=[{'particao': f['chave'], 'erro': f['erro']} for f in falhas],
+        duracao_segundos=round(duracao, 3),
+    )
+    return resumo
+
+def _data_cli(valor):
+    """Converte datas da linha de comando (YYYY-MM-DD ou YYYY-MM-DD HH:MM:SS) com interpretar_data."""
+    try:
+        return interpretar_data(valor)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"data inválida: {valor} (use YYYY-MM-DD)")
+
+def _estacoes_cli(valor):
+    """Converte '1,5,22' em [1, 5, 22]."""
+    try:
+        return sorted({int(parte) for parte in valor.split(',') if parte.strip()})
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"lista de estações inválida: {valor} (use ex.: 1,5,22)")
+
+def criar_parser():
+    """Argumentos de linha de comando (execução não interativa: Prefect, cron, benchmarks)."""
+    parser = argparse.ArgumentParser(description='Carga inicial completa - dados pluviométricos')
+    parser.add_argument('--since', type=_data_cli,
+                        help='Data inicial inclusiva (YYYY-MM-DD). Padrão: início do histórico')
+    parser.add_argument('--until', type=_data_cli,
+                        help='Data final exclusiva (YYYY-MM-DD). Padrão: até a leitura mais recente')
+    parser.add_argument('--stations', type=_estacoes_cli,
+                        help='IDs de estações separados por vírgula (ex.: 1,5,22). Padrão: todas')
+    parser.add_argument(
+        '--particionar',
+        choices=MODOS_PARTICAO,
+        help='Backfill paralelo por mês ou por estação (retoma partições pendentes)'
+    )
+    parser.add_argument(
+        '--workers',
+        type=int,
+        help=f'Número de workers da carga particionada, exige --particionar (padrão: {WORKERS_PADRAO})'
+    )
+    parser.add_argument('--batch-size', type=int, default=TAMANHO_LOTE,
+                        help=f'Registros por lote (padrão: {TAMANHO_LOTE})')
+    parser.add_argument(
+        '--resume',
+        action='store_true',
+        help='Retoma a carga completa a partir do último checkpoint do journal'
+    )
+    parser.add_argument('--yes', '-y', action='store_true',
+                        help='Não faz perguntas (responde "sim" a todas as confirmações)')
+    parser.add_argument('--dry-run', action='store_true',
+                        help='Mostra o plano (linhas estimadas / partições pendentes) sem gravar nada')
+    return parser
+
 def main():
-    """Função principal que executa a carga inicial completa."""
+    """Função principal que executa a carga inicial completa.
+
+    Ao final imprime um resumo JSON em uma única linha (última linha da saída)
+    e encerra com código 1 se a carga falhou ou ficou incompleta.
+    """
+    parser = criar_parser()
+    args = parser.parse_args()
+    if args.resume and args.particionar:
+        parser.error('--resume vale para a carga completa; a carga particionada já retoma sozinha')
+    if args.workers is not None and not args.particionar:
+        parser.error('--workers vale só para a carga particionada (use com --particionar)')
+    if args.workers is None:
+        args.workers = WORKERS_PADRAO
+    if args.workers < 1 or args.batch_size < 1:
+        parser.error('--workers e --batch-size devem ser maiores que zero')
+
     print("=" * 70)
     print("🌧️ CARGA INICIAL COMPLETA - DADOS PLUVIOMÉTRICOS")
     print("=" * 70)
@@ -986,7 +1604,7 @@ def main():
     print("   ✅ Diagnosticar o banco de origem para verificar dados disponíveis")
     print("   ✅ Buscar TODOS os dados históricos disponíveis (sem filtro fixo)")
     print("   ✅ Criar a tabela pluviometricos se não existir")
-    print("   ✅ Processar em lotes de 10.000 registros")
+    print(f"   ✅ Processar em lotes de {args.batch_size:,} registros")
     print("   ✅ Mostrar progresso e estatísticas detalhadas durante a carga")
     print()
     print("⚠️  IMPORTANTE:")
@@ -998,15 +1616,29 @@ def main():
     # Testar conexões
     if not testar_conexoes():
         print("\n❌ Falha nos testes de conexão. Abortando...")
-        return
+        resumo = {'status': 'erro', 'erro': 'falha nos testes de conexão'}
+    else:
+        # Criar/verificar tabela (dry-run não altera o banco destino)
+        if not args.dry_run:
+            print("\n📋 Verificando estrutura do banco de dados...")
+            criar_tabela_pluviometricos()
 
-    # Criar/verificar tabela
-    print("\n📋 Verificando estrutura do banco de dados...")
-    criar_tabela_pluviometricos()
+        # Executar carga completa
+        if args.particionar:
+            resumo = carregar_particionado(
+                args.particionar, args.workers, args.since, args.until,
+                args.stations, args.batch_size, simular=args.dry_run
+            )
+        else:
+            resumo = carregar_dados_completos(
+                args.since, retomar=args.resume, data_final=args.until,
+                estacoes=args.stations, tamanho_lote=args.batch_size,
+                confirmar=args.yes, simular=args.dry_run
+            )
 
-    # Executar carga completa
-    carregar_dados_completos()
+    print(json.dumps(resumo, ensure_ascii=False, default=str))
+    if resumo['status'] in ('erro', 'incompleto'):
+        sys.exit(1)
 
 if __name__ == "__main__":
     main()
-
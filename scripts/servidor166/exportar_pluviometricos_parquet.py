@@ -25,6 +25,22 @@ para arquivos Parquet, mantendo a estrutura original das colunas.
 - estacao: nome da estação
 - estacao_id: ID da estação
 
+═══════════════════════════════════════════════════════════════════════════
+🗂️ DATASET PARTICIONADO (opções 4 e 5):
+═══════════════════════════════════════════════════════════════════════════
+exports/pluviometricos_dataset/ano=2024/mes=01/part-0.parquet
+exports/pluviometricos_dataset/ano=2024/mes=01/estacao_id=15/part-0.parquet
+
+exports/pluviometricos_dataset/_manifest.json  (arquivo → linhas, min/max de dia, sha256)
+
+Row groups ordenados por (dia, estacao_id) e com estatísticas min/max. Ex:
+    duckdb: SELECT * FROM read_parquet('exports/pluviometricos_dataset/**/*.parquet',
+            hive_partitioning = true) WHERE ano = 2024 AND mes = 1 AND estacao_id = 15
+
+Opção 6 / --incremental: regrava apenas os meses alterados desde o último export
+(linhas novas, atrasadas ou corrigidas; ver export_incremental)
+    python scripts/servidor166/exportar_pluviometricos_parquet.py --incremental
+
 ═══════════════════════════════════════════════════════════════════════════
 📦 DEPENDÊNCIAS:
 ═══════════════════════════════════════════════════════════════════════════
@@ -39,7 +55,12 @@ import pandas as pd
 from sqlalchemy import create_engine
 from pathlib import Path
 import os
-from datetime import datetime
+import sys
+import json
+import hashlib
+import shutil
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta
 from dotenv import load_dotenv
 from urllib.parse import quote
 import warnings
@@ -91,6 +112,43 @@ def get_config():
 
 ORIGEM, CONNECTION_STRING = get_config()
 
+# Colunas exportadas; NUMERIC vira float8 no SELECT (mesmo tipo que o pandas já gerava)
+EXPORT_COLUMNS = """
+    dia::timestamptz AS dia,
+    m05::float8 AS m05, m10::float8 AS m10, m15::float8 AS m15,
+    h01::float8 AS h01, h04::float8 AS h04, h24::float8 AS h24, h96::float8 AS h96,
+    estacao, estacao_id
+"""
+PARQUET_SCHEMA = pa.schema([
+    pa.field('dia', pa.timestamp('ns', tz='UTC')),
+    pa.field('m05', pa.float64()),
+    pa.field('m10', pa.float64()),
+    pa.field('m15', pa.float64()),
+    pa.field('h01', pa.float64()),
+    pa.field('h04', pa.float64()),
+    pa.field('h24', pa.float64()),
+    pa.field('h96', pa.float64()),
+    pa.field('estacao', pa.string()),
+    pa.field('estacao_id', pa.int32()),
+])
+# Linhas por fetch do cursor server-side = linhas por row group no Parquet
+CHUNK_SIZE = 100000
+# Anos exportados em paralelo (cada worker abre a própria conexão)
+YEAR_WORKERS = 4
+# Dataset particionado: nome do diretório e tamanho alvo dos row groups
+DATASET_DIRNAME = 'pluviometricos_dataset'
+ROW_GROUP_SIZE = 128000
+# ano/mes no horário local (mesmo critério dos relatórios por período)
+PARTITION_TIMEZONE = 'America/Sao_Paulo'
+# Manifesto do dataset: arquivo → linhas, min/max de dia e sha256
+MANIFEST_NAME = '_manifest.json'
+# Rollup mensal por estação mantido pelo sync do servidor 166: atualizado_em
+# marca os meses tocados em cada ciclo (linhas novas, atrasadas ou corrigidas)
+ROLLUP_TABLE = 'pluviometricos_rollup'
+# Folga ao comparar atualizado_em com o último export: um ciclo do sync que
+# começou antes do export e confirmou depois grava atualizado_em anterior a ele
+CHANGE_MARGIN = timedelta(minutes=15)
+
 def test_connection(config):
     """Testa conexão com o banco."""
     print("=" * 60)
@@ -159,141 +217,163 @@ def ensure_timestamptz(df):
             df['dia'] = df['dia'].dt.tz_convert('UTC')
     return df
 
-def save_parquet_with_timestamptz(df, fpath):
-    """Salva DataFrame em Parquet preservando timestamptz no dia."""
-    # Garantir tipo correto
+def to_arrow_table(df):
+    """Converte DataFrame para pa.Table no schema fixo PARQUET_SCHEMA.
+
+    O schema explícito garante que todos os chunks gerem o mesmo tipo de coluna
+    (ex: chunk com 'estacao' toda nula não vira pa.null()), requisito do
+    ParquetWriter para acrescentar row groups ao mesmo arquivo.
+    """
     df = ensure_timestamptz(df)
-    
-    # Converter para PyArrow com schema explícito para timestamptz
-    # build schema: force 'dia' as timestamptz UTC, infer others from numpy dtype
-    fields = []
-    for name in df.columns:
-        if name == 'dia':
-            fields.append(pa.field('dia', pa.timestamp('ns', tz='UTC')))
-        else:
-            # use numpy dtype inference
-            dtype = df[name].dtype
-            try:
-                arrow_type = pa.from_numpy_dtype(dtype)
-            except Exception:
-                arrow_type = None
-            if arrow_type is None:
-                # fallback to automatic inference via Table.from_pandas
-                fields.append(pa.field(name, pa.null()))
-            else:
-                fields.append(pa.field(name, arrow_type))
-    schema = pa.schema(fields)
-    
-    table = pa.Table.from_pandas(df, schema=schema)
-    pq.write_table(table, fpath, compression='snappy')
+    return pa.Table.from_pandas(df[PARQUET_SCHEMA.names], schema=PARQUET_SCHEMA, preserve_index=False)
 
 # ═══════════════════════════════════════════════════════════════════════════
 # FUNÇÕES DE EXPORTAÇÃO
 # ═══════════════════════════════════════════════════════════════════════════
 
-def export_by_year(engine, export_dir):
-    """Exporta dividindo por ano."""
+def stream_to_parquet(fpath, where='', params=None, chunk_size=CHUNK_SIZE,
+                      cursor_name='export_pluviometricos', verbose=True):
+    """Grava o resultado de SELECT ... FROM pluviometricos {where} em um Parquet.
+
+    Streaming: um cursor server-side entrega blocos de chunk_size linhas e
+    cada bloco vira um row group acrescentado pelo ParquetWriter. O arquivo
+    nunca é relido; tempo linear e memória limitada a um bloco. A saída vai
+    para um .tmp que só substitui fpath depois do footer escrito; sem linhas,
+    nenhum arquivo é criado.
+
+    Returns:
+        int: linhas gravadas
+    """
+    tmp_path = fpath.with_name(fpath.name + '.tmp')
+    total_rows = 0
+
+    conn = psycopg2.connect(**ORIGEM)
+    try:
+        conn.cursor().execute("SET timezone = 'UTC';")
+        with conn.cursor(name=cursor_name) as cur, \
+                pq.ParquetWriter(tmp_path, PARQUET_SCHEMA, compression='snappy') as writer:
+            cur.itersize = chunk_size
+            cur.execute(f"SELECT {EXPORT_COLUMNS} FROM pluviometricos {where} ORDER BY dia, estacao_id",
+                        params)
+            i = 0
+            while True:
+                rows = cur.fetchmany(chunk_size)
+                if not rows:
+                    break
+                i += 1
+                if verbose:
+                    print(f"  Chunk {i}: {len(rows):,} registros...", end=" ", flush=True)
+                writer.write_table(to_arrow_table(pd.DataFrame(rows, columns=PARQUET_SCHEMA.names)))
+                if verbose:
+                    print("✅")
+                total_rows += len(rows)
+        if total_rows:
+            os.replace(tmp_path, fpath)
+    finally:
+        conn.close()
+        if tmp_path.exists():
+            tmp_path.unlink()
+    return total_rows
+
+# Intervalo semiaberto de anos no horário local: dia >= 1º/jan de inicio e
+# dia < 1º/jan de fim. Comparar dia diretamente (sem EXTRACT) usa o índice
+# da chave primária (dia, estacao_id) em vez de varrer a tabela inteira.
+YEAR_RANGE_WHERE = """
+    WHERE dia >= make_timestamptz(%(ano_inicio)s, 1, 1, 0, 0, 0, %(tz)s)
+      AND dia < make_timestamptz(%(ano_fim)s, 1, 1, 0, 0, 0, %(tz)s)
+"""
+
+def year_range_params(year_start, year_end):
+    """Parâmetros de YEAR_RANGE_WHERE para os anos year_start..year_end (inclusivo)."""
+    return {'ano_inicio': year_start, 'ano_fim': year_end + 1, 'tz': PARTITION_TIMEZONE}
+
+def get_year_bounds():
+    """Primeiro e último ano com dados, via MIN/MAX(dia) (duas buscas no índice)."""
+    conn = psycopg2.connect(**ORIGEM)
+    try:
+        cur = conn.cursor()
+        cur.execute("""
+            SELECT EXTRACT(YEAR FROM MIN(dia) AT TIME ZONE %(tz)s)::int,
+                   EXTRACT(YEAR FROM MAX(dia) AT TIME ZONE %(tz)s)::int
+            FROM pluviometricos
+        """, {'tz': PARTITION_TIMEZONE})
+        return cur.fetchone()
+    finally:
+        conn.close()
+
+def export_year(export_dir, year):
+    """Exporta um ano para pluviometricos_{year}.parquet (executado no pool)."""
+    fpath = export_dir / f'pluviometricos_{year}.parquet'
+    rows = stream_to_parquet(fpath, YEAR_RANGE_WHERE, year_range_params(year, year),
+                             cursor_name=f'export_pluviometricos_{year}', verbose=False)
+    return year, fpath, rows
+
+def export_by_year(engine, export_dir, workers=YEAR_WORKERS):
+    """Exporta dividindo por ano, com até `workers` anos em paralelo."""
     print("\n" + "=" * 60)
     print("EXPORTANDO POR ANO")
     print("=" * 60)
     
-    years_df = pd.read_sql_query(
-        "SELECT DISTINCT EXTRACT(YEAR FROM dia)::INTEGER as ano FROM pluviometricos ORDER BY ano",
-        engine
-    )
-    years = years_df['ano'].tolist()
+    year_min, year_max = get_year_bounds()
+    if year_min is None:
+        print("\nnenhum dado encontrado")
+        return [], 0, 0
+    years = list(range(year_min, year_max + 1))
     
-    print(f"\n{len(years)} anos encontrados: {years}\n")
+    print(f"\n{len(years)} anos entre {year_min} e {year_max} ({workers} em paralelo)\n")
     
     files = []
     total_rows = 0
     total_size = 0
     
-    for year in years:
-        print(f"  {year}...", end=" ", flush=True)
-        
-        df = pd.read_sql_query(f"""
-            SELECT dia::timestamptz AS dia, m05, m10, m15, h01, h04, h24, h96, estacao, estacao_id
-            FROM pluviometricos
-            WHERE EXTRACT(YEAR FROM dia) = {year}
-            ORDER BY dia, estacao_id
-        """, engine)
-        
-        if df.empty:
-            print("sem dados")
-            continue
-        
-        fpath = export_dir / f'pluviometricos_{year}.parquet'
-        save_parquet_with_timestamptz(df, fpath)
-        
-        fsize = fpath.stat().st_size / (1024 * 1024)
-        files.append(fpath)
-        total_rows += len(df)
-        total_size += fsize
-        
-        print(f"✅ {len(df):,} registros ({fsize:.2f} MB)")
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(export_year, export_dir, year) for year in years]
+        for future in as_completed(futures):
+            year, fpath, rows = future.result()
+            if not rows:
+                print(f"  {year}... sem dados")
+                continue
+            fsize = fpath.stat().st_size / (1024 * 1024)
+            files.append(fpath)
+            total_rows += rows
+            total_size += fsize
+            print(f"  {year}... ✅ {rows:,} registros ({fsize:.2f} MB)")
     
-    return files, total_rows, total_size
+    return sorted(files), total_rows, total_size
 
 def export_interval(engine, export_dir, year_start, year_end):
     """Exporta intervalo de anos."""
     print("\n" + "=" * 60)
     print(f"EXPORTANDO {year_start} A {year_end}")
-    print("=" * 60)
+    print("=" * 60 + "\n")
     
     if year_start > year_end:
         raise ValueError("Ano inicial deve ser ≤ ano final")
     
-    print("\nLendo dados...", end=" ", flush=True)
-    df = pd.read_sql_query(f"""
-        SELECT dia::timestamptz AS dia, m05, m10, m15, h01, h04, h24, h96, estacao, estacao_id
-        FROM pluviometricos
-        WHERE EXTRACT(YEAR FROM dia) BETWEEN {year_start} AND {year_end}
-        ORDER BY dia, estacao_id
-    """, engine)
+    fpath = export_dir / f'pluviometricos_{year_start}_{year_end}.parquet'
+    rows = stream_to_parquet(fpath, YEAR_RANGE_WHERE, year_range_params(year_start, year_end))
     
-    if df.empty:
+    if not rows:
         print("nenhum dado encontrado")
         return [], 0, 0
     
-    print(f"✅ {len(df):,} registros")
-    
-    fpath = export_dir / f'pluviometricos_{year_start}_{year_end}.parquet'
-    print("Salvando...", end=" ", flush=True)
-    save_parquet_with_timestamptz(df, fpath)
-    
     fsize = fpath.stat().st_size / (1024 * 1024)
-    print(f"✅ {fsize:.2f} MB")
+    print(f"\n✅ {rows:,} registros ({fsize:.2f} MB)")
     
-    return [fpath], len(df), fsize
+    return [fpath], rows, fsize
 
-def export_all(engine, export_dir):
-    """Exporta todos os dados em um arquivo."""
+def export_all(engine, export_dir, chunk_size=CHUNK_SIZE):
+    """Exporta todos os dados em um arquivo (streaming, ver stream_to_parquet)."""
     print("\n" + "=" * 60)
     print("EXPORTANDO TODOS OS DADOS")
     print("=" * 60 + "\n")
     
     inicio = datetime.now()
     fpath = export_dir / 'pluviometricos_completo.parquet'
-    chunk_num = 1
-    total_rows = 0
-    
-    for i, chunk_df in enumerate(pd.read_sql_query("""
-        SELECT dia::timestamptz AS dia, m05, m10, m15, h01, h04, h24, h96, estacao, estacao_id
-        FROM pluviometricos ORDER BY dia, estacao_id
-    """, engine, chunksize=100000), 1):
-        
-        print(f"  Chunk {i}: {len(chunk_df):,} registros...", end=" ", flush=True)
-        
-        if i == 1:
-            save_parquet_with_timestamptz(chunk_df, fpath)
-        else:
-            df_old = pd.read_parquet(fpath)
-            df_combined = pd.concat([df_old, chunk_df], ignore_index=True)
-            save_parquet_with_timestamptz(df_combined, fpath)
-        
-        print("✅")
-        total_rows += len(chunk_df)
+    total_rows = stream_to_parquet(fpath, chunk_size=chunk_size)
+    if not total_rows:
+        print("nenhum dado encontrado")
+        return [], 0, 0
     
     elapsed = (datetime.now() - inicio).total_seconds()
     fsize = fpath.stat().st_size / (1024 * 1024)
@@ -304,6 +384,401 @@ def export_all(engine, export_dir):
     
     return [fpath], total_rows, fsize
 
+class PartitionedDatasetWriter:
+    """Escreve um dataset Parquet no layout Hive (ano=/mes=/[estacao_id=/]).
+
+    Recebe blocos já ordenados por (dia, estacao_id). Cada partição tem um
+    ParquetWriter próprio e um buffer de até ROW_GROUP_SIZE linhas, então os
+    row groups saem grandes mesmo quando um bloco se espalha por muitas
+    estações. Como os blocos chegam em ordem de dia, a mudança de mês fecha
+    todos os writers do mês anterior: a memória fica limitada aos buffers do
+    mês corrente.
+    """
+
+    def __init__(self, root, by_station=False, row_group_size=ROW_GROUP_SIZE):
+        self.root = Path(root)
+        self.by_station = by_station
+        self.row_group_size = row_group_size
+        self.sort_keys = [('dia', 'ascending')] if by_station else \
+            [('dia', 'ascending'), ('estacao_id', 'ascending')]
+        self.sorting_columns = pq.SortingColumn.from_ordering(PARQUET_SCHEMA, self.sort_keys)
+        self.files = []
+        self.file_stats = {}
+        self.total_rows = 0
+        self.source_time = None
+        self._month = None
+        self._writers = {}
+        self._buffers = {}
+
+    def _partition_dir(self, key):
+        parts = [f'ano={key[0]}', f'mes={key[1]:02d}']
+        if self.by_station:
+            parts.append(f'estacao_id={key[2]}')
+        return self.root.joinpath(*parts)
+
+    def _flush(self, key):
+        tables = self._buffers.pop(key, [])
+        if not tables:
+            return
+        fpath = self._partition_dir(key) / 'part-0.parquet'
+        if key not in self._writers:
+            fpath.parent.mkdir(parents=True, exist_ok=True)
+            self._writers[key] = pq.ParquetWriter(
+                fpath, PARQUET_SCHEMA, compression='snappy',
+                write_statistics=True, sorting_columns=self.sorting_columns
+            )
+            self.files.append(fpath)
+            self.file_stats[fpath] = {'rows': 0, 'dia_min': None, 'dia_max': None}
+        table = pa.concat_tables(tables)
+        self._writers[key].write_table(table, row_group_size=self.row_group_size)
+
+        # As linhas chegam ordenadas por dia: primeiro/último valor são min/max
+        stats = self.file_stats[fpath]
+        dias = table.column('dia')
+        stats['rows'] += table.num_rows
+        stats['dia_min'] = stats['dia_min'] or dias[0].as_py()
+        stats['dia_max'] = dias[-1].as_py()
+
+    def _close_all(self):
+        for key in list(self._buffers):
+            self._flush(key)
+        for writer in self._writers.values():
+            writer.close()
+        self._writers = {}
+
+    def write(self, df, anos, meses):
+        """Acrescenta um bloco (DataFrame no PARQUET_SCHEMA + ano/mes de cada linha)."""
+        keys = pd.DataFrame({'ano': anos, 'mes': meses})
+        if self.by_station:
+            keys['estacao_id'] = df['estacao_id'].to_numpy()
+        for key, idx in keys.groupby(list(keys.columns), sort=True).indices.items():
+            key = tuple(int(k) for k in key)
+            if key[:2] != self._month:
+                self._close_all()
+                self._month = key[:2]
+            # Dentro da partição as linhas já vêm ordenadas pela query
+            table = to_arrow_table(df.iloc[idx].reset_index(drop=True))
+            self._buffers.setdefault(key, []).append(table)
+            if sum(t.num_rows for t in self._buffers[key]) >= self.row_group_size:
+                self._flush(key)
+            self.total_rows += table.num_rows
+
+    def close(self):
+        self._close_all()
+
+def write_dataset(root, by_station=False, months=None, chunk_size=CHUNK_SIZE):
+    """Lê pluviometricos com cursor server-side e grava o dataset em root.
+
+    Args:
+        root: diretório de saída (layout Hive)
+        by_station: acrescenta o nível estacao_id=/
+        months: lista de (ano, mes) a exportar; None = tabela inteira.
+            Cada mês vira um intervalo semiaberto em dia (usa o índice)
+
+    Returns:
+        PartitionedDatasetWriter: já fechado, com files/file_stats/total_rows
+        e source_time (NOW() do banco no início da leitura)
+    """
+    writer = PartitionedDatasetWriter(root, by_station=by_station)
+    params = {'tz': PARTITION_TIMEZONE}
+    where = ''
+    if months is not None:
+        ranges = []
+        for n, (ano, mes) in enumerate(months):
+            params[f'ano{n}'], params[f'mes{n}'] = ano, mes
+            ranges.append(
+                f"(dia >= make_timestamptz(%(ano{n})s, %(mes{n})s, 1, 0, 0, 0, %(tz)s)"
+                f" AND dia < make_timestamptz(%(ano{n})s, %(mes{n})s, 1, 0, 0, 0, %(tz)s) + INTERVAL '1 month')"
+            )
+        where = 'WHERE ' + ' OR '.join(ranges)
+
+    conn = psycopg2.connect(**ORIGEM)
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SET timezone = 'UTC';")
+            cur.execute("SELECT NOW();")
+            writer.source_time = cur.fetchone()[0]
+        with conn.cursor(name='export_pluviometricos_dataset') as cur:
+            cur.itersize = chunk_size
+            cur.execute(f"""
+                SELECT {EXPORT_COLUMNS},
+                    EXTRACT(YEAR FROM dia AT TIME ZONE %(tz)s)::int AS ano,
+                    EXTRACT(MONTH FROM dia AT TIME ZONE %(tz)s)::int AS mes
+                FROM pluviometricos
+                {where}
+                ORDER BY dia, estacao_id
+            """, params)
+            i = 0
+            while True:
+                rows = cur.fetchmany(chunk_size)
+                if not rows:
+                    break
+                i += 1
+                print(f"  Chunk {i}: {len(rows):,} registros...", end=" ", flush=True)
+                chunk_df = pd.DataFrame(rows, columns=PARQUET_SCHEMA.names + ['ano', 'mes'])
+                writer.write(chunk_df[PARQUET_SCHEMA.names], chunk_df['ano'].to_numpy(),
+                             chunk_df['mes'].to_numpy())
+                print("✅")
+    finally:
+        writer.close()
+        conn.close()
+    return writer
+
+def file_sha256(fpath):
+    """sha256 do arquivo, lido em blocos de 1 MB."""
+    digest = hashlib.sha256()
+    with open(fpath, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def manifest_entries(writer, root):
+    """Entradas do manifesto (caminho relativo → linhas, min/max de dia, sha256)."""
+    return {
+        fpath.relative_to(root).as_posix(): {
+            'rows': stats['rows'],
+            'dia_min': stats['dia_min'].isoformat(),
+            'dia_max': stats['dia_max'].isoformat(),
+            'sha256': file_sha256(fpath),
+        }
+        for fpath, stats in writer.file_stats.items()
+    }
+
+def load_manifest(dataset_dir):
+    """Lê o manifesto do dataset (None se não existir)."""
+    fpath = dataset_dir / MANIFEST_NAME
+    if not fpath.exists():
+        return None
+    with open(fpath, encoding='utf-8') as f:
+        return json.load(f)
+
+def save_manifest(dataset_dir, by_station, files, source_time):
+    """Grava o manifesto de forma atômica; watermark = maior dia exportado.
+
+    source_time é o NOW() do banco antes da leitura: mudanças posteriores a ele
+    são as que o próximo export incremental precisa regravar.
+    """
+    manifest = {
+        'by_station': by_station,
+        'partition_timezone': PARTITION_TIMEZONE,
+        'watermark': max((e['dia_max'] for e in files.values()), default=None),
+        'source_time': source_time.isoformat(),
+        'updated_at': datetime.now().isoformat(timespec='seconds'),
+        'files': dict(sorted(files.items())),
+    }
+    tmp_path = dataset_dir / (MANIFEST_NAME + '.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, dataset_dir / MANIFEST_NAME)
+    return manifest
+
+def partition_month(rel_path):
+    """(ano, mes) de um caminho relativo do dataset (ano=2024/mes=01/...)."""
+    ano, mes = rel_path.split('/')[:2]
+    return int(ano.split('=')[1]), int(mes.split('=')[1])
+
+def swap_dataset(tmp_dir, dataset_dir):
+    """Troca dataset_dir pela versão completa (arquivos + manifesto) em tmp_dir.
+
+    O dataset atual vira .old antes do rename e só é removido depois; se o
+    processo morrer entre os dois renames, recover_dataset restaura o .old.
+    Em qualquer momento o manifesto descreve exatamente os arquivos ao lado dele.
+    """
+    old_dir = dataset_dir.with_name(dataset_dir.name + '.old')
+    if old_dir.exists():
+        shutil.rmtree(old_dir)
+    if dataset_dir.exists():
+        dataset_dir.rename(old_dir)
+    tmp_dir.rename(dataset_dir)
+    if old_dir.exists():
+        shutil.rmtree(old_dir)
+
+def recover_dataset(dataset_dir):
+    """Desfaz uma troca interrompida (restaura ou descarta o .old)."""
+    old_dir = dataset_dir.with_name(dataset_dir.name + '.old')
+    if not old_dir.exists():
+        return
+    if dataset_dir.exists():
+        shutil.rmtree(old_dir)
+    else:
+        print(f"⚠️  Troca interrompida: restaurando {old_dir.name}")
+        old_dir.rename(dataset_dir)
+
+def changed_months(cur, manifest):
+    """Meses (ano, mes) que mudaram no banco desde o export do manifesto.
+
+    - meses com dia > watermark (linhas novas)
+    - com o rollup do sync: meses com atualizado_em posterior ao source_time do
+      manifesto, o que inclui linhas atrasadas em meses antigos e correções
+      feitas pelo ON CONFLICT DO UPDATE
+    - sem o rollup (ou manifesto antigo, sem source_time): meses cujo total de
+      linhas ou maior dia no banco difere do manifesto (varre a tabela e não
+      enxerga correções de valor)
+
+    carregar_pluviometricos_historicos.py não mexe no rollup: meses antigos
+    carregados por ele só aparecem aqui depois de
+    sincronizar_pluviometricos_novos.py --recalcular-estatisticas, que regrava
+    o rollup inteiro (e portanto marca todos os meses).
+    """
+    params = {'tz': PARTITION_TIMEZONE, 'watermark': manifest['watermark']}
+    cur.execute("""
+        SELECT DISTINCT
+            EXTRACT(YEAR FROM dia AT TIME ZONE %(tz)s)::int AS ano,
+            EXTRACT(MONTH FROM dia AT TIME ZONE %(tz)s)::int AS mes
+        FROM pluviometricos
+        WHERE dia > COALESCE(%(watermark)s::timestamptz, '-infinity')
+    """, params)
+    months = {tuple(row) for row in cur.fetchall()}
+
+    cur.execute("SELECT to_regclass(%s) IS NOT NULL;", (ROLLUP_TABLE,))
+    if cur.fetchone()[0] and manifest.get('source_time'):
+        params['since'] = datetime.fromisoformat(manifest['source_time']) - CHANGE_MARGIN
+        cur.execute(f"""
+            SELECT DISTINCT
+                EXTRACT(YEAR FROM periodo AT TIME ZONE %(tz)s)::int AS ano,
+                EXTRACT(MONTH FROM periodo AT TIME ZONE %(tz)s)::int AS mes
+            FROM {ROLLUP_TABLE}
+            WHERE agregacao = 'mes' AND atualizado_em > %(since)s
+        """, params)
+        months.update(tuple(row) for row in cur.fetchall())
+        return sorted(months)
+
+    print(f"   ⚠️  {ROLLUP_TABLE} indisponível: comparando linhas/maior dia de cada mês com o manifesto")
+    exported = {}
+    for rel_path, entry in manifest['files'].items():
+        key = partition_month(rel_path)
+        dia_max = datetime.fromisoformat(entry['dia_max'])
+        if key in exported:
+            rows, previous_max = exported[key]
+            exported[key] = (rows + entry['rows'], max(previous_max, dia_max))
+        else:
+            exported[key] = (entry['rows'], dia_max)
+    cur.execute("""
+        SELECT
+            EXTRACT(YEAR FROM dia AT TIME ZONE %(tz)s)::int AS ano,
+            EXTRACT(MONTH FROM dia AT TIME ZONE %(tz)s)::int AS mes,
+            COUNT(*), MAX(dia)
+        FROM pluviometricos
+        GROUP BY 1, 2
+    """, params)
+    current = {(ano, mes): (rows, dia_max) for ano, mes, rows, dia_max in cur.fetchall()}
+    months.update(key for key in exported.keys() | current.keys() if exported.get(key) != current.get(key))
+    return sorted(months)
+
+def print_dataset_summary(inicio, dataset_dir, files, rows, fsize):
+    elapsed = (datetime.now() - inicio).total_seconds()
+    print(f"\n✅ Concluído em {elapsed:.0f}s")
+    print(f"   Registros: {rows:,}")
+    print(f"   Partições: {len(files):,}")
+    print(f"   Tamanho: {fsize:.2f} MB")
+    print(f"   Dataset: {dataset_dir}")
+
+def export_partitioned(engine, export_dir, by_station=False, chunk_size=CHUNK_SIZE):
+    """Exporta um dataset Parquet particionado (ano=/mes=/ e opcionalmente estacao_id=/).
+
+    Leitores como pyarrow.dataset e DuckDB (read_parquet com hive_partitioning)
+    descartam partições pelo caminho e row groups pelas estatísticas min/max,
+    então consultas por mês ou estação leem só uma fração dos bytes.
+    Grava também o manifesto usado pelo modo incremental.
+    """
+    print("\n" + "=" * 60)
+    print(f"EXPORTANDO DATASET PARTICIONADO (ano/mes{'/estacao_id' if by_station else ''})")
+    print("=" * 60 + "\n")
+
+    inicio = datetime.now()
+    dataset_dir = export_dir / DATASET_DIRNAME
+    recover_dataset(dataset_dir)
+    tmp_dir = export_dir / (DATASET_DIRNAME + '.tmp')
+    if tmp_dir.exists():
+        shutil.rmtree(tmp_dir)
+
+    try:
+        writer = write_dataset(tmp_dir, by_station=by_station, chunk_size=chunk_size)
+        tmp_dir.mkdir(parents=True, exist_ok=True)
+        save_manifest(tmp_dir, by_station, manifest_entries(writer, tmp_dir), writer.source_time)
+        # Troca o dataset antigo só depois que todos os arquivos foram fechados
+        swap_dataset(tmp_dir, dataset_dir)
+    finally:
+        if tmp_dir.exists():
+            shutil.rmtree(tmp_dir)
+
+    files = [dataset_dir / f.relative_to(tmp_dir) for f in writer.files]
+    fsize = sum(f.stat().st_size for f in files) / (1024 * 1024)
+    print_dataset_summary(inicio, dataset_dir, files, writer.total_rows, fsize)
+    return files, writer.total_rows, fsize
+
+def export_incremental(engine, export_dir, chunk_size=CHUNK_SIZE):
+    """Reescreve só os meses do dataset que mudaram desde o último export.
+
+    Os meses alterados vêm de changed_months (linhas novas, atrasadas ou
+    corrigidas). Eles são regravados inteiros em um diretório temporário; os
+    arquivos dos demais meses entram nele por hard link (sem cópia), junto com
+    o novo manifesto, e o diretório inteiro é trocado com o dataset atual
+    (swap_dataset). Sem manifesto, faz a exportação particionada completa.
+
+    Após um backfill com carregar_pluviometricos_historicos.py, rode antes
+    sincronizar_pluviometricos_novos.py --recalcular-estatisticas (ver
+    changed_months); sem isso os meses carregados não são regravados.
+    """
+    dataset_dir = export_dir / DATASET_DIRNAME
+    recover_dataset(dataset_dir)
+    manifest = load_manifest(dataset_dir)
+    if manifest is None:
+        print(f"\n⚠️  Manifesto não encontrado em {dataset_dir}: fazendo exportação completa")
+        return export_partitioned(engine, export_dir, chunk_size=chunk_size)
+
+    print("\n" + "=" * 60)
+    print("EXPORTAÇÃO INCREMENTAL DO DATASET")
+    print("=" * 60)
+    print(f"\n   Watermark: {manifest['watermark']}")
+    print(f"   Último export: {manifest.get('source_time') or manifest['updated_at']}")
+
+    inicio = datetime.now()
+    by_station = manifest['by_station']
+    conn = psycopg2.connect(**ORIGEM)
+    try:
+        cur = conn.cursor()
+        # Instante da detecção: mudanças a partir daqui ficam para o próximo export
+        cur.execute("SELECT NOW();")
+        source_time = cur.fetchone()[0]
+        months = changed_months(cur, manifest)
+    finally:
+        conn.close()
+
+    if not months:
+        print("   ✓ Nenhuma alteração desde o último export")
+        return [], 0, 0
+
+    print(f"   Meses a regravar: {', '.join(f'{ano}-{mes:02d}' for ano, mes in months)}\n")
+    tmp_dir = export_dir / (DATASET_DIRNAME + '.incremental.tmp')
+    if tmp_dir.exists():
+        shutil.rmtree(tmp_dir)
+
+    try:
+        writer = write_dataset(tmp_dir, by_station=by_station, months=months, chunk_size=chunk_size)
+
+        files = {k: v for k, v in manifest['files'].items() if partition_month(k) not in months}
+        for rel_path in files:
+            target = tmp_dir / rel_path
+            target.parent.mkdir(parents=True, exist_ok=True)
+            try:
+                os.link(dataset_dir / rel_path, target)
+            except OSError:
+                shutil.copy2(dataset_dir / rel_path, target)
+        files.update(manifest_entries(writer, tmp_dir))
+        tmp_dir.mkdir(parents=True, exist_ok=True)
+        manifest = save_manifest(tmp_dir, by_station, files, source_time)
+        swap_dataset(tmp_dir, dataset_dir)
+    finally:
+        if tmp_dir.exists():
+            shutil.rmtree(tmp_dir)
+
+    written = [dataset_dir / f.relative_to(tmp_dir) for f in writer.files]
+    fsize = sum(f.stat().st_size for f in written) / (1024 * 1024)
+    print_dataset_summary(inicio, dataset_dir, written, writer.total_rows, fsize)
+    print(f"   Novo watermark: {manifest['watermark']}")
+    return written, writer.total_rows, fsize
+
 # ═══════════════════════════════════════════════════════════════════════════
 # MAIN
 # ═══════════════════════════════════════════════════════════════════════════
@@ -331,8 +806,12 @@ def main():
     print("  1. Por ano (arquivo para cada ano)")
     print("  2. Arquivo único (todos os dados)")
     print("  3. Intervalo de anos")
+    print("  4. Dataset particionado (ano=/mes=/)")
+    print("  5. Dataset particionado por estação (ano=/mes=/estacao_id=/)")
+    print("  6. Incremental (regrava só os meses alterados do dataset)")
     
-    opt = input("\nEscolha (1-3): ").strip()
+    # --incremental pula o menu (execução agendada/noturna)
+    opt = '6' if '--incremental' in sys.argv[1:] else input("\nEscolha (1-6): ").strip()
     
     engine = create_engine(CONNECTION_STRING, pool_pre_ping=True)
     
@@ -350,6 +829,10 @@ def main():
                 except ValueError:
                     print("Digite anos válidos")
             files, rows, size = export_interval(engine, export_dir, y1, y2)
+        elif opt in ('4', '5'):
+            files, rows, size = export_partitioned(engine, export_dir, by_station=(opt == '5'))
+        elif opt == '6':
+            files, rows, size = export_incremental(engine, export_dir)
         else:
             files, rows, size = export_all(engine, export_dir)
         
@@ -361,10 +844,12 @@ def main():
             print(f"Arquivos: {len(files)}")
             print(f"Tamanho: {size:.2f} MB")
             print(f"\nArquivos criados:")
-            for f in files:
+            for f in files[:20]:
                 if f.exists():
                     sz = f.stat().st_size / (1024 * 1024)
-                    print(f"  • {f.name} ({sz:.2f} MB)")
+                    print(f"  • {f.relative_to(export_dir)} ({sz:.2f} MB)")
+            if len(files) > 20:
+                print(f"  ... e mais {len(files) - 20} arquivos")
             print("=" * 60)
         else:
             print("\n⚠️  Nenhum arquivo criado")
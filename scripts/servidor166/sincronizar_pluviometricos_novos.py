@@ -23,6 +23,7 @@ para o banco alertadb_cor (destino).
 ✅ Verifica novos dados a cada 5 minutos automaticamente (configurável)
 ✅ Executa em modo contínuo até ser interrompido (Ctrl+C)
 ✅ Usa ON CONFLICT DO UPDATE para atualizar dados existentes com valores corretos
+✅ Streaming: janelas diárias paginadas por keyset + COPY FROM STDIN (memória constante após longas paradas)
 ✅ Chave primária composta (dia, estacao_id) garante unicidade
 ✅ Atualiza dados existentes se houver mudanças no banco origem
 ✅ Garante que os dados no destino correspondam exatamente ao banco origem
@@ -56,11 +57,23 @@ para o banco alertadb_cor (destino).
 🔄 COMO FUNCIONA:
 ═══════════════════════════════════════════════════════════════════════════
 
-1. Busca o último timestamp sincronizado na tabela destino (MAX(dia))
-2. Consulta apenas registros com horaLeitura > último timestamp
-3. Insere novos registros usando ON CONFLICT DO UPDATE (atualiza se já existir)
-4. Aguarda 5 minutos (configurável) e repete o processo
-5. Continua indefinidamente até ser interrompido
+1. Lê o último dia sincronizado de cada estação na tabela sync_watermarks
+   (O(estações) linhas, sem agregar a tabela pluviometricos inteira)
+2. Consulta apenas registros com horaLeitura > último timestamp em janelas
+   diárias, cada uma paginada por keyset (horaLeitura, estacao_id): após
+   longas paradas a NIMBUS nunca ordena o backlog inteiro de uma vez
+3. Envia os blocos via COPY FROM STDIN para a tabela UNLOGGED
+   pluviometricos_sync_staging (memória constante, qualquer volume)
+4. Aplica tudo com um único INSERT ... SELECT ... ON CONFLICT DO UPDATE e,
+   na mesma transação, avança os watermarks das estações, o resumo por
+   estação pluviometricos_station_stats (lido pela API em /api/estacoes e
+   /api/stats), os rollups dia/semana/mes pluviometricos_rollup (lidos por
+   /api/periodo) e a última leitura de cada estação pluviometricos_ultima_leitura
+   (lida por /api/ultimos?modo=ultima_por_estacao). Após cargas históricas,
+   recalcule essas tabelas com:
+   python sincronizar_pluviometricos_novos.py --recalcular-estatisticas
+5. Aguarda 5 minutos (configurável) e repete o processo
+6. Continua indefinidamente até ser interrompido
 
 ═══════════════════════════════════════════════════════════════════════════
 🔒 PROTEÇÕES IMPLEMENTADAS:
@@ -71,6 +84,8 @@ para o banco alertadb_cor (destino).
 ✅ Validação: Verifica se tabela não está vazia antes de atualizar
 ✅ Validação: Verifica última sincronização antes de buscar novos dados
 ✅ Tratamento de erros: Continua rodando mesmo se houver falha temporária
+✅ Modo contínuo: uma conexão persistente por banco, validada a cada ciclo e
+   reaberta com backoff exponencial se cair (menos conexões abertas na NIMBUS)
 ✅ Atualiza dados existentes se houver mudanças no banco origem
 ✅ Garante que os dados no destino correspondam exatamente ao banco origem
 ✅ Adiciona novos registros e atualiza existentes quando necessário
@@ -105,11 +120,13 @@ Variáveis opcionais:
 # 🔧 Importar bibliotecas necessárias
 import psycopg2
 from psycopg2 import errors as psycopg2_errors
-from psycopg2.extras import execute_values
+import csv
+import io
 import time
 import os
 import re
 from datetime import datetime, timedelta
+from itertools import chain, islice
 from dotenv import load_dotenv
 
 # Carregar variáveis de ambiente (busca .env na raiz do projeto)
@@ -119,6 +136,11 @@ from pathlib import Path
 project_root = Path(__file__).parent.parent.parent
 load_dotenv(dotenv_path=project_root / '.env')
 
+# Normalização vetorizada de timestamps compartilhada com os demais loaders
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'comum'))
+from normalizacao_tempo import formatar_timestamptz
+from extracao_nimbus import MARCADOR_JANELA, filtro_incremental_estacoes, iterar_em_janelas
+
 def tornar_datetime_naive(dt):
     """
     Converte um datetime aware (com timezone) para naive (sem timezone).
@@ -186,9 +208,123 @@ def carregar_configuracoes():
 # Carregar configurações
 ORIGEM, DESTINO, INTERVALO_VERIFICACAO = carregar_configuracoes()
 
+# 📦 Streaming origem → destino
+# Quantidade de linhas buscadas por vez no cursor server-side da origem.
+# Também é o tamanho de cada bloco enviado ao COPY (memória fica limitada a um bloco).
+TAMANHO_LOTE_STREAM = 5000
+
+# Tabela UNLOGGED usada como área de staging do COPY (sem WAL, sem índices)
+TABELA_STAGING = 'pluviometricos_sync_staging'
+
+# Resumo por estação lido pela API (/api/estacoes, /api/stats) no lugar de
+# agregações sobre pluviometricos inteira; mantido incrementalmente a cada ciclo
+TABELA_ESTATISTICAS_ESTACOES = 'pluviometricos_station_stats'
+
+# Rollups por estação em dia/semana/mes (horário de SP) lidos por /api/periodo
+TABELA_ROLLUP = 'pluviometricos_rollup'
+COLUNAS_ROLLUP = ('m05', 'm15', 'h01', 'h04', 'h24', 'h96')
+FUSO_ROLLUP = 'America/Sao_Paulo'
+
+# Leitura mais recente de cada estação, lida por /api/ultimos?modo=ultima_por_estacao
+TABELA_ULTIMA_LEITURA = 'pluviometricos_ultima_leitura'
+
+COLUNAS_PLUVIOMETRICOS = ('dia', 'm05', 'm10', 'm15', 'h01', 'h04', 'h24', 'h96', 'estacao', 'estacao_id')
+
+# 🔌 Conexões persistentes (modo contínuo): reconexão com backoff exponencial
+RECONEXAO_TENTATIVAS = 5
+RECONEXAO_ESPERA_INICIAL = 2   # segundos
+RECONEXAO_ESPERA_MAXIMA = 60   # segundos
+
+class ConexaoPersistente:
+    """Conexão psycopg2 de longa duração reaproveitada entre ciclos.
+
+    Antes de cada uso a conexão é validada com SELECT 1. Se estiver quebrada
+    (servidor reiniciado, rede instável, timeout de ociosidade) ela é descartada
+    e reaberta com backoff exponencial, sem derrubar o loop de sincronização.
+    """
+
+    def __init__(self, config, nome, tentativas=RECONEXAO_TENTATIVAS,
+                 espera_inicial=RECONEXAO_ESPERA_INICIAL, espera_maxima=RECONEXAO_ESPERA_MAXIMA):
+        # Keepalives TCP evitam que firewalls derrubem a conexão ociosa entre ciclos
+        self.config = dict(config, keepalives=1, keepalives_idle=60,
+                           keepalives_interval=10, keepalives_count=5)
+        self.nome = nome
+        self.tentativas = tentativas
+        self.espera_inicial = espera_inicial
+        self.espera_maxima = espera_maxima
+        self.conn = None
+
+    def _saudavel(self):
+        if self.conn is None or self.conn.closed:
+            return False
+        try:
+            cur = self.conn.cursor()
+            cur.execute("SELECT 1;")
+            cur.fetchone()
+            cur.close()
+            self.conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def obter(self):
+        """Retorna a conexão ativa, reconectando (com backoff) se necessário."""
+        if self._saudavel():
+            return self.conn
+
+        reconectando = self.conn is not None
+        self.fechar()
+        espera = self.espera_inicial
+        for tentativa in range(1, self.tentativas + 1):
+            try:
+                self.conn = psycopg2.connect(**self.config)
+                if reconectando or tentativa > 1:
+                    print(f'   🔌 Conexão {self.nome} restabelecida (tentativa {tentativa})')
+                return self.conn
+            except psycopg2.OperationalError as e:
+                if tentativa == self.tentativas:
+                    raise
+                print(f'   ⚠️ Falha ao conectar em {self.nome} (tentativa {tentativa}/{self.tentativas}): {e}')
+                print(f'   ⏱️  Nova tentativa em {espera} segundos...')
+                time.sleep(espera)
+                espera = min(espera * 2, self.espera_maxima)
+
+    def fechar(self):
+        if self.conn is not None:
+            try:
+                self.conn.close()
+            except Exception:
+                pass
+        self.conn = None
+
+class ConexoesSincronizacao:
+    """Par de conexões persistentes (origem NIMBUS e destino servidor 166)."""
+
+    def __init__(self):
+        self.origem = ConexaoPersistente(ORIGEM, 'ORIGEM')
+        self.destino = ConexaoPersistente(DESTINO, 'DESTINO')
+
+    def fechar(self):
+        self.origem.fechar()
+        self.destino.fechar()
+
+# 🧭 Watermarks persistentes por estação (ponto de retomada da sincronização)
+TABELA_WATERMARKS = 'sync_watermarks'
+PIPELINE_WATERMARK = 'servidor166_pluviometricos'
+# Largura da busca principal (janelas diárias): vai do menor watermark até no
+# máximo este intervalo antes do maior. Estações com watermark mais antigo que o
+# início da busca principal têm o atraso buscado numa passada própria
+# (query_alertadb_incremental com apenas_atrasadas), que começa na primeira
+# leitura pendente delas (obter_primeiras_leituras_pendentes)
+JANELA_BUSCA_PRINCIPAL = timedelta(days=7)
+# Leituras com "horaLeitura" além de NOW() + TOLERANCIA_FUTURO (relógio da
+# estação errado) não são extraídas: só aparecem no aviso de leituras futuras.
+# Os watermarks nunca passam de NOW(), então não pulam as leituras reais
+TOLERANCIA_FUTURO = timedelta(minutes=10)
+
 # 🧱 Query incremental (busca apenas registros novos)
-def query_alertadb_incremental(ultima_sincronizacao):
-    """Retorna query para buscar apenas registros novos desde a última sincronização.
+def query_alertadb_incremental(ultima_sincronizacao, watermarks=None, apenas_atrasadas=False):
+    """Retorna (query, parâmetros) para buscar apenas registros novos.
     
     Usa DISTINCT ON para garantir apenas um registro por (dia, estacao_id),
     mantendo o registro com o maior ID (mais recente), que é exatamente como
@@ -197,29 +333,24 @@ def query_alertadb_incremental(ultima_sincronizacao):
     IMPORTANTE: A coluna horaLeitura no banco NIMBUS é TIMESTAMPTZ NOT NULL,
     preservando o timezone original. A query usa timestamptz para preservar
     o timezone corretamente.
-    """
-    # Formatar timestamp corretamente para PostgreSQL
-    # Se tem timezone, converter para string mantendo timezone
-    if isinstance(ultima_sincronizacao, datetime):
-        if ultima_sincronizacao.tzinfo:
-            # Converter para string com timezone para PostgreSQL
-            offset = ultima_sincronizacao.tzinfo.utcoffset(ultima_sincronizacao)
-            horas_offset = int(offset.total_seconds() / 3600)
-            minutos_offset = int((abs(offset.total_seconds()) % 3600) / 60)
-            timestamp_str = ultima_sincronizacao.strftime('%Y-%m-%d %H:%M:%S')
-            timestamp_str += f" {horas_offset:+03d}:{abs(minutos_offset):02d}"
-        else:
-            timestamp_str = ultima_sincronizacao.strftime('%Y-%m-%d %H:%M:%S')
-    else:
-        timestamp_str = str(ultima_sincronizacao)
-    
-    # Usar sempre timestamptz (coluna horaLeitura no NIMBUS é TIMESTAMPTZ NOT NULL)
-    # Se não tem timezone na string, assumir timezone do Brasil (-03:00)
-    if ':' not in timestamp_str or ('+' not in timestamp_str and '-' not in timestamp_str.split()[-1]):
-        # Sem timezone explícito, adicionar timezone do Brasil
-        timestamp_str += " -03:00"
     
-    return f"""
+    Se watermarks ({estacao_id: ultimo_dia}) for fornecido, cada estação é
+    filtrada só pelo próprio watermark (filtro_incremental_estacoes: JOIN com
+    unnest de arrays, parâmetros vinculados). Estações sem watermark entram com
+    o histórico completo, limitado pelas janelas a partir de
+    ultima_sincronizacao. Com apenas_atrasadas, só as estações de watermarks
+    entram (passada das estações atrasadas).
+
+    Leituras além de NOW() + TOLERANCIA_FUTURO ficam de fora.
+
+    O WHERE contém MARCADOR_JANELA: a query é executada por iterar_em_janelas.
+    """
+    join_watermarks, filtro, parametros = filtro_incremental_estacoes(
+        'el', ultima_sincronizacao, watermarks, incluir_novas=not apenas_atrasadas
+    )
+    parametros['tolerancia_futuro'] = TOLERANCIA_FUTURO
+
+    query = f"""
 SELECT DISTINCT ON (el."horaLeitura", el.estacao_id)
     el."horaLeitura" AS "Dia",  -- TIMESTAMPTZ NOT NULL (preserva timezone original)
     elc.m05,
@@ -235,10 +366,13 @@ FROM public.estacoes_leitura AS el
 JOIN public.estacoes_leiturachuva AS elc
     ON elc.leitura_id = el.id
 JOIN public.estacoes_estacao AS ee
-    ON ee.id = el.estacao_id
-WHERE el."horaLeitura" > '{timestamp_str}'::timestamptz
+    ON ee.id = el.estacao_id{join_watermarks}
+WHERE {filtro}
+  AND el."horaLeitura" <= NOW() + %(tolerancia_futuro)s
+  AND {MARCADOR_JANELA}
 ORDER BY el."horaLeitura" ASC, el.estacao_id ASC, el.id DESC;
 """
+    return query, parametros
 
 def testar_conexoes():
     """Testa as conexões com ambos os bancos antes de sincronizar."""
@@ -260,18 +394,39 @@ def testar_conexoes():
         print(f"   ❌ ERRO: {e}")
         return False
 
-def verificar_tabela_vazia():
+def liberar_conexao(conn, propria):
+    """Fecha a conexão se ela foi aberta pela própria função.
+
+    Conexões recebidas de fora (persistentes, modo contínuo) não são fechadas:
+    apenas a transação corrente é encerrada para devolvê-las limpas.
+    """
+    if conn is None:
+        return
+    try:
+        if propria:
+            conn.close()
+        else:
+            conn.rollback()
+    except Exception:
+        pass
+
+def verificar_tabela_vazia(conn_destino=None):
     """Verifica se a tabela pluviometricos está vazia.
     
     Tenta uma verificação rápida, mas se falhar, assume que não está vazia
     para não bloquear a sincronização. As coletas NÃO são perdidas mesmo se
     esta verificação falhar.
+    
+    Args:
+        conn_destino: conexão já aberta com o destino (opcional). Se None,
+                      abre e fecha uma conexão própria.
     """
-    conn_destino = None
+    propria = conn_destino is None
     cur_destino = None
     
     try:
-        conn_destino = psycopg2.connect(**DESTINO)
+        if propria:
+            conn_destino = psycopg2.connect(**DESTINO)
         cur_destino = conn_destino.cursor()
         
         # Tentar verificação rápida SEM timeout primeiro
@@ -302,14 +457,7 @@ def verificar_tabela_vazia():
                 cur_destino.close()
             except:
                 pass
-        if conn_destino:
-            try:
-                conn_destino.close()
-            except:
-                pass
-    
-    # Se chegou aqui, assumir que não está vazia para continuar
-    return False
+        liberar_conexao(conn_destino, propria)
 
 def garantir_datetime_com_timezone(valor):
     """
@@ -446,20 +594,93 @@ def formatar_timestamp_nimbus(dt):
     else:
         # Sem timezone, assumir -03:00 (padrão Brasil)
         timestamp_str += " -0300"
-    
+
     return timestamp_str
 
-def obter_ultima_sincronizacao():
+def garantir_tabela_staging(cur_destino):
+    """Cria (se necessário) e esvazia a tabela de staging do COPY.
+
+    A tabela é UNLOGGED e sem chave primária: o COPY grava sem WAL e sem
+    manutenção de índice. A unicidade é garantida no INSERT ... SELECT final
+    contra a tabela pluviometricos.
+    """
+    cur_destino.execute(f'''
+        CREATE UNLOGGED TABLE IF NOT EXISTS {TABELA_STAGING} (
+            dia TIMESTAMPTZ NOT NULL,
+            m05 NUMERIC,
+            m10 NUMERIC,
+            m15 NUMERIC,
+            h01 NUMERIC,
+            h04 NUMERIC,
+            h24 NUMERIC,
+            h96 NUMERIC,
+            estacao VARCHAR(255),
+            estacao_id INTEGER
+        );
+    ''')
+    cur_destino.execute(f'TRUNCATE {TABELA_STAGING};')
+
+def formatar_registros_copy(registros):
+    """Converte um bloco de linhas da origem para os campos do COPY (formato CSV).
+
+    A coluna dia é normalizada de uma vez (formatar_timestamptz) e enviada com
+    o offset de SP daquele instante (-02:00 ou -03:00); sem timezone, assume
+    -03:00. NULL é representado por \\N (ver opção NULL do COPY).
+    """
+    dias = formatar_timestamptz([registro[0] for registro in registros])
+    return [
+        [dia] + ['\\N' if valor is None else valor for valor in registro[1:]]
+        for dia, registro in zip(dias, registros)
+    ]
+
+class StreamCopyOrigem:
+    """Adapta um iterador de registros da origem ao protocolo file-like do COPY.
+
+    O psycopg2 chama read() repetidamente durante o copy_expert(); cada chamada
+    consome no máximo um bloco de TAMANHO_LOTE_STREAM registros do iterador. Assim a
+    memória usada fica constante, independente do tamanho do backlog.
+    """
+
+    def __init__(self, registros, tamanho_lote=TAMANHO_LOTE_STREAM):
+        self.registros = iter(registros)
+        self.tamanho_lote = tamanho_lote
+        self.total_linhas = 0
+        self._bloco = io.StringIO()
+        self._fim = False
+
+    def _carregar_proximo_bloco(self):
+        registros = list(islice(self.registros, self.tamanho_lote))
+        if not registros:
+            self._fim = True
+            self._bloco = io.StringIO()
+            return
+
+        saida = io.StringIO()
+        writer = csv.writer(saida, lineterminator='\n')
+        writer.writerows(formatar_registros_copy(registros))
+        self.total_linhas += len(registros)
+        saida.seek(0)
+        self._bloco = saida
+
+    def read(self, tamanho=-1):
+        while True:
+            dados = self._bloco.read(tamanho)
+            if dados or self._fim:
+                return dados
+            self._carregar_proximo_bloco()
+
+def obter_ultima_sincronizacao(conn_destino=None):
     """Obtém o timestamp da última leitura sincronizada do banco de destino.
     
     Se houver problemas de conexão ou timeout, retorna um timestamp recente
     para garantir que a sincronização continue e não perca coletas.
     """
-    conn_destino = None
+    propria = conn_destino is None
     cur_destino = None
     
     try:
-        conn_destino = psycopg2.connect(**DESTINO)
+        if propria:
+            conn_destino = psycopg2.connect(**DESTINO)
         cur_destino = conn_destino.cursor()
         
         # Usar ORDER BY com LIMIT é mais rápido que MAX() em algumas situações
@@ -499,21 +720,516 @@ def obter_ultima_sincronizacao():
     finally:
         if cur_destino:
             cur_destino.close()
+        liberar_conexao(conn_destino, propria)
+
+def garantir_tabela_watermarks(cur_destino):
+    """Cria a tabela sync_watermarks se ela não existir.
+
+    Uma linha por (pipeline, estacao_id) com o último dia sincronizado daquela
+    estação. Lida a cada ciclo no lugar de MAX(dia) sobre pluviometricos.
+    """
+    cur_destino.execute(f'''
+        CREATE TABLE IF NOT EXISTS {TABELA_WATERMARKS} (
+            pipeline VARCHAR(100) NOT NULL,
+            estacao_id INTEGER NOT NULL,
+            ultimo_dia TIMESTAMPTZ NOT NULL,
+            atualizado_em TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+            PRIMARY KEY (pipeline, estacao_id)
+        );
+    ''')
+
+def obter_watermarks_por_estacao(conn_destino=None):
+    """Obtém o último dia sincronizado POR estação da tabela sync_watermarks.
+
+    Na primeira execução (tabela ainda vazia para este pipeline) os watermarks
+    são inicializados uma única vez a partir de pluviometricos. O watermark é
+    a maior leitura que não está no futuro: uma linha com relógio adiantado não
+    leva o watermark além das leituras reais da estação. Watermarks gravados
+    no futuro (versões anteriores limitavam a NOW() + 1 hora) são corrigidos
+    da mesma forma.
+
+    Returns:
+        dict: {estacao_id: ultimo_dia} ou {} se não for possível obter
+    """
+    propria = conn_destino is None
+    cur_destino = None
+
+    try:
+        if propria:
+            conn_destino = psycopg2.connect(**DESTINO)
+        cur_destino = conn_destino.cursor()
+        garantir_tabela_watermarks(cur_destino)
+
+        consulta = f'''
+            SELECT estacao_id, ultimo_dia
+            FROM {TABELA_WATERMARKS}
+            WHERE pipeline = %s;
+        '''
+        cur_destino.execute(consulta, (PIPELINE_WATERMARK,))
+        resultados = cur_destino.fetchall()
+
+        if not resultados:
+            print('🧭 Inicializando watermarks por estação a partir de pluviometricos (apenas uma vez)...')
+            cur_destino.execute(f'''
+                INSERT INTO {TABELA_WATERMARKS} (pipeline, estacao_id, ultimo_dia)
+                SELECT %s, estacao_id, MAX(dia) FILTER (WHERE dia <= NOW())
+                FROM pluviometricos
+                WHERE estacao_id IS NOT NULL
+                GROUP BY estacao_id
+                HAVING MAX(dia) FILTER (WHERE dia <= NOW()) IS NOT NULL
+                ON CONFLICT (pipeline, estacao_id) DO NOTHING;
+            ''', (PIPELINE_WATERMARK,))
+            cur_destino.execute(consulta, (PIPELINE_WATERMARK,))
+            resultados = cur_destino.fetchall()
+        elif any(ultimo_dia > datetime.now(ultimo_dia.tzinfo) for _, ultimo_dia in resultados):
+            # Sem leitura real a estação perde o watermark e volta como estação nova
+            cur_destino.execute(f'''
+                WITH reais AS (
+                    SELECT w.estacao_id, (
+                        SELECT MAX(p.dia)
+                        FROM pluviometricos AS p
+                        WHERE p.estacao_id = w.estacao_id AND p.dia <= NOW()
+                    ) AS ultimo_dia
+                    FROM {TABELA_WATERMARKS} AS w
+                    WHERE w.pipeline = %(pipeline)s AND w.ultimo_dia > NOW()
+                ), removidas AS (
+                    DELETE FROM {TABELA_WATERMARKS} AS w
+                    USING reais AS r
+                    WHERE w.pipeline = %(pipeline)s AND w.estacao_id = r.estacao_id
+                      AND r.ultimo_dia IS NULL
+                    RETURNING w.estacao_id
+                ), corrigidas AS (
+                    UPDATE {TABELA_WATERMARKS} AS w
+                    SET ultimo_dia = r.ultimo_dia, atualizado_em = NOW()
+                    FROM reais AS r
+                    WHERE w.pipeline = %(pipeline)s AND w.estacao_id = r.estacao_id
+                      AND r.ultimo_dia IS NOT NULL
+                    RETURNING w.estacao_id
+                )
+                SELECT estacao_id FROM removidas
+                UNION ALL
+                SELECT estacao_id FROM corrigidas;
+            ''', {'pipeline': PIPELINE_WATERMARK})
+            corrigidas = sorted(linha[0] for linha in cur_destino.fetchall())
+            print(f'🧭 Watermarks no futuro corrigidos para a última leitura real: estações {corrigidas}')
+            cur_destino.execute(consulta, (PIPELINE_WATERMARK,))
+            resultados = cur_destino.fetchall()
+
+        conn_destino.commit()
+        return {estacao_id: ultimo_dia for estacao_id, ultimo_dia in resultados}
+
+    except Exception as e:
+        print(f'⚠️ Erro ao obter watermarks por estação: {e}')
+        print('   ✅ Usando última sincronização geral (MAX(dia))')
+        return {}
+    finally:
+        if cur_destino:
+            cur_destino.close()
+        liberar_conexao(conn_destino, propria)
+
+def obter_primeiras_leituras_pendentes(conn_origem, watermarks, limite):
+    """Primeira leitura de cada estação após o watermark e antes de limite.
+
+    Uma busca no índice (estacao_id, "horaLeitura") por estação; estações sem
+    leitura pendente (desativadas) ficam de fora.
+
+    Returns:
+        dict: {estacao_id: primeiro "horaLeitura" pendente}
+    """
+    with conn_origem.cursor() as cur:
+        cur.execute('''
+            SELECT w.estacao_id, proxima."horaLeitura"
+            FROM unnest(%(estacoes)s::int[], %(marcas)s::timestamptz[]) AS w(estacao_id, ultimo_dia)
+            CROSS JOIN LATERAL (
+                SELECT l."horaLeitura"
+                FROM public.estacoes_leitura AS l
+                WHERE l.estacao_id = w.estacao_id
+                  AND l."horaLeitura" > w.ultimo_dia
+                  AND l."horaLeitura" < %(limite)s
+                ORDER BY l."horaLeitura" ASC
+                LIMIT 1
+            ) AS proxima;
+        ''', {
+            'estacoes': list(watermarks.keys()),
+            'marcas': list(watermarks.values()),
+            'limite': limite,
+        })
+        return dict(cur.fetchall())
+
+def avisar_leituras_futuras(conn_origem):
+    """Avisa sobre leituras da NIMBUS além de NOW() + TOLERANCIA_FUTURO (não sincronizadas).
+
+    Usa o índice em "horaLeitura" (só a faixa à frente de NOW() é lida).
+
+    Returns:
+        int: total de leituras no futuro
+    """
+    with conn_origem.cursor() as cur:
+        cur.execute('''
+            SELECT estacao_id, COUNT(*), MAX("horaLeitura")
+            FROM public.estacoes_leitura
+            WHERE "horaLeitura" > NOW() + %s
+            GROUP BY estacao_id
+            ORDER BY estacao_id;
+        ''', (TOLERANCIA_FUTURO,))
+        estacoes = cur.fetchall()
+    for estacao_id, quantidade, maior in estacoes:
+        print(f'   ⏭️  Estação {estacao_id}: {quantidade:,} leitura(s) no futuro ignorada(s) '
+              f'(até {formatar_timestamp_nimbus(maior)}); verifique o relógio da estação')
+    return sum(quantidade for _, quantidade, _ in estacoes)
+
+def atualizar_watermarks(cur_destino):
+    """Avança os watermarks das estações presentes na staging.
+
+    Deve ser chamada na MESMA transação do INSERT ... SELECT em pluviometricos,
+    para que dados e ponto de retomada sejam confirmados juntos. Leituras dentro
+    da TOLERANCIA_FUTURO mas depois de NOW() não avançam o watermark (são
+    relidas no próximo ciclo).
+    """
+    cur_destino.execute(f'''
+        INSERT INTO {TABELA_WATERMARKS} (pipeline, estacao_id, ultimo_dia, atualizado_em)
+        SELECT %s, estacao_id, MAX(dia) FILTER (WHERE dia <= NOW()), NOW()
+        FROM {TABELA_STAGING}
+        WHERE estacao_id IS NOT NULL
+        GROUP BY estacao_id
+        HAVING MAX(dia) FILTER (WHERE dia <= NOW()) IS NOT NULL
+        ON CONFLICT (pipeline, estacao_id)
+        DO UPDATE SET
+            ultimo_dia = GREATEST({TABELA_WATERMARKS}.ultimo_dia, EXCLUDED.ultimo_dia),
+            atualizado_em = EXCLUDED.atualizado_em;
+    ''', (PIPELINE_WATERMARK,))
+
+def garantir_tabela_estatisticas(cur_destino):
+    """Cria a tabela de resumo por estação e a popula na primeira vez.
+
+    Guarda soma e contagem de h24 (não a média) para que o resumo possa ser
+    atualizado só com os deltas de cada ciclo; a média é soma / contagem.
+    """
+    cur_destino.execute(f'''
+        CREATE TABLE IF NOT EXISTS {TABELA_ESTATISTICAS_ESTACOES} (
+            estacao_id INTEGER PRIMARY KEY,
+            estacao VARCHAR(255),
+            total_registros BIGINT NOT NULL DEFAULT 0,
+            primeira_leitura TIMESTAMPTZ,
+            ultima_leitura TIMESTAMPTZ,
+            soma_h24 NUMERIC NOT NULL DEFAULT 0,
+            contagem_h24 BIGINT NOT NULL DEFAULT 0,
+            max_h24 NUMERIC,
+            atualizado_em TIMESTAMPTZ NOT NULL DEFAULT NOW()
+        );
+    ''')
+    cur_destino.execute(f'SELECT EXISTS (SELECT 1 FROM {TABELA_ESTATISTICAS_ESTACOES});')
+    if not cur_destino.fetchone()[0]:
+        print('📊 Calculando resumo por estação a partir de pluviometricos (apenas uma vez)...')
+        recalcular_estatisticas_estacoes(cur_destino)
+
+def recalcular_estatisticas_estacoes(cur_destino):
+    """Recalcula o resumo por estação inteiro a partir de pluviometricos.
+
+    Varre a tabela toda: usado na criação do resumo e após cargas feitas fora
+    da sincronização (ex: carregar_pluviometricos_historicos.py), via
+    --recalcular-estatisticas.
+    """
+    cur_destino.execute(f'TRUNCATE {TABELA_ESTATISTICAS_ESTACOES};')
+    cur_destino.execute(f'''
+        INSERT INTO {TABELA_ESTATISTICAS_ESTACOES}
+            (estacao_id, estacao, total_registros, primeira_leitura, ultima_leitura,
+             soma_h24, contagem_h24, max_h24, atualizado_em)
+        SELECT
+            estacao_id,
+            (ARRAY_AGG(estacao ORDER BY dia DESC))[1],
+            COUNT(*),
+            MIN(dia),
+            MAX(dia),
+            COALESCE(SUM(h24), 0),
+            COUNT(h24),
+            MAX(h24),
+            NOW()
+        FROM pluviometricos
+        WHERE estacao_id IS NOT NULL
+        GROUP BY estacao_id;
+    ''')
+
+def atualizar_estatisticas_estacoes(cur_destino):
+    """Aplica ao resumo por estação os deltas do lote que está na staging.
+
+    Deve ser chamada ANTES do INSERT ... SELECT em pluviometricos (e na mesma
+    transação): o LEFT JOIN com pluviometricos distingue linhas novas (somam
+    em total_registros) de atualizações (trocam o h24 antigo pelo novo em
+    soma_h24/contagem_h24). max_h24 só cresce; uma correção que reduza o
+    máximo de uma estação só aparece após --recalcular-estatisticas.
+    """
+    cur_destino.execute(f'''
+        WITH delta AS (
+            SELECT
+                s.estacao_id,
+                s.estacao,
+                s.dia,
+                p.dia IS NULL AS novo,
+                s.h24 AS h24_novo,
+                p.h24 AS h24_antigo
+            FROM {TABELA_STAGING} AS s
+            LEFT JOIN pluviometricos AS p
+                ON p.dia = s.dia AND p.estacao_id = s.estacao_id
+            WHERE s.estacao_id IS NOT NULL
+        )
+        INSERT INTO {TABELA_ESTATISTICAS_ESTACOES} AS st
+            (estacao_id, estacao, total_registros, primeira_leitura, ultima_leitura,
+             soma_h24, contagem_h24, max_h24, atualizado_em)
+        SELECT
+            estacao_id,
+            (ARRAY_AGG(estacao ORDER BY dia DESC))[1],
+            COUNT(*) FILTER (WHERE novo),
+            MIN(dia),
+            MAX(dia),
+            COALESCE(SUM(h24_novo), 0) - COALESCE(SUM(h24_antigo), 0),
+            COUNT(h24_novo) - COUNT(h24_antigo),
+            MAX(h24_novo),
+            NOW()
+        FROM delta
+        GROUP BY estacao_id
+        ON CONFLICT (estacao_id)
+        DO UPDATE SET
+            estacao = CASE WHEN EXCLUDED.ultima_leitura >= st.ultima_leitura
+                           THEN EXCLUDED.estacao ELSE st.estacao END,
+            total_registros = st.total_registros + EXCLUDED.total_registros,
+            primeira_leitura = LEAST(st.primeira_leitura, EXCLUDED.primeira_leitura),
+            ultima_leitura = GREATEST(st.ultima_leitura, EXCLUDED.ultima_leitura),
+            soma_h24 = st.soma_h24 + EXCLUDED.soma_h24,
+            contagem_h24 = st.contagem_h24 + EXCLUDED.contagem_h24,
+            max_h24 = GREATEST(st.max_h24, EXCLUDED.max_h24),
+            atualizado_em = EXCLUDED.atualizado_em;
+    ''')
+
+def _sql_agregados_rollup(sufixo_novo='', sufixo_antigo=None):
+    """Expressões SELECT de soma/contagem por coluna para o rollup.
+
+    Sem sufixo_antigo: agrega as colunas diretamente (recálculo completo).
+    Com sufixo_antigo: delta novo - antigo (linhas atualizadas trocam o valor).
+    """
+    expressoes = []
+    for coluna in COLUNAS_ROLLUP:
+        novo = f'{coluna}{sufixo_novo}'
+        if sufixo_antigo is None:
+            expressoes.append(f'COALESCE(SUM({novo}), 0)')
+            expressoes.append(f'COUNT({novo})')
+        else:
+            antigo = f'{coluna}{sufixo_antigo}'
+            expressoes.append(f'COALESCE(SUM({novo}), 0) - COALESCE(SUM({antigo}), 0)')
+            expressoes.append(f'COUNT({novo}) - COUNT({antigo})')
+    return ',\n            '.join(expressoes)
+
+def _colunas_rollup():
+    """Colunas de soma/contagem do rollup, na mesma ordem de _sql_agregados_rollup."""
+    return ', '.join(f'soma_{c}, contagem_{c}' for c in COLUNAS_ROLLUP)
+
+def _sql_inserir_rollup(origem, agregados, filtro_novo):
+    """INSERT ... SELECT no rollup para as três granularidades de uma vez."""
+    return f'''
+        INSERT INTO {TABELA_ROLLUP} AS r
+            (agregacao, periodo, estacao_id, estacao, total_leituras,
+             {_colunas_rollup()}, max_h24, atualizado_em)
+        SELECT
+            g.agregacao,
+            DATE_TRUNC(g.unidade, o.dia AT TIME ZONE '{FUSO_ROLLUP}') AT TIME ZONE '{FUSO_ROLLUP}',
+            o.estacao_id,
+            (ARRAY_AGG(o.estacao ORDER BY o.dia DESC))[1],
+            COUNT(*) FILTER (WHERE {filtro_novo}),
+            {agregados},
+            MAX(o.h24_rollup),
+            NOW()
+        FROM {origem} AS o
+        CROSS JOIN (VALUES ('dia', 'day'), ('semana', 'week'), ('mes', 'month')) AS g(agregacao, unidade)
+        GROUP BY 1, 2, 3
+    '''
+
+def garantir_tabela_rollup(cur_destino):
+    """Cria a tabela de rollups (dia/semana/mes por estação) e a popula na primeira vez.
+
+    Como no resumo por estação, guarda soma e contagem de cada coluna para
+    que as médias continuem exatas com atualizações incrementais.
+    """
+    colunas = ',\n            '.join(
+        f'soma_{c} NUMERIC NOT NULL DEFAULT 0,\n            contagem_{c} BIGINT NOT NULL DEFAULT 0'
+        for c in COLUNAS_ROLLUP
+    )
+    cur_destino.execute(f'''
+        CREATE TABLE IF NOT EXISTS {TABELA_ROLLUP} (
+            agregacao VARCHAR(10) NOT NULL,
+            periodo TIMESTAMPTZ NOT NULL,
+            estacao_id INTEGER NOT NULL,
+            estacao VARCHAR(255),
+            total_leituras BIGINT NOT NULL DEFAULT 0,
+            {colunas},
+            max_h24 NUMERIC,
+            atualizado_em TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+            PRIMARY KEY (agregacao, periodo, estacao_id)
+        );
+    ''')
+    cur_destino.execute(f'SELECT EXISTS (SELECT 1 FROM {TABELA_ROLLUP});')
+    if not cur_destino.fetchone()[0]:
+        print('📊 Calculando rollups dia/semana/mês a partir de pluviometricos (apenas uma vez)...')
+        recalcular_rollup(cur_destino)
+
+def recalcular_rollup(cur_destino):
+    """Recalcula todos os rollups a partir de pluviometricos (varre a tabela toda)."""
+    cur_destino.execute(f'TRUNCATE {TABELA_ROLLUP};')
+    origem = f'''(
+            SELECT dia, estacao_id, estacao, {', '.join(COLUNAS_ROLLUP)}, h24 AS h24_rollup
+            FROM pluviometricos
+            WHERE estacao_id IS NOT NULL
+        )'''
+    cur_destino.execute(_sql_inserir_rollup(origem, _sql_agregados_rollup(), 'TRUE') + ';')
+
+def atualizar_rollup(cur_destino):
+    """Aplica aos rollups os deltas do lote que está na staging.
+
+    Mesma regra de atualizar_estatisticas_estacoes: chamar ANTES do upsert em
+    pluviometricos, na mesma transação. max_h24 só cresce.
+    """
+    valores = ', '.join(
+        f's.{c} AS {c}_novo, p.{c} AS {c}_antigo' for c in COLUNAS_ROLLUP
+    )
+    origem = f'''(
+            SELECT
+                s.dia,
+                s.estacao_id,
+                s.estacao,
+                p.dia IS NULL AS novo,
+                {valores},
+                s.h24 AS h24_rollup
+            FROM {TABELA_STAGING} AS s
+            LEFT JOIN pluviometricos AS p
+                ON p.dia = s.dia AND p.estacao_id = s.estacao_id
+            WHERE s.estacao_id IS NOT NULL
+        )'''
+    atualizacoes = ',\n            '.join(
+        f'soma_{c} = r.soma_{c} + EXCLUDED.soma_{c},\n            '
+        f'contagem_{c} = r.contagem_{c} + EXCLUDED.contagem_{c}'
+        for c in COLUNAS_ROLLUP
+    )
+    cur_destino.execute(
+        _sql_inserir_rollup(origem, _sql_agregados_rollup('_novo', '_antigo'), 'novo') + f'''
+        ON CONFLICT (agregacao, periodo, estacao_id)
+        DO UPDATE SET
+            estacao = EXCLUDED.estacao,
+            total_leituras = r.total_leituras + EXCLUDED.total_leituras,
+            {atualizacoes},
+            max_h24 = GREATEST(r.max_h24, EXCLUDED.max_h24),
+            atualizado_em = EXCLUDED.atualizado_em;
+    ''')
+
+def garantir_tabela_ultima_leitura(cur_destino):
+    """Cria a tabela com a leitura mais recente de cada estação e a popula na primeira vez.
+
+    Uma linha por estação, lida por /api/ultimos?modo=ultima_por_estacao no
+    lugar de um DISTINCT ON sobre pluviometricos.
+    """
+    cur_destino.execute(f'''
+        CREATE TABLE IF NOT EXISTS {TABELA_ULTIMA_LEITURA} (
+            estacao_id INTEGER PRIMARY KEY,
+            estacao VARCHAR(255),
+            dia TIMESTAMPTZ NOT NULL,
+            m05 NUMERIC,
+            m10 NUMERIC,
+            m15 NUMERIC,
+            h01 NUMERIC,
+            h04 NUMERIC,
+            h24 NUMERIC,
+            h96 NUMERIC,
+            atualizado_em TIMESTAMPTZ NOT NULL DEFAULT NOW()
+        );
+    ''')
+    cur_destino.execute(f'SELECT EXISTS (SELECT 1 FROM {TABELA_ULTIMA_LEITURA});')
+    if not cur_destino.fetchone()[0]:
+        print('📍 Calculando última leitura por estação a partir de pluviometricos (apenas uma vez)...')
+        recalcular_ultima_leitura(cur_destino)
+
+def _sql_upsert_ultima_leitura(origem):
+    """INSERT da leitura mais recente por estação de `origem`, sem retroceder o que já existe."""
+    return f'''
+        INSERT INTO {TABELA_ULTIMA_LEITURA} AS u
+            (estacao_id, estacao, dia, m05, m10, m15, h01, h04, h24, h96, atualizado_em)
+        SELECT DISTINCT ON (estacao_id)
+            estacao_id, estacao, dia, m05, m10, m15, h01, h04, h24, h96, NOW()
+        FROM {origem}
+        WHERE estacao_id IS NOT NULL
+        ORDER BY estacao_id, dia DESC
+        ON CONFLICT (estacao_id)
+        DO UPDATE SET
+            estacao = EXCLUDED.estacao,
+            dia = EXCLUDED.dia,
+            m05 = EXCLUDED.m05,
+            m10 = EXCLUDED.m10,
+            m15 = EXCLUDED.m15,
+            h01 = EXCLUDED.h01,
+            h04 = EXCLUDED.h04,
+            h24 = EXCLUDED.h24,
+            h96 = EXCLUDED.h96,
+            atualizado_em = EXCLUDED.atualizado_em
+        WHERE EXCLUDED.dia >= u.dia;
+    '''
+
+def recalcular_ultima_leitura(cur_destino):
+    """Recalcula a última leitura de todas as estações a partir de pluviometricos."""
+    cur_destino.execute(f'TRUNCATE {TABELA_ULTIMA_LEITURA};')
+    cur_destino.execute(_sql_upsert_ultima_leitura('pluviometricos'))
+
+def atualizar_ultima_leitura(cur_destino):
+    """Avança a última leitura das estações presentes na staging.
+
+    Leituras mais antigas que a já registrada (reprocessamentos) não a
+    substituem; correções da própria última leitura (mesmo dia) sim.
+    """
+    cur_destino.execute(_sql_upsert_ultima_leitura(TABELA_STAGING))
+
+def executar_recalculo_estatisticas():
+    """Recalcula o resumo por estação, os rollups e a última leitura (--recalcular-estatisticas)."""
+    conn_destino = None
+    try:
+        conn_destino = psycopg2.connect(**DESTINO)
+        cur_destino = conn_destino.cursor()
+        print(f'📊 Recalculando {TABELA_ESTATISTICAS_ESTACOES} a partir de pluviometricos...')
+        garantir_tabela_estatisticas(cur_destino)
+        recalcular_estatisticas_estacoes(cur_destino)
+        print(f'📊 Recalculando {TABELA_ROLLUP} (dia/semana/mes)...')
+        garantir_tabela_rollup(cur_destino)
+        recalcular_rollup(cur_destino)
+        print(f'📍 Recalculando {TABELA_ULTIMA_LEITURA}...')
+        garantir_tabela_ultima_leitura(cur_destino)
+        recalcular_ultima_leitura(cur_destino)
+        conn_destino.commit()
+        cur_destino.execute(f'SELECT COUNT(*) FROM {TABELA_ESTATISTICAS_ESTACOES};')
+        print(f'   ✅ {cur_destino.fetchone()[0]:,} estações no resumo')
+        cur_destino.execute(f'SELECT agregacao, COUNT(*) FROM {TABELA_ROLLUP} GROUP BY agregacao;')
+        for agregacao, total in cur_destino.fetchall():
+            print(f'   ✅ {total:,} linhas de rollup por {agregacao}')
+        cur_destino.execute(f'SELECT COUNT(*) FROM {TABELA_ULTIMA_LEITURA};')
+        print(f'   ✅ {cur_destino.fetchone()[0]:,} estações com última leitura')
+    finally:
         if conn_destino:
             conn_destino.close()
 
-def atualizar_dados_incrementais():
-    """Atualiza apenas os novos dados desde a última sincronização."""
+def atualizar_dados_incrementais(conexoes=None):
+    """Atualiza apenas os novos dados desde a última sincronização.
+    
+    Args:
+        conexoes (ConexoesSincronizacao): conexões persistentes do modo contínuo.
+            Se None, abre uma conexão com cada banco e as fecha ao final.
+    """
     conn_origem = None
-    cur_origem = None
     conn_destino = None
     cur_destino = None
+    propria = conexoes is None
     
     timestamp_atual = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
     
     try:
+        # Uma única conexão com o destino por ciclo (reaproveitada em todas as etapas)
+        conn_destino = psycopg2.connect(**DESTINO) if propria else conexoes.destino.obter()
+
         # Verificar se a tabela está vazia
-        tabela_vazia = verificar_tabela_vazia()
+        tabela_vazia = verificar_tabela_vazia(conn_destino)
         
         if tabela_vazia:
             print(f'\n⚠️  ATENÇÃO: A tabela está VAZIA!')
@@ -522,8 +1238,25 @@ def atualizar_dados_incrementais():
             print(f'   Pulando esta verificação...\n')
             return 0
         
-        # Obter último timestamp sincronizado
-        ultima_sincronizacao = obter_ultima_sincronizacao()
+        # Obter último timestamp sincronizado por estação (sync_watermarks).
+        # Cada estação é filtrada pelo próprio watermark, então uma estação
+        # atrasada não faz as outras serem relidas e uma estação adiantada não
+        # faz as outras serem puladas. A busca principal começa no menor
+        # watermark, limitado a JANELA_BUSCA_PRINCIPAL antes do maior; estações
+        # com watermark anterior a esse início têm o atraso buscado à parte.
+        watermarks = obter_watermarks_por_estacao(conn_destino)
+        atrasadas = {}
+        if watermarks:
+            ultima_sincronizacao = max(
+                min(watermarks.values()),
+                max(watermarks.values()) - JANELA_BUSCA_PRINCIPAL
+            )
+            atrasadas = {
+                estacao_id: marca for estacao_id, marca in watermarks.items()
+                if marca < ultima_sincronizacao
+            }
+        else:
+            ultima_sincronizacao = obter_ultima_sincronizacao(conn_destino)
         
         # Validar que temos uma data válida
         # Comparar removendo timezone para compatibilidade
@@ -536,91 +1269,88 @@ def atualizar_dados_incrementais():
             print(f'   Pulando esta verificação...\n')
             return 0
         
-        # Conectar ao banco destino temporariamente para formatar timestamp
-        conn_destino_temp = psycopg2.connect(**DESTINO)
-        cur_destino_temp = conn_destino_temp.cursor()
-        cur_destino_temp.execute("""
-            SELECT TO_CHAR(%s::timestamptz, 'YYYY-MM-DD HH24:MI:SS.MS') || ' ' || 
-                   TO_CHAR(%s::timestamptz, 'TZH') || TO_CHAR(%s::timestamptz, 'TZM')
-        """, (ultima_sincronizacao, ultima_sincronizacao, ultima_sincronizacao))
-        timestamp_formatado = cur_destino_temp.fetchone()[0]
-        cur_destino_temp.close()
-        conn_destino_temp.close()
-        
-        # Conectar ao banco origem
-        conn_origem = psycopg2.connect(**ORIGEM)
-        cur_origem = conn_origem.cursor()
+        # Formatar timestamp no formato da NIMBUS (sem ida ao banco)
+        timestamp_formatado = formatar_timestamp_nimbus(ultima_sincronizacao)
         
+        conn_origem = psycopg2.connect(**ORIGEM) if propria else conexoes.origem.obter()
+
         # Buscar apenas registros novos desde a última sincronização
-        query = query_alertadb_incremental(ultima_sincronizacao)
+        query, parametros = query_alertadb_incremental(ultima_sincronizacao, watermarks)
         print(f'🔍 Verificando novos registros desde {timestamp_formatado}...')
-        
-        # Executar query
-        cur_origem.execute(query)
-        dados = cur_origem.fetchall()
+        avisar_leituras_futuras(conn_origem)
+        if watermarks:
+            print(f'   🧭 Watermarks por estação: {len(watermarks)} estações')
 
-        if not dados:
-            print(f'   ✓ Nenhum novo dado encontrado. [{timestamp_atual}]')
-            return 0
+        # Janelas diárias desde a última sincronização, cada uma em páginas de
+        # TAMANHO_LOTE_STREAM por keyset; a janela que alcança o NOW() fica aberta
+        registros = iterar_em_janelas(
+            conn_origem, query, parametros,
+            inicio=ultima_sincronizacao, fim=None,
+            tamanho_pagina=TAMANHO_LOTE_STREAM, indice_estacao=9
+        )
+
+        # Atraso das estações antigas: de cada watermark até o início da busca
+        # principal. Estações desativadas (sem leitura pendente) saem com uma
+        # busca no índice; as demais são lidas nas mesmas janelas diárias da
+        # busca principal, a partir da primeira leitura pendente entre elas
+        pendentes = obter_primeiras_leituras_pendentes(conn_origem, atrasadas, ultima_sincronizacao) if atrasadas else {}
+        if pendentes:
+            inicio_atrasadas = min(pendentes.values())
+            atrasadas = {estacao_id: atrasadas[estacao_id] for estacao_id in pendentes}
+            query_atrasadas, parametros_atrasadas = query_alertadb_incremental(
+                inicio_atrasadas, atrasadas, apenas_atrasadas=True
+            )
+            print(f'   ⏪ {len(atrasadas)} estações com leituras anteriores a {timestamp_formatado} '
+                  f'(desde {formatar_timestamp_nimbus(inicio_atrasadas)})')
+            registros = chain(
+                iterar_em_janelas(
+                    conn_origem, query_atrasadas, parametros_atrasadas,
+                    inicio=inicio_atrasadas, fim=ultima_sincronizacao,
+                    tamanho_pagina=TAMANHO_LOTE_STREAM, indice_estacao=9
+                ),
+                registros
+            )
 
-        # Conectar ao banco destino
-        conn_destino = psycopg2.connect(**DESTINO)
         cur_destino = conn_destino.cursor()
-        
+
         # Configurar timezone do banco destino para 'America/Sao_Paulo'
         # Isso garante que timestamps com timezone sejam convertidos corretamente
         cur_destino.execute("SET timezone = 'America/Sao_Paulo';")
 
-        # IMPORTANTE: Preparar timestamps mantendo timezone para inserção correta
-        # Formato dos dados: (dia, m05, m10, m15, h01, h04, h24, h96, estacao, estacao_id)
-        # Quando o banco origem retorna timestamps com timezone:
-        # - '2025-11-28 11:40:00.000 -0300' (horário padrão)
-        # - '2019-02-16 23:45:00.000 -0200' (horário de verão)
-        # Precisamos preservar o timezone original para que o PostgreSQL converta corretamente
-        # A coluna dia no servidor 166 é TIMESTAMPTZ NOT NULL, então preserva o timezone original
-        dados_ajustados = []
-        for registro in dados:
-            dia_original = registro[0]
-            
-            # Se já é datetime com timezone, manter como está (preserva -02:00 ou -03:00)
-            if isinstance(dia_original, datetime) and dia_original.tzinfo:
-                dia_ajustado = dia_original
-            elif isinstance(dia_original, datetime):
-                # Se é datetime sem timezone, converter para string e tentar parse novamente
-                # para detectar se há timezone na representação original
-                dia_ajustado = garantir_datetime_com_timezone(str(dia_original))
-                # Se ainda não tem timezone após conversão, assumir -03:00 (padrão Brasília)
-                if dia_ajustado.tzinfo is None:
-                    from datetime import timezone
-                    tz_brasilia = timezone(timedelta(hours=-3))
-                    dia_ajustado = dia_original.replace(tzinfo=tz_brasilia)
-            else:
-                # Se é string ou outro tipo, converter mantendo timezone original (-02:00 ou -03:00)
-                dia_ajustado = garantir_datetime_com_timezone(dia_original)
-                # Se não tem timezone após conversão, adicionar -03:00 (padrão Brasília)
-                if dia_ajustado.tzinfo is None:
-                    from datetime import timezone
-                    tz_brasilia = timezone(timedelta(hours=-3))
-                    dia_ajustado = dia_ajustado.replace(tzinfo=tz_brasilia)
-            
-            # Criar nova tupla com o timestamp ajustado (com timezone)
-            registro_ajustado = (dia_ajustado,) + registro[1:]
-            dados_ajustados.append(registro_ajustado)
+        # 1) COPY FROM STDIN: origem → staging, bloco a bloco (memória constante)
+        # O timestamp vai com o offset original (-02:00 ou -03:00), então a coluna
+        # TIMESTAMPTZ do servidor 166 recebe exatamente o mesmo instante da NIMBUS
+        garantir_tabela_staging(cur_destino)
+        stream = StreamCopyOrigem(registros)
+        cur_destino.copy_expert(
+            f"COPY {TABELA_STAGING} ({', '.join(COLUNAS_PLUVIOMETRICOS)}) "
+            f"FROM STDIN WITH (FORMAT csv, NULL '\\N')",
+            stream
+        )
 
+        if stream.total_linhas == 0:
+            conn_destino.rollback()
+            print(f'   ✓ Nenhum novo dado encontrado. [{timestamp_atual}]')
+            return 0
+
+        # 2) Resumo por estação e rollups: os deltas dependem dos valores ainda
+        # não sobrescritos, então são aplicados antes do upsert
+        garantir_tabela_estatisticas(cur_destino)
+        atualizar_estatisticas_estacoes(cur_destino)
+        garantir_tabela_rollup(cur_destino)
+        atualizar_rollup(cur_destino)
+
+        # 3) Um único INSERT ... SELECT set-based da staging para pluviometricos
         # ⚠️ IMPORTANTE: ON CONFLICT DO UPDATE para garantir que os dados sejam sempre atualizados
         # com os valores corretos do banco origem, mesmo se já existirem dados incorretos
         # A query já garante apenas um registro por (dia, estacao_id) usando DISTINCT ON
         # com ORDER BY id DESC (mais recente)
-        # IMPORTANTE: O psycopg2 vai converter automaticamente timestamps com timezone
-        # para o timezone do servidor antes de armazenar. Para evitar diferença de horas,
-        # precisamos garantir que o timestamp seja inserido com o timezone correto (-03:00)
-        # e o PostgreSQL vai converter para o timezone do servidor mantendo o valor local.
-        # A coluna dia no servidor 166 é TIMESTAMPTZ NOT NULL, então preserva o timezone original
-        insert_sql = '''
+        insert_sql = f'''
         INSERT INTO pluviometricos
         (dia, m05, m10, m15, h01, h04, h24, h96, estacao, estacao_id)
-        VALUES %s
-        ON CONFLICT (dia, estacao_id) 
+        SELECT dia, m05, m10, m15, h01, h04, h24, h96, estacao, estacao_id
+        FROM {TABELA_STAGING}
+        ON CONFLICT (dia, estacao_id)
         DO UPDATE SET
             m05 = EXCLUDED.m05,
             m10 = EXCLUDED.m10,
@@ -631,21 +1361,26 @@ def atualizar_dados_incrementais():
             h96 = EXCLUDED.h96,
             estacao = EXCLUDED.estacao;
         '''
+        cur_destino.execute(insert_sql)
+
+        # 4) Watermarks e última leitura por estação na mesma transação do upsert
+        garantir_tabela_watermarks(cur_destino)
+        atualizar_watermarks(cur_destino)
+        garantir_tabela_ultima_leitura(cur_destino)
+        atualizar_ultima_leitura(cur_destino)
 
-        # Inserir dados ajustados (ON CONFLICT DO UPDATE atualiza dados existentes com valores corretos)
-        execute_values(cur_destino, insert_sql, dados_ajustados)
-        conn_destino.commit()
-        
-        total_inseridos = len(dados)
-        
         # Obter o último timestamp sincronizado para exibir (já formatado como string no formato NIMBUS)
         # Formato: 2025-12-12 16:35:00.000 -0300 (sem dois pontos no timezone)
-        cur_destino.execute("""
-            SELECT TO_CHAR(MAX(dia), 'YYYY-MM-DD HH24:MI:SS.MS') || ' ' || 
+        # Lido da staging (apenas o lote atual), sem agregar a tabela pluviometricos inteira
+        cur_destino.execute(f"""
+            SELECT TO_CHAR(MAX(dia), 'YYYY-MM-DD HH24:MI:SS.MS') || ' ' ||
                    TO_CHAR(MAX(dia), 'TZH') || TO_CHAR(MAX(dia), 'TZM')
-            FROM pluviometricos;
+            FROM {TABELA_STAGING};
         """)
         ultimo_timestamp = cur_destino.fetchone()
+        conn_destino.commit()
+
+        total_inseridos = stream.total_linhas
         ultimo_ts_str = ""
         if ultimo_timestamp and ultimo_timestamp[0]:
             # Já vem formatado do PostgreSQL no formato da NIMBUS: 2025-12-12 16:35:00.000 -0300
@@ -660,14 +1395,15 @@ def atualizar_dados_incrementais():
         return 0
 
     finally:
-        if cur_origem:
-            cur_origem.close()
-        if conn_origem:
-            conn_origem.close()
+        # Conexões persistentes não são fechadas: apenas a transação é encerrada,
+        # para não deixar sessões "idle in transaction" na NIMBUS entre ciclos
+        liberar_conexao(conn_origem, propria)
         if cur_destino:
-            cur_destino.close()
-        if conn_destino:
-            conn_destino.close()
+            try:
+                cur_destino.close()
+            except Exception:
+                pass
+        liberar_conexao(conn_destino, propria)
 
 def executar_sincronizacao_unica():
     """
@@ -736,10 +1472,12 @@ def main(modo_continuo=True):
         print("-" * 60)
         
         total_atualizado = 0
+        # Conexões mantidas abertas entre os ciclos (validadas antes de cada uso)
+        conexoes = ConexoesSincronizacao()
         
         try:
             while True:
-                registros = atualizar_dados_incrementais()
+                registros = atualizar_dados_incrementais(conexoes)
                 total_atualizado += registros
                 
                 # Aguardar próximo ciclo
@@ -754,6 +1492,8 @@ def main(modo_continuo=True):
         except Exception as e:
             print(f"\n❌ Erro fatal: {e}")
             print("Encerrando programa...")
+        finally:
+            conexoes.fechar()
     else:
         # Executar uma única sincronização
         print(f"\n🚀 Executando sincronização única...\n")
@@ -773,5 +1513,8 @@ if __name__ == "__main__":
     import sys
     # Verificar se foi passado argumento --once para execução única
     modo_continuo = "--once" not in sys.argv
-    main(modo_continuo=modo_continuo)
+    if "--recalcular-estatisticas" in sys.argv:
+        executar_recalculo_estatisticas()
+    else:
+        main(modo_continuo=modo_continuo)
 